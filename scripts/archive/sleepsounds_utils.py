@@ -6,14 +6,19 @@ Handles audio selection, video generation, and proper attribution.
 
 import json
 import random
+import sys
 from pathlib import Path
 from typing import Dict, List
 
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from t2v_shorts.audio_index import AudioIndex
+
 
 def get_audio_library() -> Dict:
     """Load audio library manifest."""
-    root = Path(__file__).resolve().parents[1]
-    manifest_path = root / "audio_library" / "manifest.json"
+    manifest_path = ROOT / "audio_library" / "manifest.json"
     
     if not manifest_path.exists():
         raise FileNotFoundError(f"Audio manifest not found: {manifest_path}")
@@ -21,37 +26,34 @@ def get_audio_library() -> Dict:
     return json.loads(manifest_path.read_text(encoding="utf-8"))
 
 
-def select_audio_for_today(category: str = None) -> Dict:
+def select_audio_for_today(category: str = None, channel: str = "sleepsounds") -> Dict:
     """
     Select an audio file for today's upload.
-    Uses rotation to avoid repeating same audio too frequently.
+    Rotates through the indexed library: least recently used for this channel first.
     
     Args:
         category: Optional category filter (rain, ocean, fire, nature)
+        channel: Channel whose rotation state is used and updated
     
     Returns:
-        Dict with audio file info and attribution
+        Dict with audio file info, loudness/loop data and attribution
     """
     library = get_audio_library()
-    files = library["files"]
-    
-    # Filter by category if specified
-    if category:
-        files = [f for f in files if f["category"] == category]
-    
-    if not files:
-        raise ValueError(f"No audio files found for category: {category}")
     
-    # For now, random selection. TODO: Add rotation tracking to avoid repeats
-    selected = random.choice(files)
+    with AudioIndex(root=ROOT) as index:
+        index.scan()  # only new/changed files are analyzed
+        track = index.select(channel, category=category)
     
     return {
-        "file_path": Path("audio_library") / selected["category"] / selected["file"],
-        "category": selected["category"],
-        "description": selected["description"],
-        "artist": selected["artist"],
+        "file_path": Path(track.path),
+        "category": track.category,
+        "description": track.description or "",
+        "artist": track.artist or "Unknown",
         "attribution": library["attribution_text"],
-        "size_mb": selected["size_mb"]
+        "size_mb": round(track.size / 1e6, 2),
+        "duration": track.duration,
+        "loudnorm": track.loudnorm_filter(),
+        "loop": (track.loop_start, track.loop_end),
     }
 
 
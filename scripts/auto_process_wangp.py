@@ -3,13 +3,15 @@
 WanGP Auto-Processor
 Monitors WanGP outputs folder and automatically processes new videos
 Semi-automated: You generate via UI, this handles the rest
+Clips already in the outputs folder when a session starts are left alone.
+
+With --storyboard, each clip is saved as the scene it was generated for
+(matched by its prompt), whatever order the UI finishes them in.
+See t2v_shorts/wangp_watcher.py.
 """
 
 import sys
-import os
-import time
-import shutil
-import subprocess
+import argparse
 from pathlib import Path
 from datetime import datetime
 
@@ -18,116 +20,85 @@ if sys.platform == 'win32':
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.detach(), encoding='utf-8', errors='replace', line_buffering=True)
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
 from config_loader import get_wangp_dir
+from t2v_shorts.compiler import StoryboardError
+from t2v_shorts.wangp_watcher import PROCESSED_DIR, OutputWatcher, storyboard_slots
+
 WAN2GP_OUTPUTS = get_wangp_dir() / "outputs"
-PROCESSED_DIR = Path("out/processed_scenes")
-PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
 def log(msg):
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
-
-def get_new_videos():
-    """Find videos that haven't been processed yet"""
-    if not WAN2GP_OUTPUTS.exists():
-        return []
-    
-    all_videos = list(WAN2GP_OUTPUTS.glob("*.mp4"))
-    processed_marker = PROCESSED_DIR / ".processed_list.txt"
-    
-    # Load list of processed videos
-    processed = set()
-    if processed_marker.exists():
-        processed = set(processed_marker.read_text().splitlines())
-    
-    # Find new ones
-    new_videos = [v for v in all_videos if v.name not in processed]
-    return new_videos
-
-def mark_as_processed(video_name):
-    """Mark a video as processed"""
-    marker = PROCESSED_DIR / ".processed_list.txt"
-    with open(marker, "a") as f:
-        f.write(f"{video_name}\n")
-
-def process_video(video_path, scene_num):
-    """
-    Copy and rename video for processing
-    
-    Args:
-        video_path: Source video
-        scene_num: Scene number
-        
-    Returns:
-        Path to processed scene or None
-    """
-    output_path = PROCESSED_DIR / f"scene_{scene_num:02d}.mp4"
-    
-    try:
-        shutil.copy(video_path, output_path)
-        log(f"  Scene {scene_num}: Saved as {output_path.name}")
-        return output_path
-    except Exception as e:
-        log(f"  Scene {scene_num}: ERROR - {e}")
-        return None
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
 
 def main():
+    parser = argparse.ArgumentParser(description="Save WanGP UI outputs as numbered scenes")
+    parser.add_argument("--storyboard", type=Path, help="Storyboard the scenes are generated for")
+    parser.add_argument("--video", type=int, default=1, help="Video of the storyboard (1-based)")
+    args = parser.parse_args()
+
+    slots = None
+    if args.storyboard:
+        try:
+            slots = storyboard_slots(args.storyboard, args.video)
+        except (StoryboardError, IndexError) as e:
+            log(f"Bad storyboard: {e}")
+            return 1
+    # Without a storyboard scenes are numbered from 1 each day (restarts the same day continue).
+    session = f"{args.storyboard.resolve()}#{args.video}" if args.storyboard else datetime.now().strftime("%Y-%m-%d")
+
     log("="*60)
     log("WanGP Auto-Processor - Monitoring Mode")
     log("="*60)
     log(f"Watching: {WAN2GP_OUTPUTS}")
     log(f"Output: {PROCESSED_DIR}")
+    if slots:
+        log(f"Storyboard: {args.storyboard} (video {args.video}, {len(slots)} scenes)")
     log("")
     log("Instructions:")
     log("1. Open http://localhost:7860")
-    log("2. Generate scenes one by one")
+    log("2. Generate scenes one by one" + (" (any order)" if slots else ""))
     log("3. This script will auto-process them")
-    log("4. Press Ctrl+C when done")
+    log("4. Press Ctrl+C when done" + (" (stops by itself once every scene is in)" if slots else ""))
     log("")
-    
-    scene_counter = 1
-    processed_videos = []
-    
-    try:
-        while True:
-            new_videos = get_new_videos()
-            
-            if new_videos:
-                for video in new_videos:
-                    log(f"New video detected: {video.name}")
-                    
-                    # Wait a moment for file to finish writing
-                    time.sleep(2)
-                    
-                    # Process it
-                    processed = process_video(video, scene_counter)
-                    
-                    if processed:
-                        processed_videos.append(processed)
-                        mark_as_processed(video.name)
-                        scene_counter += 1
-                        log(f"  Total scenes processed: {len(processed_videos)}")
-                    
-                    log("")
-            
-            time.sleep(3)  # Check every 3 seconds
-            
-    except KeyboardInterrupt:
-        log("")
-        log("="*60)
-        log(f"Stopped - {len(processed_videos)} scenes processed")
-        log("="*60)
-        
-        if processed_videos:
-            log("\nProcessed scenes:")
-            for i, scene in enumerate(processed_videos, 1):
-                log(f"  {i}. {scene.name}")
-            
-            log(f"\nTo combine into Shorts:")
-            log(f"python scripts/combine_and_upload.py")
+
+    def on_processed(p):
+        log(f"New video detected: {p.name}")
+        if p.path is None:
+            reason = "matches no scene of the storyboard" if p.how == "unmatched" else "every scene of the storyboard is filled"
+            log(f"  Skipped: {reason}")
         else:
-            log("\nNo scenes were processed")
-        
-        return 0
+            log(f"  Scene {p.slot}: Saved as {p.path.name} ({p.how})")
+        log(f"  Total scenes processed: {len(watcher.filled())}")
+        log("")
+
+    with OutputWatcher(WAN2GP_OUTPUTS, slots=slots, session=session) as watcher:
+        try:
+            watcher.run(on_processed)
+        except KeyboardInterrupt:
+            log("")
+        filled = watcher.filled()
+        missing = watcher.missing()
+
+    log("="*60)
+    log(f"Stopped - {len(filled)} scenes processed")
+    log("="*60)
+
+    if filled:
+        log("\nProcessed scenes:")
+        for slot, path in sorted(filled.items()):
+            log(f"  {slot}. {path.name}")
+    if missing:
+        log("\nStill missing:")
+        for s in missing:
+            log(f"  {s.index}. {s.prompt[:70]}")
+    if filled and not missing:
+        log(f"\nTo combine into Shorts:")
+        log(f"python scripts/combine_and_upload.py")
+    elif not filled:
+        log("\nNo scenes were processed")
+
+    return 0
 
 if __name__ == "__main__":
     sys.exit(main())
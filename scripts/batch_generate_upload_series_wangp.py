@@ -6,13 +6,14 @@ Processes multi-video storyboard using WanGP for video generation
 
 import json
 import sys
-import subprocess
+from dataclasses import asdict, dataclass
 from pathlib import Path
 from datetime import datetime
 import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-# Force UTF-8 output on Windows
-if sys.platform == 'win32':
+# Force UTF-8 output on Windows (only when run as a script, not when imported)
+if sys.platform == 'win32' and __name__ == "__main__":
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.detach(), encoding='utf-8', errors='replace', line_buffering=True)
     sys.stderr = io.TextIOWrapper(sys.stderr.detach(), encoding='utf-8', errors='replace', line_buffering=True)
@@ -21,15 +22,39 @@ if sys.platform == 'win32':
 root = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(root))
 
+from t2v_shorts import journal as jobs
+from t2v_shorts.compiler import StoryboardError, compile_storyboard
+from t2v_shorts.predictor import RuntimePredictor
+from t2v_shorts.seeds import storyboard_id
+from t2v_shorts.slots import SlotBook, assign_slots, slots_for
+from t2v_shorts.storyboard import video_default
+from t2v_shorts.workspace_gc import sweep as sweep_workspace
+from generate_shorts_wangp import OUTPUTS_DIR as WANGP_OUTPUTS, generate_short
+from youtube_upload import UploadResult, upload_video as youtube_upload
+
 
 def log(msg):
     """Timestamped logging"""
     print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
 
 
+@dataclass
+class VideoResult:
+    title: str
+    status: str  # success | upload_failed | generation_failed | generated_only
+    video_id: str | None = None
+    url: str | None = None
+    privacy: str | None = None
+    publish_at: str | None = None
+    file: str | None = None
+
+    def to_json(self) -> dict:
+        return {k: v for k, v in asdict(self).items() if v is not None or k in ("video_id", "url")}
+
+
 def generate_video_with_wangp(storyboard_data, video_data, output_path):
     """
-    Generate a single video using WanGP
+    Generate a single video using WanGP (in this process)
     
     Args:
         storyboard_data: Full storyboard dict (for metadata)
@@ -42,178 +67,151 @@ def generate_video_with_wangp(storyboard_data, video_data, output_path):
     log(f"🎬 Generating: {video_data['title']}")
     log(f"   Scenes: {len(video_data['scenes'])}")
     
-    # Create temporary storyboard for this single video
+    # The video's own default (and music) over the series default, as compile/estimate plan it
+    default = video_default(storyboard_data, video_data)
+    for key in ("music", "musicCategory"):
+        if video_data.get(key):
+            default[key] = video_data[key]
     single_video_storyboard = {
+        "id": storyboard_id(storyboard_data),  # scene seeds follow the series, not this excerpt
+        "slug": video_data.get("slug"),
         "title": video_data["title"],
         "description": video_data.get("description", ""),
         "tags": storyboard_data.get("tags", []),
         "category": storyboard_data.get("category", "Pets & Animals"),
+        "default": default,
+        "channel": storyboard_data.get("channel"),
+        "narration": video_data.get("narration"),
         "scenes": video_data["scenes"],
     }
     
-    # Save temporary storyboard
-    temp_storyboard = root / "out" / "temp_storyboard.json"
-    temp_storyboard.parent.mkdir(parents=True, exist_ok=True)
-    temp_storyboard.write_text(json.dumps(single_video_storyboard, indent=2), encoding='utf-8')
-    
-    # NOTE: For now, use semi-automated workflow:
-    # 1. Run auto_process_wangp.py in one terminal
-    # 2. Generate scenes via WanGP UI
-    # 3. Run combine_and_upload.py when done
-    #
-    # This batch script is for future full automation
-    generate_script = root / "scripts" / "generate_shorts_wangp.py"
-    
-    cmd = [
-        sys.executable,
-        str(generate_script),
-        str(temp_storyboard),
-        str(output_path)
-    ]
-    
-    log(f"   Running: {generate_script.name}")
     start_time = datetime.now()
-    
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=False,  # Show real-time output
-            text=True,
-            timeout=3600  # 1 hour timeout for full video generation
-        )
-        
-        duration = (datetime.now() - start_time).total_seconds()
-        
-        if result.returncode == 0 and Path(output_path).exists():
-            log(f"✅ Video generated ({duration:.0f}s): {output_path}")
-            return output_path
-        else:
-            log(f"❌ Generation failed (code {result.returncode})")
-            return None
-            
-    except subprocess.TimeoutExpired:
-        log(f"❌ Generation timed out after 1 hour")
-        return None
+        generate_short(single_video_storyboard, output_path)
     except Exception as e:
-        log(f"❌ Generation error: {e}")
-        import traceback
-        traceback.print_exc()
+        log(f"❌ Generation failed: {e}")
         return None
+    duration = (datetime.now() - start_time).total_seconds()
+    log(f"✅ Video generated ({duration:.0f}s): {output_path}")
+    return output_path
 
 
-def upload_video(video_path, title, description, tags, category, privacy):
+def upload_video(video_path, title, description, tags, category, privacy, channel="dogs", publish_at=None):
     """
-    Upload video to YouTube
+    Upload video to YouTube (API client is reused across uploads)
     
-    Args:
-        video_path: Path to video file
-        title: Video title
-        description: Video description
-        tags: List of tags
-        category: YouTube category ID
-        privacy: public/unlisted/private
-        
     Returns:
-        Upload result dict or None
+        UploadResult or None
     """
     log(f"📤 Uploading: {title}")
-    
-    upload_script = root / "scripts" / "youtube_upload.py"
-    
-    tags_csv = ",".join([t.strip() for t in (tags or []) if str(t).strip()])
-
-    cmd = [
-        sys.executable,
-        str(upload_script),
-        "--file", str(video_path),
-        "--title", title,
-        "--description", description or "",
-        "--tags", tags_csv,
-        "--privacy", privacy,
-        "--category", str(category or "22"),
-        "--channel", "dogs",
-    ]
-    
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=600  # 10 minute timeout for upload
+        result = youtube_upload(
+            video_path,
+            title=title,
+            description=description or "",
+            tags=tags,
+            privacy=privacy,
+            category=str(category or "22"),
+            channel=channel,
+            publish_at=publish_at,
+            progress=False,
         )
-        
-        if result.returncode == 0:
-            # Parse video ID from output
-            output = result.stdout
-            video_id = None
-            
-            for line in output.splitlines():
-                if "Video id" in line or "watch?v=" in line:
-                    # Extract video ID
-                    if "v=" in line:
-                        video_id = line.split("v=")[-1].strip()
-                    elif "Video id" in line:
-                        video_id = line.split("'")[-2]
-            
-            if video_id:
-                url = f"https://youtube.com/watch?v={video_id}"
-                log(f"✅ Uploaded: {url}")
-                return {
-                    "title": title,
-                    "video_id": video_id,
-                    "url": url,
-                    "privacy": privacy
-                }
-            else:
-                log(f"⚠️ Upload succeeded but couldn't parse video ID")
-                return {
-                    "title": title,
-                    "video_id": "unknown",
-                    "url": "unknown",
-                    "privacy": privacy
-                }
-        else:
-            log(f"❌ Upload failed")
-            log(f"   Error: {result.stderr[:200]}")
-            return None
-            
-    except subprocess.TimeoutExpired:
-        log(f"❌ Upload timed out")
-        return None
     except Exception as e:
         log(f"❌ Upload error: {e}")
         return None
+    log(f"✅ Uploaded: {result.url}" + (f" (publishes {result.publish_at})" if result.publish_at else ""))
+    return result
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Batch generate and upload videos using WanGP")
-    parser.add_argument("--storyboard", required=True, help="Storyboard JSON file")
-    parser.add_argument("--privacy", default="public", choices=["public", "unlisted", "private"])
-    parser.add_argument("--skip-upload", action="store_true", help="Generate only, don't upload")
-    args = parser.parse_args()
-    
-    storyboard_path = Path(args.storyboard)
-    
-    if not storyboard_path.exists():
-        log(f"❌ Storyboard not found: {storyboard_path}")
-        return 1
-    
-    # Load storyboard
+def run_series(
+    storyboard_path,
+    *,
+    privacy="public",
+    skip_upload=False,
+    max_uploads=2,
+    channel="dogs",
+    max_videos=None,
+    slots=None,
+):
+    """Generate and upload every video of a series storyboard.
+
+    Uploads run on background workers (at most max_uploads in flight) while the
+    GPU moves on to the next video. Only the first max_videos are made when set.
+    With slots (publish datetimes, see t2v_shorts.slots) each upload is scheduled
+    for the earliest slot it can still make.
+    Returns one VideoResult per video, in series order; they are also written
+    to out/series/upload_results.json.
+    """
+    storyboard_path = Path(storyboard_path)
     log(f"📖 Loading storyboard: {storyboard_path.name}")
     storyboard_data = json.loads(storyboard_path.read_text(encoding='utf-8'))
     
-    videos = storyboard_data.get("videos", [])
+    videos = storyboard_data.get("videos", [])[:max_videos]
     log(f"   Videos: {len(videos)}")
     log("")
     
     if not videos:
-        log("❌ No videos in storyboard")
-        return 1
+        raise RuntimeError(f"No videos in storyboard: {storyboard_path}")
+    # Fail on a bad storyboard now, not after the first videos have rendered
+    try:
+        compiled = compile_storyboard(storyboard_data, source=storyboard_path.name, backend="wangp")
+    except StoryboardError as e:
+        raise RuntimeError(f"Invalid storyboard {e}") from None
+    for w in compiled.warnings:
+        log(f"⚠️ {w}")
     
-    # Process each video
-    results = []
+    results: list[VideoResult | None] = [None] * len(videos)  # kept in series order
     out_dir = root / "out" / "series"
     out_dir.mkdir(parents=True, exist_ok=True)
+    results_path = out_dir / "upload_results.json"
+    completion_log = out_dir / "upload_log.jsonl"  # one line per finished upload, in completion order
+    
+    # Journal keys match generate_shorts_wangp.py (output file stem), so a re-run
+    # skips uploaded videos, re-uploads finished ones and resumes at the failed scene.
+    journal = jobs.Journal(root / jobs.JOURNAL_PATH)
+    
+    default = storyboard_data.get("default", {}) or {}
+    # Tags come from storyboard default (comma-separated)
+    tags = [t.strip() for t in str(default.get("tags", "")).split(",") if t.strip()]
+    category = default.get("category", "22")  # Pets & Animals
+    
+    book = None
+    if slots:
+        book = SlotBook(slots)
+        plan = assign_slots([(v.title, v.total) for v in RuntimePredictor.from_trace().estimate_plan(compiled).videos[:len(videos)]], slots)
+        for a in plan:
+            when = a.publish_at.strftime("%a %H:%M") if a.publish_at else "no slot reachable, publish on upload"
+            log(f"   🗓️ Video {a.video + 1} -> {when} (ready ~{a.ready_at.strftime('%H:%M')})")
+    
+    def save_results():
+        results_path.write_text(json.dumps([r.to_json() for r in results if r], indent=2), encoding='utf-8')
+    
+    uploader = ThreadPoolExecutor(max_workers=max_uploads, thread_name_prefix="upload")
+    in_flight = {}  # future -> (index, job, title)
+    completed = 0
+    
+    def collect(futures):
+        # Journal/results are only touched here, on the main thread.
+        nonlocal completed
+        for fut in futures:
+            idx, job, title = in_flight.pop(fut)
+            upload_result: UploadResult | None = fut.result()
+            completed += 1
+            if upload_result:
+                journal.set(job, jobs.UPLOADED, detail=asdict(upload_result))
+                results[idx] = VideoResult(status="success", **asdict(upload_result))
+            else:
+                results[idx] = VideoResult(title, "upload_failed")
+            with open(completion_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "seq": completed,
+                    "video": idx + 1,
+                    "status": results[idx].status,
+                    "url": results[idx].url,
+                    "at": datetime.now().isoformat(),
+                }) + "\n")
+            log(f"📬 Upload {completed} done: video {idx + 1} -> {results[idx].status}")
+        save_results()
     
     for i, video_data in enumerate(videos, 1):
         log(f"\n{'='*70}")
@@ -224,69 +222,111 @@ def main():
         safe_title = "".join(c for c in video_data["title"] if c.isalnum() or c in " -_")[:50]
         output_filename = f"video_{i}_{safe_title}.mp4"
         output_path = out_dir / output_filename
+        job = output_path.stem
         
-        # Generate video
+        uploaded = None if skip_upload else journal.done(job, jobs.UPLOADED)
+        if uploaded:
+            log(f"⏭️ Already uploaded (journal): {uploaded.detail.get('url')}")
+            d = uploaded.detail
+            results[i - 1] = VideoResult(
+                d.get("title", video_data["title"]), "success", d.get("video_id"), d.get("url"), d.get("privacy"), d.get("publish_at")
+            )
+            save_results()
+            continue
+        
+        # Free disk first: intermediates of uploaded videos, old WanGP outputs, quota
+        try:
+            sweep_workspace(root, extra=[WANGP_OUTPUTS])
+        except Exception as e:
+            log(f"⚠️ Workspace sweep failed: {e}")
+        
+        # Generate video (generate_short itself skips finished work)
         generated_video = generate_video_with_wangp(storyboard_data, video_data, output_path)
+        collect([f for f in list(in_flight) if f.done()])
         
         if not generated_video:
             log(f"❌ Skipping upload for video {i} (generation failed)")
-            results.append({
-                "title": video_data["title"],
-                "status": "generation_failed",
-                "video_id": None,
-                "url": None
-            })
+            results[i - 1] = VideoResult(video_data["title"], "generation_failed")
+            save_results()
             continue
         
-        # Upload (unless --skip-upload)
-        if not args.skip_upload:
-            # Tags come from storyboard default (comma-separated)
-            default_tags = (storyboard_data.get("default", {}) or {}).get("tags", "")
-            tags = [t.strip() for t in str(default_tags).split(",") if t.strip()]
-
-            upload_result = upload_video(
+        if not skip_upload:
+            if len(in_flight) >= max_uploads:
+                log(f"⏳ {len(in_flight)} uploads in flight, waiting for one to finish")
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                collect(done)
+            fut = uploader.submit(
+                upload_video,
                 generated_video,
                 video_data["title"],
                 video_data.get("description", ""),
                 tags,
-                (storyboard_data.get("default", {}) or {}).get("category", "22"),  # Pets & Animals
-                args.privacy,
+                category,
+                privacy,
+                channel,
+                book.take() if book else None,
             )
-            
-            if upload_result:
-                results.append({
-                    **upload_result,
-                    "status": "success"
-                })
-            else:
-                results.append({
-                    "title": video_data["title"],
-                    "status": "upload_failed",
-                    "video_id": None,
-                    "url": None
-                })
+            in_flight[fut] = (i - 1, job, video_data["title"])
         else:
             log(f"⏭️ Skipping upload (--skip-upload)")
-            results.append({
-                "title": video_data["title"],
-                "status": "generated_only",
-                "video_id": None,
-                "url": None,
-                "file": str(generated_video)
-            })
+            results[i - 1] = VideoResult(video_data["title"], "generated_only", file=str(generated_video))
+            save_results()
     
-    # Save results
-    results_path = out_dir / "upload_results.json"
-    results_path.write_text(json.dumps(results, indent=2), encoding='utf-8')
+    if in_flight:
+        log(f"⏳ Waiting for {len(in_flight)} upload(s) to finish")
+        collect(wait(list(in_flight)).done)
+    uploader.shutdown()
+    journal.close()
     log(f"\n💾 Results saved: {results_path}")
+    return [r for r in results if r]
+
+
+def _slots_arg(value, storyboard_path, channel="dogs"):
+    if not value:
+        return None
+    times = None if value == "saved" else [t.strip() for t in value.split(",") if t.strip()]
+    count = len(json.loads(Path(storyboard_path).read_text(encoding='utf-8')).get("videos", []))
+    slots = slots_for(channel, 2 * count, times=times, root=root)  # spare slots for videos that run late
+    if not slots:
+        log(f"⚠️ No publish slots for '{channel}', uploading immediately")
+    return slots or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch generate and upload videos using WanGP")
+    parser.add_argument("--storyboard", required=True, help="Storyboard JSON file")
+    parser.add_argument("--privacy", default="public", choices=["public", "unlisted", "private"])
+    parser.add_argument("--skip-upload", action="store_true", help="Generate only, don't upload")
+    parser.add_argument("--max-uploads", type=int, default=2, help="Uploads in flight while the next video generates")
+    parser.add_argument("--slots", nargs="?", const="saved",
+                        help="Schedule uploads into publish slots: HH:MM,HH:MM or no value for out/publish_slots.json")
+    args = parser.parse_args()
+    
+    storyboard_path = Path(args.storyboard)
+    
+    if not storyboard_path.exists():
+        log(f"❌ Storyboard not found: {storyboard_path}")
+        return 1
+    
+    try:
+        results = run_series(
+            storyboard_path,
+            privacy=args.privacy,
+            skip_upload=args.skip_upload,
+            max_uploads=args.max_uploads,
+            slots=_slots_arg(args.slots, storyboard_path),
+        )
+    except RuntimeError as e:
+        log(f"❌ {e}")
+        return 1
     
     # Summary
     log(f"\n{'='*70}")
     log(f"📊 SUMMARY")
     log(f"{'='*70}")
     log(f"Total videos: {len(results)}")
-    log(f"Successful: {sum(1 for r in results if r.get('status') == 'success')}")
-    log(f"Failed: {sum(1 for r in results if r.get('status') in ['generation_failed', 'upload_failed'])}")
+    log(f"Successful: {sum(1 for r in results if r.status == 'success')}")
+    log(f"Failed: {sum(1 for r in results if r.status in ['generation_failed', 'upload_failed'])}")
     log(f"{'='*70}")
     
     return 0
@@ -1,6 +1,8 @@
 """
 Analyze best upload time for a channel based on when viewers are most active.
-Usage: python best_upload_time.py <token_name>
+Usage: python best_upload_time.py <token_name> [--save]
+
+--save adds the suggested time to out/publish_slots.json (used by the upload scheduler).
 """
 
 import sys
@@ -13,6 +15,10 @@ from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 
+root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root))
+from t2v_shorts.slots import SLOTS_PATH, load_slots, save_slots
+
 SCOPES = [
     "https://www.googleapis.com/auth/youtube.force-ssl",
     "https://www.googleapis.com/auth/yt-analytics.readonly",
@@ -28,7 +34,7 @@ def load_creds(token_name: str) -> Credentials:
         creds.refresh(Request())
     return creds
 
-def main(token_name: str):
+def main(token_name: str, save: bool = False):
     creds = load_creds(token_name)
     yt  = build("youtube", "v3", credentials=creds)
     yta = build("youtubeAnalytics", "v2", credentials=creds)
@@ -161,6 +167,15 @@ def main(token_name: str):
         print(f"  Suggested upload time: {upload_hour:02d}:00 Dubai (2h before peak)")
     print(f"{'='*60}\n")
 
+    if save and best_hour is not None:
+        # Publish slot in this machine's local time, 2h before the UTC peak
+        peak = datetime.now(timezone.utc).replace(hour=best_hour, minute=0, second=0, microsecond=0)
+        slot = (peak - timedelta(hours=2)).astimezone().strftime("%H:%M")
+        times = sorted(set(load_slots(root / SLOTS_PATH).get(token_name, [])) | {slot})
+        save_slots(token_name, times, root / SLOTS_PATH)
+        print(f"Saved publish slot {slot} for '{token_name}' -> {root / SLOTS_PATH}")
+
 if __name__ == "__main__":
-    token_name = sys.argv[1] if len(sys.argv) > 1 else "eatdrinkwander"
-    main(token_name)
+    args = [a for a in sys.argv[1:] if a != "--save"]
+    token_name = args[0] if args else "eatdrinkwander"
+    main(token_name, save="--save" in sys.argv)
@@ -9,6 +9,9 @@ import sys
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from t2v_shorts.download import DownloadItem, download_all
+
 # Force UTF-8 output on Windows
 if sys.platform == 'win32':
     import io
@@ -97,70 +100,70 @@ AUDIO_LIBRARY = [
 ]
 
 
-def download_audio():
-    """Download all audio files from verified sources."""
+def download_audio(workers: int = 4, base_url: str = None):
+    """Download all audio files from verified sources (parallel, resumable, verified)."""
     root = Path(__file__).resolve().parents[1]
     audio_dir = root / "audio_library"
+    manifest_path = audio_dir / "manifest.json"
     
     print("🎵 Downloading copyright-free audio library...")
     print(f"Target: {audio_dir}")
+    print(f"Workers: {workers}")
     print()
     
-    manifest = []
+    # Existing manifest: keep its entries and use recorded hashes for verification
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    else:
+        manifest = {"files": []}
+    entries = {f"{f['category']}/{f['file']}": f for f in manifest.get("files", [])}
     
-    for idx, audio in enumerate(AUDIO_LIBRARY, 1):
-        category = audio["category"]
-        name = audio["name"]
-        url = audio["url"]
-        
-        print(f"[{idx}/{len(AUDIO_LIBRARY)}] Downloading: {name}")
-        print(f"  Category: {category}")
-        print(f"  Source: {audio['source']} ({audio['license']})")
-        print(f"  URL: {url}")
-        
-        target_dir = audio_dir / category
-        target_file = target_dir / f"{name}.mp3"
-        
-        # Download using curl (available on Windows 10+)
-        import subprocess
-        result = subprocess.run(
-            ["curl", "-L", "-o", str(target_file), url],
-            capture_output=True,
-            text=True
-        )
-        
-        if result.returncode == 0 and target_file.exists():
-            size_mb = target_file.stat().st_size / (1024 * 1024)
-            print(f"  ✅ Downloaded: {size_mb:.2f} MB")
-            
-            # Add to manifest
-            manifest.append({
-                "file": f"{category}/{name}.mp3",
-                "source": audio["source"],
-                "license": audio["license"],
-                "attribution": audio["attribution"],
-                "url": url,
-                "description": audio["description"],
-                "duration_sec": audio["duration_sec"],
-                "downloaded_at": datetime.now().isoformat(),
-                "size_mb": round(size_mb, 2)
-            })
-        else:
-            print(f"  ❌ Failed to download")
-            print(f"  Error: {result.stderr}")
+    items = []
+    for audio in AUDIO_LIBRARY:
+        key = f"{audio['category']}/{audio['name']}.mp3"
+        items.append(DownloadItem(
+            url=audio["url"],
+            dest=audio_dir / key,
+            sha256=entries.get(key, {}).get("sha256"),
+        ))
+    
+    results = download_all(items, workers=workers, base_url=base_url)
+    
+    for idx, (audio, res) in enumerate(zip(AUDIO_LIBRARY, results), 1):
+        name = f"{audio['category']}/{audio['name']}.mp3"
+        if not res.ok:
+            print(f"[{idx}/{len(AUDIO_LIBRARY)}] ❌ {name}: {res.error}")
+            continue
+        size_mb = res.size / (1024 * 1024)
+        print(f"[{idx}/{len(AUDIO_LIBRARY)}] ✅ {name}: {res.status} ({size_mb:.2f} MB)")
         
-        print()
+        entry = entries.setdefault(name, {})
+        entry.update({
+            "category": audio["category"],
+            "file": f"{audio['name']}.mp3",
+            "source": audio["source"],
+            "license": audio["license"],
+            "attribution": audio["attribution"],
+            "url": audio["url"],
+            "description": audio["description"],
+            "duration_sec": audio["duration_sec"],
+            "size_mb": round(size_mb, 2),
+            "sha256": res.sha256,
+        })
+        if res.status != "skipped":
+            entry["downloaded_at"] = datetime.now().isoformat()
     
-    # Save manifest
-    manifest_path = audio_dir / "manifest.json"
-    manifest_path.write_text(json.dumps({
-        "created_at": datetime.now().isoformat(),
-        "total_files": len(manifest),
-        "files": manifest
-    }, indent=2), encoding="utf-8")
+    # Save manifest (merged: entries for files added by hand are kept)
+    manifest["files"] = list(entries.values())
+    manifest["total_files"] = len(manifest["files"])
+    manifest["updated_at"] = datetime.now().isoformat()
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
     
+    ok = sum(r.ok for r in results)
+    print()
     print("="*70)
-    print(f"✅ Downloaded {len(manifest)} audio files")
+    print(f"✅ {ok}/{len(results)} audio files present and verified")
     print(f"📄 Manifest saved: {manifest_path}")
     print()
     print("All files are:")
@@ -168,7 +171,15 @@ def download_audio():
     print("  • Safe for YouTube monetization")
     print("  • No attribution required")
     print("="*70)
+    return results
 
 
 if __name__ == "__main__":
-    download_audio()
+    import argparse
+    
+    ap = argparse.ArgumentParser(description="Download the sleep sounds audio library")
+    ap.add_argument("--workers", type=int, default=4, help="Concurrent downloads")
+    ap.add_argument("--base-url", help="Fetch from this host instead (mirror / local test server)")
+    args = ap.parse_args()
+    results = download_audio(workers=args.workers, base_url=args.base_url)
+    sys.exit(0 if all(r.ok for r in results) else 1)
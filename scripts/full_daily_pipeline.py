@@ -23,6 +23,11 @@ if sys.platform == 'win32':
 # Add parent to path
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
+from batch_generate_upload_series_wangp import run_series
+from t2v_shorts.compiler import StoryboardError, compile_storyboard
+from t2v_shorts.predictor import RuntimePredictor
+from t2v_shorts.slots import slots_for
+
 
 def log(msg):
     """Timestamped logging"""
@@ -96,73 +101,63 @@ def get_todays_storyboard():
     return None
 
 
-def run_batch_generation(storyboard_path, privacy="public"):
-    """Execute video generation and upload"""
-    root = Path(__file__).resolve().parents[1]
-    # Use Wan2.x (wangp) generation script
-    batch_script = root / "scripts" / "batch_generate_upload_series_wangp.py"
-    
+def run_batch_generation(storyboard_path, privacy="public", gpu_window_hours=None, slot_times=None):
+    """Execute video generation and upload (in this process)"""
     log(f"🎬 Starting batch generation...")
     log(f"   Storyboard: {storyboard_path.name}")
     log(f"   Privacy: {privacy}")
     
-    # Load storyboard to show video count
-    data = json.loads(storyboard_path.read_text(encoding="utf-8"))
-    video_count = len(data["videos"])
-    total_scenes = sum(len(v["scenes"]) for v in data["videos"])
+    # Validate the whole storyboard before any GPU time is spent
+    data = json.loads(storyboard_path.read_text(encoding="utf-8-sig"))
+    try:
+        plan = compile_storyboard(data, source=storyboard_path.name, backend="wangp")
+    except StoryboardError as e:
+        log(f"❌ Invalid storyboard {storyboard_path.name}:")
+        for err in e.errors:
+            log(f"   {err}")
+        return None
+    video_count = len(plan.videos)
+    total_scenes = sum(len(v.scenes) for v in plan.videos)
     
     log(f"   Videos: {video_count}")
     log(f"   Total scenes: {total_scenes}")
-    log(f"   Estimated time: {total_scenes * 3} minutes")
+    for w in plan.warnings:
+        log(f"   ⚠️ {w}")
+    
+    # Runtime estimate learned from previous runs (out/trace.jsonl)
+    est = RuntimePredictor.from_trace().estimate_plan(plan)
+    for v in est.videos:
+        log(f"     {v.title[:40]}: {v.total}")
+    log(f"   Estimated time: {est.total}")
+    
+    max_videos = None
+    if gpu_window_hours:
+        max_videos = est.fit_window(gpu_window_hours * 3600)
+        log(f"   GPU window {gpu_window_hours:g}h fits {max_videos}/{video_count} videos")
+        if max_videos == 0:
+            log("❌ Not even one video fits the GPU window")
+            return None
+    
+    # Publish slots: explicit --slots times, else out/publish_slots.json (may be empty).
+    # Twice as many as videos, so late videos can move to a later slot.
+    root = Path(__file__).resolve().parents[1]
+    slots = slots_for("dogs", 2 * video_count, times=slot_times, root=root) or None
+    if not slots:
+        log("   No publish slots configured, videos publish on upload")
     
     start_time = datetime.now()
     
     try:
-        # Run batch generation with real-time output
-        process = subprocess.Popen(
-            [
-                sys.executable,
-                str(batch_script),
-                "--storyboard",
-                str(storyboard_path),
-                "--privacy",
-                privacy,
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            encoding='utf-8',
-            errors='replace',
-            bufsize=1,
-        )
-        
-        # Stream output
-        for line in process.stdout:
-            print(line, end='')
-        
-        process.wait()
-        
-        if process.returncode != 0:
-            log(f"❌ Generation failed with code {process.returncode}")
-            return None
-        
-        duration = datetime.now() - start_time
-        log(f"✅ Generation complete ({duration.total_seconds():.0f}s)")
-        
-        # Parse results
-        results_path = root / "out" / "series" / "upload_results.json"
-        if results_path.exists():
-            results = json.loads(results_path.read_text())
-            return results
-        else:
-            log("⚠️ No upload_results.json found")
-            return []
-        
+        results = run_series(storyboard_path, privacy=privacy, max_videos=max_videos, slots=slots)
     except Exception as e:
         log(f"❌ Generation error: {e}")
         import traceback
         traceback.print_exc()
         return None
+    
+    duration = datetime.now() - start_time
+    log(f"✅ Generation complete ({duration.total_seconds():.0f}s)")
+    return results
 
 
 def generate_report(strategy, results, duration_seconds):
@@ -175,23 +170,32 @@ def generate_report(strategy, results, duration_seconds):
     log(f"Duration: {duration_seconds:.0f}s ({duration_seconds/60:.1f} minutes)")
     log("")
     
-    if results:
-        log(f"✅ Successfully uploaded {len(results)} videos:")
-        for r in results:
-            log(f"   • {r['title']}")
-            log(f"     {r['url']}")
+    uploaded = [r for r in results or [] if r.status == "success"]
+    failed = [r for r in results or [] if r.status != "success"]
+    if uploaded:
+        log(f"✅ Successfully uploaded {len(uploaded)} videos:")
+        for r in uploaded:
+            log(f"   • {r.title}")
+            log(f"     {r.url}")
         log("")
         
-        # Calculate next upload times (for manual scheduling or future automation)
-        spacing = strategy.get('upload_spacing_hours', 4)
-        now = datetime.now()
-        log(f"📅 Suggested upload schedule ({spacing}h spacing):")
-        for i, r in enumerate(results):
-            upload_time = now + timedelta(hours=i * spacing)
-            log(f"   {upload_time.strftime('%I:%M %p')} - {r['title']}")
+        if any(r.publish_at for r in uploaded):
+            log(f"📅 Scheduled publishing:")
+            for r in uploaded:
+                log(f"   {r.publish_at or 'published on upload'} - {r.title}")
+        else:
+            # Calculate next upload times (for manual scheduling)
+            spacing = strategy.get('upload_spacing_hours', 4)
+            now = datetime.now()
+            log(f"📅 Suggested upload schedule ({spacing}h spacing):")
+            for i, r in enumerate(uploaded):
+                upload_time = now + timedelta(hours=i * spacing)
+                log(f"   {upload_time.strftime('%I:%M %p')} - {r.title}")
         
     else:
         log("❌ No videos uploaded")
+    for r in failed:
+        log(f"   ✗ {r.title}: {r.status}")
     
     log("=" * 70)
     
@@ -199,7 +203,7 @@ def generate_report(strategy, results, duration_seconds):
         "date": datetime.now().isoformat(),
         "duration_seconds": duration_seconds,
         "strategy": strategy,
-        "results": results or [],
+        "results": [r.to_json() for r in results or []],
     }
 
 
@@ -212,6 +216,8 @@ def main():
     parser.add_argument("--storyboard", help="Override storyboard path")
     parser.add_argument("--privacy", default="public", choices=["public", "unlisted", "private"])
     parser.add_argument("--skip-analytics", action="store_true", help="Skip analytics check")
+    parser.add_argument("--gpu-window", type=float, help="Hours of GPU time tonight; only videos that fit are made")
+    parser.add_argument("--slots", help="Publish times HH:MM,HH:MM (default: out/publish_slots.json)")
     args = parser.parse_args()
     
     start_time = datetime.now()
@@ -244,7 +250,12 @@ def main():
         log("")
         
         # 3. Generate and upload
-        results = run_batch_generation(storyboard_path, args.privacy)
+        results = run_batch_generation(
+            storyboard_path,
+            args.privacy,
+            args.gpu_window,
+            [t.strip() for t in args.slots.split(",")] if args.slots else None,
+        )
         
         if results is None:
             log("❌ Generation failed")
@@ -12,16 +12,30 @@ import time
 import shutil
 from pathlib import Path
 
-# Force UTF-8
-if sys.platform == 'win32':
+# Force UTF-8 (only when run as a script, not when imported)
+if sys.platform == 'win32' and __name__ == "__main__":
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.detach(), encoding='utf-8', errors='replace', line_buffering=True)
     sys.stderr = io.TextIOWrapper(sys.stderr.detach(), encoding='utf-8', errors='replace', line_buffering=True)
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from t2v_shorts.audiomix import mix_graph, mix_inputs, prepare_bed, select_mix
+from t2v_shorts.interpolate import interpolate_filter
+from t2v_shorts import journal as jobs
+from t2v_shorts.planner import estimated_savings, plan_fps, plan_resolution
+from t2v_shorts.prefetch import Prefetcher
+from t2v_shorts.progress import ProgressMonitor, printer, run_monitored
+from t2v_shorts.prompt_expander import expand_prompt
+from t2v_shorts.quality import analyze_clip
+from t2v_shorts.scene_cache import SceneCache, scene_key
+from t2v_shorts.seeds import DERIVED, scene_seed
+from t2v_shorts.trace import span
+
 from config_loader import get_wangp_dir
 WAN2GP_DIR = get_wangp_dir()
 WANGP_PYTHON = WAN2GP_DIR / "venv" / "Scripts" / "python.exe"
 OUTPUTS_DIR = WAN2GP_DIR / "outputs"
+SCENE_TIMEOUT = 3600  # hard cap per attempt; stalls are caught much earlier
 
 def log(msg):
     print(f"[{time.strftime('%H:%M:%S')}] {msg}")
@@ -64,11 +78,14 @@ def create_queue_json(prompt, *, width, height, num_frames, fps, steps=20, cfg=6
     }
     return [task]
 
-def generate_scene(prompt, scene_num, *, width, height, num_frames, fps, max_retries=2):
+def generate_scene(prompt, scene_num, *, width, height, num_frames, fps, max_retries=2, seed_for=None):
     """
     Generate one scene using WanGP
     
-    Returns: Path to generated video or None
+    seed_for(attempt) gives the seed of each attempt (1-based, see t2v_shorts/seeds.py);
+    without it WanGP picks a random seed (-1).
+    
+    Returns: (path, seed) of the generated video, or (None, None)
     """
     log(f"Scene {scene_num}: Generating...")
     
@@ -78,7 +95,8 @@ def generate_scene(prompt, scene_num, *, width, height, num_frames, fps, max_ret
         
         # Create queue file
         import zipfile
-        queue_data = create_queue_json(prompt, width=width, height=height, num_frames=num_frames, fps=fps)
+        seed = seed_for(attempt + 1) if seed_for else -1
+        queue_data = create_queue_json(prompt, width=width, height=height, num_frames=num_frames, fps=fps, seed=seed)
         queue_file = str(WAN2GP_DIR / "temp_queue.zip")
         
         with zipfile.ZipFile(queue_file, 'w') as zf:
@@ -91,37 +109,43 @@ def generate_scene(prompt, scene_num, *, width, height, num_frames, fps, max_ret
             "--process", queue_file
         ]
         
-        log(f"  Attempt {attempt + 1}/{max_retries}...")
+        log(f"  Attempt {attempt + 1}/{max_retries} (seed {seed})...")
         
         try:
-            result = subprocess.run(
+            # No fixed timeout: a run is killed once WanGP stops making progress
+            # (see t2v_shorts/progress.py), long scenes may take as long as they need.
+            result = run_monitored(
                 cmd,
-                cwd=str(WAN2GP_DIR),
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout per scene
+                cwd=WAN2GP_DIR,
+                monitor=ProgressMonitor(f"scene {scene_num}"),
+                on_progress=printer("  ", write=log),
+                timeout=SCENE_TIMEOUT,
             )
+            if result.stalled:
+                log(f"  Stalled at {result.last}, killed (attempt {attempt + 1})")
+                continue
+            if result.timed_out:
+                log(f"  Timeout after {SCENE_TIMEOUT}s (attempt {attempt + 1})")
+                continue
             
             # Find generated video
             videos = list(OUTPUTS_DIR.glob("*.mp4"))
             if videos:
                 latest = max(videos, key=lambda p: p.stat().st_mtime)
+                report = analyze_clip(latest, fps=fps, expected_frames=num_frames)
+                if not report.ok:
+                    # the next attempt has a seed of its own
+                    log(f"  Bad clip ({', '.join(report.issues)}), regenerating (attempt {attempt + 1})")
+                    continue
                 log(f"  SUCCESS: {latest.name}")
                 os.remove(queue_file)
-                return latest
+                return latest, seed
             else:
-                log(f"  No output file (attempt {attempt + 1})")
-                if result.stdout:
-                    tail = "\n".join(result.stdout.splitlines()[-30:])
-                    log("  --- WanGP stdout (tail) ---")
-                    print(tail)
-                if result.stderr:
-                    tail = "\n".join(result.stderr.splitlines()[-30:])
-                    log("  --- WanGP stderr (tail) ---")
-                    print(tail)
+                log(f"  No output file (attempt {attempt + 1}, exit code {result.returncode})")
+                if result.tail:
+                    log("  --- WanGP output (tail) ---")
+                    print("\n".join(result.tail))
                 
-        except subprocess.TimeoutExpired:
-            log(f"  Timeout (attempt {attempt + 1})")
         except Exception as e:
             log(f"  Error: {e}")
         
@@ -129,16 +153,16 @@ def generate_scene(prompt, scene_num, *, width, height, num_frames, fps, max_ret
             time.sleep(3)
     
     log(f"  FAILED after {max_retries} attempts")
-    return None
+    return None, None
 
 def concatenate_videos(video_files, output):
     """Concatenate multiple videos with FFmpeg"""
     log(f"Concatenating {len(video_files)} videos...")
     
-    concat_list = "concat.txt"
+    concat_list = str(Path(output).with_suffix(".txt"))
     with open(concat_list, "w") as f:
         for vid in video_files:
-            f.write(f"file '{vid}'\n")
+            f.write(f"file '{Path(vid).resolve().as_posix()}'\n")
     
     cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", concat_list,
            "-c", "copy", "-y", output]
@@ -153,20 +177,24 @@ def concatenate_videos(video_files, output):
         log(f"  Concat failed")
         return None
 
+def caption_filter(text, start=None, end=None):
+    """drawtext for one caption (whole clip, or between start and end seconds)"""
+    if not text:
+        return None
+    text = text.replace("'", "").replace('"', '')  # Remove quotes
+    f = (
+        f"drawtext=text='{text}':fontsize=48:fontcolor=white:"
+        f"bordercolor=black:borderw=3:x=(w-text_w)/2:y=h-th-80"
+    )
+    if start is not None:
+        f += f":enable='between(t,{start},{end})'"
+    return f
+
 def add_captions(input_video, captions, output_video):
     """Add captions with FFmpeg drawtext"""
     log(f"Adding {len(captions)} captions...")
     
-    filters = []
-    for cap in captions:
-        text = cap["text"].replace("'", "").replace('"', '')  # Remove quotes
-        filters.append(
-            f"drawtext=text='{text}':fontsize=48:fontcolor=white:"
-            f"bordercolor=black:borderw=3:x=(w-text_w)/2:y=h-th-80:"
-            f"enable='between(t,{cap['start']},{cap['end']})'"
-        )
-    
-    filter_str = ",".join(filters)
+    filter_str = ",".join(caption_filter(cap["text"], cap["start"], cap["end"]) for cap in captions)
     
     cmd = ["ffmpeg", "-i", input_video, "-vf", filter_str,
            "-c:v", "libx264", "-preset", "medium", "-crf", "23",
@@ -179,26 +207,40 @@ def add_captions(input_video, captions, output_video):
         return output_video
     return None
 
-def convert_to_shorts(input_video, output_video):
+def convert_to_shorts(input_video, output_video, pre=None, audio=None, duration=None, keep_audio=True):
     """Convert any video to YouTube Shorts portrait format (1080x1920, 9:16).
 
     WanGP outputs landscape (832x480). This function converts it to portrait
     using a blurred background + centered foreground approach (TikTok style).
     Works correctly for both landscape AND portrait inputs.
+
+    pre: optional filter run on the source first (e.g. frame interpolation).
+    audio: optional t2v_shorts.audiomix.AudioMix (music bed / narration) mixed in
+    this same pass, replacing the source audio; needs duration (seconds).
+    keep_audio: with no audio mix, copy the source audio (False: video only).
     """
     log("Converting to Shorts portrait format (1080x1920)...")
 
     # Blur background fills top/bottom; original video centered in the middle.
     # This is the proven approach used for shelter_dog shorts (correct 1080x1920).
+    src_bg, src_fg, head = "[0:v]", "[0:v]", ""
+    if pre:
+        src_bg, src_fg, head = "[src_bg]", "[src_fg]", f"[0:v]{pre},split=2[src_bg][src_fg];"
+    graph = (
+        f"{head}"
+        f"{src_bg}scale=1080:-1,boxblur=30:5,"
+        "scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920[bg];"
+        f"{src_fg}scale=1080:-1:flags=lanczos[fg];"
+        "[bg][fg]overlay=0:(H-h)/2[v]"
+    )
+    maps = ["-map", "[v]", "-map", "0:a?"] if keep_audio else ["-map", "[v]", "-an"]
+    if audio:
+        graph += ";" + mix_graph(audio, duration=duration)
+        maps = ["-map", "[v]", "-map", "[aout]", "-t", f"{duration:.3f}"]
     cmd = [
-        "ffmpeg", "-i", input_video,
-        "-filter_complex",
-        (
-            "[0:v]scale=1080:-1,boxblur=30:5,"
-            "scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920[bg];"
-            "[0:v]scale=1080:-1[fg];"
-            "[bg][fg]overlay=0:(H-h)/2"
-        ),
+        "ffmpeg", "-i", input_video, *(mix_inputs(audio) if audio else []),
+        "-filter_complex", graph,
+        *maps,
         "-c:v", "libx264", "-preset", "medium", "-crf", "23",
         "-pix_fmt", "yuv420p",
         "-c:a", "aac", "-b:a", "128k",
@@ -219,104 +261,249 @@ def convert_to_shorts(input_video, output_video):
         print("\n".join(result.stderr.splitlines()[-30:]))
     return None
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python generate_shorts_wangp.py <storyboard.json> <output.mp4>")
-        sys.exit(1)
-    
-    storyboard_file = sys.argv[1]
-    output_file = sys.argv[2]
-    
-    log("="*60)
-    log("WanGP YouTube Shorts Generator")
-    log("="*60)
-    log(f"Storyboard: {storyboard_file}")
-    log(f"Output: {output_file}")
-    
-    # Load storyboard
-    with open(storyboard_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
+def finish_scene(scene_file, output_video, pre, audio, duration):
+    """Captions + Shorts layout for one scene clip, timed as a "finish" stage.
+
+    audio: future of prepare_audio. The scene's own audio is kept unless a
+    music bed / narration replaces it after concat.
+    duration: the scene's length in seconds (the work the runtime predictor fits).
+    """
+    keep_audio = not audio.result()
+    with span("finish", backend="wangp", out=output_video, out_width=1080, out_height=1920, duration=duration) as t:
+        ok = convert_to_shorts(scene_file, output_video, pre=pre or None, keep_audio=keep_audio)
+        t["produced"] = bool(ok)
+    return ok
+
+def prepare_audio(data, defaults, root, duration, work_dir):
+    """Select the music bed / narration and render the normalized bed ahead of time"""
+    audio = select_mix(
+        defaults.get('music'),
+        channel=data.get('channel') or 'default',
+        category=defaults.get('musicCategory'),
+        narration=data.get('narration'),
+        root=root,
+    )
+    if audio and audio.bed:
+        audio = prepare_bed(audio, duration=duration, out_path=Path(work_dir) / "bed.wav")
+    return audio
+
+def mux_audio(input_video, output_video, audio, duration):
+    """Mix the audio into a finished video, copying the video stream"""
+    log("Adding audio...")
+    cmd = [
+        "ffmpeg", "-i", input_video, *mix_inputs(audio),
+        "-filter_complex", mix_graph(audio, duration=duration),
+        "-map", "0:v", "-map", "[aout]", "-t", f"{duration:.3f}",
+        "-c:v", "copy", "-c:a", "aac", "-b:a", "128k",
+        "-y", output_video,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode == 0:
+        return output_video
+    log("  Adding audio failed")
+    if result.stderr:
+        print("\n".join(result.stderr.splitlines()[-30:]))
+    return None
+
+def generate_short(data, output_file):
+    """Generate one Short from a storyboard dict (single video, or the first video
+    of a series) into output_file. Resumes from the journal; returns the output
+    path or raises RuntimeError."""
+    output_file = str(output_file)
+
     # Defaults (support both single-video and series storyboards)
     defaults = data.get('default', {}) if isinstance(data, dict) else {}
     scene_seconds = float(defaults.get('sceneSeconds', 3))
     fps = int(defaults.get('fps', 24))
     width = int(defaults.get('width', 480))
     height = int(defaults.get('height', 832))
+    # With default.interpolate, WanGP renders fewer frames and convert_to_shorts
+    # interpolates back up to the storyboard fps.
+    out_fps = fps
+    fps_plan = plan_fps("wangp", fps, int(round(scene_seconds)), interpolate=bool(defaults.get('interpolate')))
+    fps = fps_plan.gen_fps
     num_frames = int(scene_seconds * fps) + 1  # WanGP expects frame count
 
+    # Generate at WanGP's native size; convert_to_shorts upscales to 1080x1920 on the CPU.
+    plan = plan_resolution("wangp", width, height)
+    saved = estimated_savings("wangp", plan, num_frames)
+    width, height = plan.gen_width, plan.gen_height
+
     log(f"Render: {width}x{height} @ {fps}fps, {scene_seconds:.1f}s/scene ({num_frames} frames)")
+    if fps_plan.interpolates:
+        log(f"  (interpolating {fps} -> {out_fps} fps in finishing)")
+    if plan.upscales:
+        log(f"  (storyboard asks {plan.out_width}x{plan.out_height}; ~{saved:.0f}s GPU saved per scene)")
 
     # Get scenes
     scenes = data.get('scenes', [])
+    video_data = data
     if not scenes and 'videos' in data:
         videos = data['videos']
         if videos:
-            scenes = videos[0].get('scenes', [])
+            video_data = videos[0]
+            scenes = video_data.get('scenes', [])
     
     if not scenes:
-        log("ERROR: No scenes in storyboard")
-        sys.exit(1)
+        raise RuntimeError("No scenes in storyboard")
     
     log(f"Scenes to generate: {len(scenes)}")
     log("")
     
-    # Generate scenes
-    scene_files = []
-    for i, scene in enumerate(scenes, 1):
-        prompt = scene.get('prompt', '')
-        if not prompt:
-            log(f"Scene {i}: No prompt, skipping")
-            continue
-        
-        video = generate_scene(prompt, i, width=width, height=height, num_frames=num_frames, fps=fps)
-        if video:
-            # Copy to safe location
-            safe_path = f"scene_{i}.mp4"
-            shutil.copy(video, safe_path)
-            scene_files.append(safe_path)
-        else:
-            log(f"Scene {i}: Generation failed")
-            sys.exit(1)
+    # Scene clips and intermediates live in a per-output work dir; the journal
+    # (out/journal.sqlite) records each finished scene so a re-run resumes.
+    root = Path(__file__).resolve().parents[1]
+    job = Path(output_file).stem
+    work_dir = root / "temp" / "wangp" / job
+    work_dir.mkdir(parents=True, exist_ok=True)
+    expand = bool(defaults.get('expandPrompts'))
+    duration = scene_seconds * len(scenes)
+    interp = interpolate_filter(out_fps) if fps_plan.interpolates else None
     
-    if not scene_files:
-        log("ERROR: No scenes generated")
-        sys.exit(1)
+    with jobs.Journal(root / jobs.JOURNAL_PATH) as journal, Prefetcher() as cpu, \
+            SceneCache(root / "out" / "scenes.sqlite", clip_dir=root / "out" / "cache" / "scenes") as cache:
+        video_fp = jobs.fingerprint(scenes, width, height, num_frames, fps, out_fps, defaults.get('music'), expand)
+        if journal.done(job, jobs.FINISHED, fingerprint=video_fp):
+            log(f"Already finished (journal): {output_file}")
+            return Path(output_file)
+        
+        # CPU work for later runs while WanGP has the GPU: prompt expansion,
+        # the audio bed (selection + loudness normalization), and finishing
+        # (captions + Shorts layout) of every scene clip as soon as it lands.
+        if expand:
+            for i, scene in enumerate(scenes, 1):
+                if scene.get('prompt'):
+                    cpu.submit(("prompt", i), expand_prompt, scene['prompt'])
+        # Submitted before any finish step, so it is done by the time one needs it.
+        audio_ready = cpu.submit("audio", prepare_audio, data, defaults, root, duration, work_dir)
+        
+        finished = []
+        for i, scene in enumerate(scenes, 1):
+            prompt = scene.get('prompt', '')
+            if not prompt:
+                log(f"Scene {i}: No prompt, skipping")
+                continue
+            
+            key = f"{job}/scene_{i:02d}"
+            fp = jobs.fingerprint(prompt, width, height, num_frames, fps, expand)
+            done = journal.done(key, jobs.GENERATED, fingerprint=fp)
+            # Same scene rendered before (here or in another storyboard), or an opted-in near-duplicate
+            clip_key = scene.get('reuse') or scene_key(
+                prompt, backend="wangp", width=width, height=height, fps=fps, frames=num_frames, seed=DERIVED, expand=expand
+            )
+            cached = None if done else cache.get(clip_key)
+            if done:
+                log(f"Scene {i}: already generated, reusing {Path(done.path).name}")
+                scene_file = done.path
+            elif cached:
+                seed = cache.params(clip_key).get('seed')
+                log(f"Scene {i}: reusing rendered clip {clip_key} (seed {seed})")
+                scene_file = str(work_dir / f"scene_{i:02d}.mp4")
+                shutil.copy(cached, scene_file)
+                journal.set(key, jobs.GENERATED, fingerprint=fp, path=scene_file, detail={"seed": seed, "reused": clip_key})
+            else:
+                journal.set(key, jobs.GENERATING, fingerprint=fp)
+                if expand:
+                    prompt = cpu.get(("prompt", i))
+                
+                with span(
+                    "generate",
+                    backend="wangp",
+                    model_type=os.environ.get("WANGP_MODEL_TYPE", "t2v"),
+                    steps=int(os.environ.get("WANGP_STEPS", "20")),
+                    scene=i,
+                    frames=num_frames,
+                    gen_width=width,
+                    gen_height=height,
+                    out_width=plan.out_width,
+                    out_height=plan.out_height,
+                    est_saved_seconds=round(saved, 1),
+                    out=output_file,
+                ) as t:
+                    # Seeds follow the storyboard scene (not the expanded prompt), so reruns repeat them.
+                    video, seed = generate_scene(
+                        prompt, i, width=width, height=height, num_frames=num_frames, fps=fps,
+                        seed_for=lambda attempt: scene_seed(data, video_data, i, scene['prompt'], attempt),
+                    )
+                    t["produced"] = bool(video)
+                    t["seed"] = seed
+                if not video:
+                    raise RuntimeError(f"Scene {i}: Generation failed")
+                # Move out of WanGP outputs/ so the clip isn't kept twice
+                scene_file = str(work_dir / f"scene_{i:02d}.mp4")
+                shutil.move(video, scene_file)
+                journal.set(key, jobs.GENERATED, path=scene_file, detail={"seed": seed})
+                cache.put(clip_key, scene['prompt'], Path(scene_file), backend="wangp", seed=seed)
+            
+            # Finish this scene on the CPU while the next one generates.
+            caption = scene.get('caption', f'Scene {i}')
+            pre = ",".join(f for f in (caption_filter(caption), interp) if f)
+            finished_file = str(work_dir / f"scene_{i:02d}_short.mp4")
+            cpu.submit(("finish", i), finish_scene, scene_file, finished_file, pre, audio_ready, scene_seconds)
+            finished.append((i, scene_file, finished_file))
+        
+        if not finished:
+            raise RuntimeError("No scenes generated")
+        
+        log("")
+        
+        # Scenes were finished (and timed) in the background; this is the wait for the
+        # last of them plus concat and audio mux, kept out of the "finish" samples.
+        with span("assemble", backend="wangp", out=output_file, duration=duration):
+            for i, _, finished_file in finished:
+                if not cpu.get(("finish", i)):
+                    raise RuntimeError(f"Scene {i}: Shorts conversion failed")
+            
+            base = Path(output_file).stem
+            concat = str(work_dir / f"{base}_concat.mp4")
+            if not concatenate_videos([f for _, _, f in finished], concat):
+                raise RuntimeError(f"Concat failed: {concat}")
+            
+            # Music bed / narration from default.music, default.musicCategory, narration
+            audio = cpu.get("audio")
+            if audio:
+                if not mux_audio(concat, output_file, audio, duration):
+                    raise RuntimeError(f"Adding audio failed: {output_file}")
+                os.remove(concat)
+            else:
+                shutil.move(concat, output_file)
+        journal.set(job, jobs.FINISHED, fingerprint=video_fp, path=Path(output_file).resolve())
     
-    log("")
+    # Cleanup
+    try:
+        for _, scene_file, finished_file in finished:
+            os.remove(scene_file)
+            os.remove(finished_file)
+        (work_dir / "bed.wav").unlink(missing_ok=True)
+        log("Cleanup complete")
+    except:
+        pass
     
-    # Concatenate
-    base = Path(output_file).stem
-    concat = f"{base}_concat.mp4"
-    if not concatenate_videos(scene_files, concat):
+    return Path(output_file)
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python generate_shorts_wangp.py <storyboard.json> <output.mp4>")
         sys.exit(1)
     
-    # Captions
-    captions = []
-    t = 0.0
-    for i, scene in enumerate(scenes):
-        captions.append({
-            "text": scene.get('caption', f'Scene {i+1}'),
-            "start": t,
-            "end": t + scene_seconds
-        })
-        t += scene_seconds
+    storyboard_file = sys.argv[1]
+    output_file = sys.argv[2]
     
-    captioned = f"{base}_captioned.mp4"
-    if not add_captions(concat, captions, captioned):
-        sys.exit(1)
+    log("="*60)
+    log("WanGP YouTube Shorts Generator")
+    log("="*60)
+    log(f"Storyboard: {storyboard_file}")
+    log(f"Output: {output_file}")
     
-    # Convert
-    if not convert_to_shorts(captioned, output_file):
-        sys.exit(1)
+    # Load storyboard
+    with open(storyboard_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
     
-    # Cleanup
     try:
-        for f in scene_files + [concat, captioned]:
-            os.remove(f)
-        log("Cleanup complete")
-    except:
-        pass
+        generate_short(data, output_file)
+    except RuntimeError as e:
+        log(f"ERROR: {e}")
+        sys.exit(1)
     
     log("")
     log("="*60)
@@ -2,7 +2,6 @@ from __future__ import annotations
 
 import argparse
 import json
-import random
 import subprocess
 from pathlib import Path
 
@@ -12,6 +11,8 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from t2v_shorts.config import GenerateRequest
 from t2v_shorts.pipeline import run
+from t2v_shorts.seeds import DERIVED, scene_seed
+from t2v_shorts.storyboard import run_storyboard
 
 
 def concat_scenes(scene_paths: list[Path], out_path: Path) -> None:
@@ -67,6 +68,7 @@ def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--storyboard", required=True)
     ap.add_argument("--privacy", default="public", choices=["public", "unlisted", "private"])
+    ap.add_argument("--preview", action="store_true", help="Render a fast 360x640 preview; no upload")
     args = ap.parse_args()
 
     root = Path(__file__).resolve().parents[1]
@@ -74,6 +76,11 @@ def main() -> None:
     if not sb_path.is_absolute():
         sb_path = (root / sb_path).resolve()
 
+    if args.preview:
+        for out in run_storyboard(sb_path, root=root, preview=True):
+            print("Preview:", out)
+        return
+
     sb = json.loads(sb_path.read_text(encoding="utf-8"))
 
     default = sb["default"]
@@ -89,7 +96,7 @@ def main() -> None:
 
     scene_paths: list[Path] = []
     for i, s in enumerate(scenes, start=1):
-        seed = random.randint(1, 2**31 - 1)
+        seed = scene_seed(sb, sb, i, s["prompt"])
         out_scene = temp_dir / f"scene_{i:02d}.mp4"
 
         # Allow variable per-scene durations (e.g., 2s, 3s, etc.)
@@ -101,6 +108,7 @@ def main() -> None:
             seconds=scene_seconds,
             fps=int(default["fps"]),
             seed=seed,
+            seed_policy=DERIVED,
             backend=default["backend"],
             out=str(out_scene),
             width=int(default["width"]),
@@ -11,7 +11,6 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
-import time
 import json
 import subprocess
 from pathlib import Path
@@ -20,7 +19,12 @@ from config_loader import get_wangp_dir, get_project_root
 ROOT = get_project_root()
 wangp_dir = get_wangp_dir()
 sys.path.insert(0, str(wangp_dir))
+sys.path.insert(0, str(ROOT))
 from generate_video import generate_video
+from t2v_shorts.predictor import estimate
+from t2v_shorts.scheduler import GpuJob, GpuScheduler
+from t2v_shorts.slots import SlotBook, assign_slots, slots_for, to_clock
+from youtube_upload import upload_video
 
 # Channel configurations
 CHANNELS = [
@@ -28,56 +32,56 @@ CHANNELS = [
         'name': 'AI Tools Daily',
         'token': 'aitools',
         'storyboard': 'storyboards/series_2026-02-17_aitools.json',
-        'output_dir': 'out/aitools'
+        'output_dir': 'out/aitools',
+        'weight': 1.0,
     },
     {
         'name': 'Finance Freedom',
         'token': 'finance',
         'storyboard': 'storyboards/series_2026-02-17_finance.json',
-        'output_dir': 'out/finance'
+        'output_dir': 'out/finance',
+        'weight': 1.0,
     },
     {
         'name': 'Sleep Sounds Haven',
         'token': 'sleepsounds',
         'storyboard': 'storyboards/series_2026-02-17_sleepsounds.json',
-        'output_dir': 'out/sleepsounds'
+        'output_dir': 'out/sleepsounds',
+        'weight': 1.0,
     }
 ]
 
-def generate_and_upload_video(video_data, channel_token, output_dir):
-    """Generate one video and upload to specified channel"""
+def generate_scene(scene, i, total, temp_dir):
+    """GPU step: generate one scene into temp_dir (run by the scheduler)"""
+    print(f"[Scene {i}/{total}] {scene['caption']}")
+    wangp_outputs = wangp_dir / "outputs"
     
-    print(f"\n{'='*70}")
-    print(f"VIDEO: {video_data['title']}")
-    print(f"{'='*70}\n")
+    result = generate_video(scene["prompt"], output_dir=str(wangp_outputs))
+    if not result:
+        print(f"ERROR: Scene {i} failed!")
+        return None
     
-    # Generate scenes
-    wangp_outputs = wangp_dir / "outputs"
-    temp_dir = ROOT / "temp" / video_data['slug']
-    temp_dir.mkdir(parents=True, exist_ok=True)
+    output_files = sorted(wangp_outputs.glob("*.mp4"), key=lambda p: p.stat().st_mtime, reverse=True)
+    if not output_files:
+        print(f"ERROR: No video found for scene {i}")
+        return None
     
-    scene_files = []
-    for i, scene in enumerate(video_data["scenes"], 1):
-        print(f"[Scene {i}/{len(video_data['scenes'])}] {scene['caption']}")
-        
-        result = generate_video(scene["prompt"], output_dir=str(wangp_outputs))
-        if not result:
-            print(f"ERROR: Scene {i} failed!")
-            continue
-        
-        output_files = sorted(wangp_outputs.glob("*.mp4"), key=lambda p: p.stat().st_mtime, reverse=True)
-        if not output_files:
-            print(f"ERROR: No video found for scene {i}")
-            continue
-        
-        scene_file = temp_dir / f"scene_{i:02d}.mp4"
-        scene_file.write_bytes(output_files[0].read_bytes())
-        scene_files.append(scene_file)
-        output_files[0].unlink()
-        
-        print(f"✓ Scene {i} saved")
-        time.sleep(2)
+    scene_file = temp_dir / f"scene_{i:02d}.mp4"
+    scene_file.write_bytes(output_files[0].read_bytes())
+    output_files[0].unlink()
+    
+    print(f"✓ Scene {i} saved")
+    return scene_file
+
+
+def finish_video(video_data, channel_token, output_dir, scene_results, book=None):
+    """CPU step: combine, caption and upload once all scenes are generated"""
+    
+    print(f"\n{'='*70}")
+    print(f"FINISHING: {video_data['title']} ({channel_token})")
+    print(f"{'='*70}\n")
     
+    scene_files = [f for f in scene_results if f]
     if len(scene_files) != len(video_data["scenes"]):
         print(f"⚠️ WARNING: Only {len(scene_files)}/{len(video_data['scenes'])} scenes generated")
     
@@ -133,32 +137,26 @@ def generate_and_upload_video(video_data, channel_token, output_dir):
     # Upload
     print(f"\n📤 Uploading...")
     
-    upload_result = subprocess.run([
-        sys.executable,
-        "scripts/youtube_upload.py",
-        "--file", str(captioned_path),
-        "--title", video_data["title"],
-        "--description", video_data["description"],
-        "--privacy", "public",
-        "--channel", channel_token
-    ], capture_output=True, text=True, cwd=Path.cwd())
-    
-    url = None
-    for line in upload_result.stdout.split('\n'):
-        if 'URL:' in line or 'youtube.com/watch' in line:
-            url = line.split('URL:')[-1].strip() if 'URL:' in line else line.strip()
-            break
-    
-    if url:
-        print(f"✅ UPLOADED: {url}")
-        return {
-            "title": video_data["title"],
-            "url": url,
-            "slug": video_data["slug"]
-        }
-    else:
-        print(f"⚠️ Upload may have succeeded but couldn't extract URL")
+    try:
+        result = upload_video(
+            captioned_path,
+            title=video_data["title"],
+            description=video_data["description"],
+            privacy="public",
+            channel=channel_token,
+            publish_at=book.take() if book else None,
+            progress=False,
+        )
+    except Exception as e:
+        print(f"❌ Upload failed: {e}")
         return None
+    
+    print(f"✅ UPLOADED: {result.url}" + (f" (publishes {result.publish_at})" if result.publish_at else ""))
+    return {
+        "title": video_data["title"],
+        "url": result.url,
+        "slug": video_data["slug"]
+    }
 
 # Main execution
 print("\n" + "="*70)
@@ -168,29 +166,58 @@ print("Total videos to generate: 12")
 print("Estimated time: 2-3 hours")
 print("="*70 + "\n")
 
-all_results = {}
+# One scheduler owns the GPU: scenes from all channels are interleaved by
+# channel weight, and each video's combine/caption/upload runs on a CPU worker
+# while the GPU moves on.
+scheduler = GpuScheduler({c['token']: c['weight'] for c in CHANNELS})
+futures = {}
 
 for channel in CHANNELS:
-    print(f"\n{'#'*70}")
-    print(f"# CHANNEL: {channel['name']}")
-    print(f"# Token: {channel['token']}")
-    print(f"{'#'*70}\n")
-    
     # Load storyboard
     storyboard_path = Path(channel['storyboard'])
     data = json.loads(storyboard_path.read_text(encoding='utf-8'))
     
+    # Publish slots (out/publish_slots.json): each video gets a render deadline
+    # before its slot; the scheduler runs at-risk videos first.
+    est = estimate(data, backend="wangp")
+    slots = slots_for(channel['token'], 2 * len(data["videos"]), root=ROOT)
+    plan = assign_slots([(v.title, v.total) for v in est.videos], slots) if slots else []
+    book = SlotBook(slots) if slots else None
+    
+    futures[channel['name']] = []
+    for n, video_data in enumerate(data["videos"]):
+        temp_dir = ROOT / "temp" / video_data['slug']
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        total = len(video_data["scenes"])
+        scenes = [
+            (lambda scene=scene, i=i, total=total, temp_dir=temp_dir: generate_scene(scene, i, total, temp_dir))
+            for i, scene in enumerate(video_data["scenes"], 1)
+        ]
+        deadline = plan[n].deadline if plan else None
+        if deadline:
+            print(f"  {video_data['slug']}: publish {plan[n].publish_at:%a %H:%M}, render by {deadline:%H:%M}")
+        futures[channel['name']].append(scheduler.submit(GpuJob(
+            channel=channel['token'],
+            name=video_data['slug'],
+            scenes=scenes,
+            finish=lambda results, v=video_data, c=channel, b=book: finish_video(v, c['token'], c['output_dir'], results, b),
+            deadline=to_clock(deadline) if deadline else None,
+            est_scene_seconds=est.videos[n].generate.seconds / max(total, 1),
+        )))
+    print(f"Queued {len(data['videos'])} videos for {channel['name']} ({channel['token']})")
+
+scheduler.run_until_idle()
+
+all_results = {}
+for channel in CHANNELS:
     channel_results = []
-    
-    for video_idx, video_data in enumerate(data["videos"], 1):
-        print(f"\n[Video {video_idx}/4]")
-        result = generate_and_upload_video(video_data, channel['token'], channel['output_dir'])
-        if result:
-            channel_results.append(result)
-    
+    for fut in futures[channel['name']]:
+        if fut.exception():
+            print(f"❌ {channel['name']}: {fut.exception()}")
+        elif fut.result():
+            channel_results.append(fut.result())
     all_results[channel['name']] = channel_results
-    
-    print(f"\n✅ {channel['name']}: {len(channel_results)}/4 videos uploaded!")
+    print(f"\n✅ {channel['name']}: {len(channel_results)}/{len(futures[channel['name']])} videos uploaded!")
 
 # Final summary
 print("\n" + "="*70)
@@ -2,14 +2,17 @@ from __future__ import annotations
 
 import argparse
 import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
 
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from google.oauth2.credentials import Credentials
 
-# Force UTF-8 output on Windows
-if sys.platform == 'win32':
+# Force UTF-8 output on Windows (only when run as a script, not when imported)
+if sys.platform == 'win32' and __name__ == "__main__":
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
@@ -28,43 +31,74 @@ def get_creds(channel: str = "main") -> Credentials:
         token_path = root / "out" / f"youtube_token_{channel}.json"
     
     if not token_path.exists():
-        raise SystemExit(
+        raise RuntimeError(
             f"Missing token at {token_path}. Run: .\\.venv\\Scripts\\python scripts\\youtube_auth.py"
         )
     return Credentials.from_authorized_user_file(str(token_path), SCOPES)
 
 
-def main() -> None:
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--file", required=True)
-    ap.add_argument("--title", required=True)
-    ap.add_argument("--description", default="")
-    ap.add_argument("--tags", default="")
-    ap.add_argument("--privacy", choices=["public", "unlisted", "private"], default="public")
-    ap.add_argument("--category", default="22")
-    ap.add_argument("--channel", choices=["main", "aitools", "dogs", "finance", "sleepsounds"], default="main", 
-                    help="Which channel to upload to (uses corresponding token)")
-    args = ap.parse_args()
-
-    video_path = Path(args.file)
+# API clients are built once per channel and thread (httplib2 connections
+# aren't thread-safe), so callers uploading in a loop or from a worker pool
+# don't pay the discovery/auth startup per video.
+_clients = threading.local()
+
+
+def youtube_client(channel: str = "main"):
+    cache = _clients.__dict__.setdefault("by_channel", {})
+    if channel not in cache:
+        cache[channel] = build("youtube", "v3", credentials=get_creds(channel))
+    return cache[channel]
+
+
+@dataclass(frozen=True)
+class UploadResult:
+    title: str
+    video_id: str
+    url: str
+    privacy: str
+    publish_at: str | None = None  # RFC 3339 UTC, when scheduled
+
+
+def upload_video(
+    video_path: Path,
+    *,
+    title: str,
+    description: str = "",
+    tags: list[str] | None = None,
+    privacy: str = "public",
+    category: str = "22",
+    channel: str = "main",
+    publish_at: datetime | None = None,
+    progress: bool = True,
+) -> UploadResult:
+    """Upload one video with a resumable request; raises RuntimeError on failure.
+
+    With publish_at the video is uploaded private and YouTube publishes it at
+    that time (privacy is ignored).
+    """
+    video_path = Path(video_path)
     if not video_path.exists():
-        raise SystemExit(f"File not found: {video_path}")
-
-    creds = get_creds(args.channel)
-    youtube = build("youtube", "v3", credentials=creds)
+        raise FileNotFoundError(f"File not found: {video_path}")
 
+    youtube = youtube_client(channel)
     body = {
         "snippet": {
-            "title": args.title,
-            "description": args.description,
-            "tags": [t.strip() for t in args.tags.split(",") if t.strip()],
-            "categoryId": args.category,
+            "title": title,
+            "description": description or "",
+            "tags": [str(t).strip() for t in (tags or []) if str(t).strip()],
+            "categoryId": str(category or "22"),
         },
         "status": {
-            "privacyStatus": args.privacy,
+            "privacyStatus": privacy,
             "selfDeclaredMadeForKids": False,
         },
     }
+    scheduled = None
+    if publish_at is not None:
+        # publishAt only works on private videos
+        scheduled = publish_at.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        body["status"].update(privacyStatus="private", publishAt=scheduled)
+        privacy = "private"
 
     media = MediaFileUpload(str(video_path), mimetype="video/mp4", chunksize=-1, resumable=True)
 
@@ -72,12 +106,49 @@ def main() -> None:
     resp = None
     while resp is None:
         status, resp = req.next_chunk()
-        if status:
+        if status and progress:
             print(f"Upload progress: {int(status.progress() * 100)}%")
 
     video_id = resp.get("id")
-    print("Uploaded video id:", video_id)
-    print("URL: https://www.youtube.com/watch?v=" + video_id)
+    if not video_id:
+        raise RuntimeError(f"Upload of {video_path} returned no video id: {resp}")
+    return UploadResult(title, video_id, "https://www.youtube.com/watch?v=" + video_id, privacy, scheduled)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--file", required=True)
+    ap.add_argument("--title", required=True)
+    ap.add_argument("--description", default="")
+    ap.add_argument("--tags", default="")
+    ap.add_argument("--privacy", choices=["public", "unlisted", "private"], default="public")
+    ap.add_argument("--category", default="22")
+    ap.add_argument("--channel", choices=["main", "aitools", "dogs", "finance", "sleepsounds"], default="main", 
+                    help="Which channel to upload to (uses corresponding token)")
+    ap.add_argument("--publish-at", help="Schedule publishing, ISO time e.g. 2026-03-01T18:00 (local unless offset given)")
+    args = ap.parse_args()
+
+    video_path = Path(args.file)
+    if not video_path.exists():
+        raise SystemExit(f"File not found: {video_path}")
+
+    try:
+        result = upload_video(
+            video_path,
+            title=args.title,
+            description=args.description,
+            tags=args.tags.split(","),
+            privacy=args.privacy,
+            category=args.category,
+            channel=args.channel,
+            publish_at=datetime.fromisoformat(args.publish_at).astimezone() if args.publish_at else None,
+        )
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    print("Uploaded video id:", result.video_id)
+    print("URL:", result.url)
+    if result.publish_at:
+        print("Scheduled for:", result.publish_at)
 
 
 if __name__ == "__main__":
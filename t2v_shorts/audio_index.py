@@ -0,0 +1,261 @@
+"""
+SQLite index of `audio_library/` — decode, measure and loop each track once.
+
+Scanning stores duration, sample rate, the `loudnorm` first-pass measurement
+and the seamless loop points (see `audioloop`) per file, keyed on size/mtime so
+re-scans only touch new or changed tracks. Per-channel last-used timestamps
+drive rotation: `select` returns the least recently used track.
+"""
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import subprocess
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from .audioloop import CHANNELS, SAMPLE_RATE, find_audio_loop
+
+LIBRARY_DIR = Path("audio_library")
+INDEX_PATH = LIBRARY_DIR / "index.sqlite"
+AUDIO_EXTS = {".mp3", ".wav", ".m4a", ".ogg", ".flac"}
+
+# YouTube normalizes to about -14 LUFS; sleep content sits a little under it.
+TARGET_LUFS = -16.0
+TARGET_TP = -1.5
+TARGET_LRA = 11.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    artist TEXT,
+    description TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    sample_rate INTEGER NOT NULL,
+    input_i REAL,
+    input_tp REAL,
+    input_lra REAL,
+    input_thresh REAL,
+    target_offset REAL,
+    loop_start REAL,
+    loop_end REAL,
+    loop_score REAL
+);
+CREATE TABLE IF NOT EXISTS usage (
+    channel TEXT NOT NULL,
+    path TEXT NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (channel, path)
+);
+"""
+
+
+@dataclass(frozen=True)
+class Track:
+    path: str  # relative to the repo root, e.g. audio_library/rain/x.mp3
+    category: str
+    artist: str | None
+    description: str | None
+    size: int
+    mtime_ns: int
+    duration: float
+    sample_rate: int
+    input_i: float | None
+    input_tp: float | None
+    input_lra: float | None
+    input_thresh: float | None
+    target_offset: float | None
+    loop_start: float | None  # seconds
+    loop_end: float | None
+    loop_score: float | None
+
+    def loudnorm_filter(self, *, i: float = TARGET_LUFS, tp: float = TARGET_TP, lra: float = TARGET_LRA) -> str:
+        """Second-pass `loudnorm` using the cached measurement (no re-analysis)."""
+        if self.input_i is None:
+            return f"loudnorm=I={i}:TP={tp}:LRA={lra}"
+        return (
+            f"loudnorm=I={i}:TP={tp}:LRA={lra}"
+            f":measured_I={self.input_i}:measured_TP={self.input_tp}"
+            f":measured_LRA={self.input_lra}:measured_thresh={self.input_thresh}"
+            f":offset={self.target_offset}:linear=true"
+        )
+
+
+def analyze(path: Path, raw_path: Path) -> tuple[int, dict]:
+    """One decode: `loudnorm` first pass + float32 PCM at `raw_path` for loop search.
+
+    Returns (source sample rate, loudnorm stats: input_i / input_tp / input_lra /
+    input_thresh / target_offset).
+    """
+    raw_path.parent.mkdir(parents=True, exist_ok=True)
+    graph = (
+        "[0:a]asplit=2[m][p];"
+        f"[m]loudnorm=I={TARGET_LUFS}:TP={TARGET_TP}:LRA={TARGET_LRA}:print_format=json[ln]"
+    )
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-y",
+        "-i",
+        str(path),
+        "-filter_complex",
+        graph,
+        "-map",
+        "[ln]",
+        "-f",
+        "null",
+        "-",
+        "-map",
+        "[p]",
+        "-ac",
+        str(CHANNELS),
+        "-ar",
+        str(SAMPLE_RATE),
+        "-f",
+        "f32le",
+        str(raw_path),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    m = re.search(r"\{[^{}]*\"input_i\"[^{}]*\}", result.stderr)
+    sr = re.search(r"Audio: .*?(\d+) Hz", result.stderr)
+    if not m or not sr or not raw_path.exists():
+        raise RuntimeError(f"Audio analysis failed for {path}\nSTDERR: {result.stderr[-2000:]}")
+    stats = json.loads(m.group(0))
+    loud = {k: float(stats[k]) for k in ("input_i", "input_tp", "input_lra", "input_thresh", "target_offset")}
+    return int(sr.group(1)), loud
+
+
+class AudioIndex:
+    def __init__(self, db_path: Path = INDEX_PATH, *, root: Path = Path(".")):
+        self.root = Path(root)
+        self.db_path = self.root / db_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "AudioIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _manifest(self, library: Path) -> dict[str, dict]:
+        manifest = library / "manifest.json"
+        if not manifest.exists():
+            return {}
+        data = json.loads(manifest.read_text(encoding="utf-8"))
+        return {f"{f['category']}/{f['file']}": f for f in data.get("files", [])}
+
+    def scan(self, library: Path = LIBRARY_DIR) -> int:
+        """Index new or changed files under `library`, drop vanished ones. Returns tracks analyzed."""
+        library = self.root / library
+        meta = self._manifest(library)
+        known = {r["path"]: (r["size"], r["mtime_ns"]) for r in self.conn.execute("SELECT path, size, mtime_ns FROM tracks")}
+        seen: set[str] = set()
+        analyzed = 0
+
+        for f in sorted(library.rglob("*")):
+            if f.suffix.lower() not in AUDIO_EXTS or not f.is_file():
+                continue
+            rel = f.relative_to(self.root).as_posix()
+            seen.add(rel)
+            st = f.stat()
+            if known.get(rel) == (st.st_size, st.st_mtime_ns):
+                continue
+
+            m = meta.get(f.relative_to(library).as_posix(), {})
+            duration, sample_rate, loud, loop = self._analyze(f)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tracks VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                (
+                    rel,
+                    m.get("category") or f.parent.name,
+                    m.get("artist"),
+                    m.get("description"),
+                    st.st_size,
+                    st.st_mtime_ns,
+                    duration,
+                    sample_rate,
+                    loud["input_i"],
+                    loud["input_tp"],
+                    loud["input_lra"],
+                    loud["input_thresh"],
+                    loud["target_offset"],
+                    *loop,
+                ),
+            )
+            self.conn.commit()
+            analyzed += 1
+            print(f"[audio-index] {rel}: {duration:.1f}s, {loud['input_i']:.1f} LUFS")
+
+        gone = set(known) - seen
+        if gone:
+            self.conn.executemany("DELETE FROM tracks WHERE path = ?", [(p,) for p in gone])
+            self.conn.commit()
+        return analyzed
+
+    def _analyze(self, path: Path) -> tuple[float, int, dict, tuple]:
+        raw_path = self.db_path.parent / f".{path.stem}.f32"
+        sample_rate, loud = analyze(path, raw_path)
+        pcm = np.memmap(raw_path, dtype=np.float32, mode="r").reshape(-1, CHANNELS)
+        try:
+            duration = len(pcm) / SAMPLE_RATE
+            try:
+                lp = find_audio_loop(pcm)
+                loop = (lp.start / lp.sample_rate, lp.end / lp.sample_rate, lp.score)
+            except ValueError:
+                loop = (None, None, None)
+        finally:
+            del pcm
+            raw_path.unlink(missing_ok=True)
+        return duration, sample_rate, loud, loop
+
+    def tracks(self, category: str | None = None) -> list[Track]:
+        if category:
+            rows = self.conn.execute("SELECT * FROM tracks WHERE category = ? ORDER BY path", (category,))
+        else:
+            rows = self.conn.execute("SELECT * FROM tracks ORDER BY path")
+        return [Track(**dict(r)) for r in rows]
+
+    def get(self, path: str | Path) -> Track | None:
+        p = Path(path)
+        if p.is_absolute():
+            if not p.resolve().is_relative_to(self.root.resolve()):
+                return None  # outside the library root, never indexed
+            p = p.resolve().relative_to(self.root.resolve())
+        rel = p.as_posix()
+        row = self.conn.execute("SELECT * FROM tracks WHERE path = ?", (rel,)).fetchone()
+        return Track(**dict(row)) if row else None
+
+    def select(self, channel: str, *, category: str | None = None, mark_used: bool = True) -> Track:
+        """Least recently used track for `channel` (never-used first, then oldest)."""
+        sql = (
+            "SELECT t.* FROM tracks t LEFT JOIN usage u ON u.path = t.path AND u.channel = ? "
+            + ("WHERE t.category = ? " if category else "")
+            + "ORDER BY COALESCE(u.used_at, 0), t.path LIMIT 1"
+        )
+        row = self.conn.execute(sql, (channel, category) if category else (channel,)).fetchone()
+        if row is None:
+            raise ValueError(f"No indexed audio for category: {category}")
+        track = Track(**dict(row))
+        if mark_used:
+            self.mark_used(channel, track.path)
+        return track
+
+    def mark_used(self, channel: str, path: str, when: float | None = None) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO usage (channel, path, used_at) VALUES (?, ?, ?)",
+            (channel, path, when if when is not None else time.time()),
+        )
+        self.conn.commit()
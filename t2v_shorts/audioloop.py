@@ -0,0 +1,192 @@
+"""
+Seamless audio beds — loop a library track without clicks.
+
+1. ffmpeg decodes the track to raw float32 PCM on disk, read back as a memmap
+2. the loop end is found by FFT cross-correlating the head of the track with
+   the rest (coarse on a decimated mono mix, refined at full rate) and both
+   ends are snapped to rising zero crossings
+3. the loop is written once with an equal-power crossfade over the seam and
+   cached as a WAV, so muxing it for hours is just `-stream_loop -1`
+"""
+from __future__ import annotations
+
+import hashlib
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+CACHE_DIR = Path("out") / "cache" / "audio_loops"
+
+MATCH_SECONDS = 0.5  # length of the head snippet matched against the rest of the track
+DECIMATE = 8  # coarse search runs at SAMPLE_RATE / DECIMATE
+REFINE = 2 * DECIMATE  # full-rate samples searched either side of the coarse match
+ZERO_CROSS_SECONDS = 0.005  # how far a loop point may move to land on a zero crossing
+
+
+@dataclass(frozen=True)
+class AudioLoop:
+    start: int  # first sample of the loop
+    end: int  # sample where the track sounds like `start` again (exclusive end)
+    sample_rate: int
+    score: float  # normalized cross-correlation of the match, 1.0 = identical
+
+    @property
+    def seconds(self) -> float:
+        return (self.end - self.start) / self.sample_rate
+
+
+def decode_pcm(path: Path, raw_path: Path, *, sample_rate: int = SAMPLE_RATE) -> np.memmap:
+    """Decode to interleaved float32 at `raw_path` and memory-map it -> (samples, CHANNELS)."""
+    raw_path.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-v",
+        "error",
+        "-i",
+        str(path),
+        "-ac",
+        str(CHANNELS),
+        "-ar",
+        str(sample_rate),
+        "-f",
+        "f32le",
+        str(raw_path),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if not raw_path.exists() or raw_path.stat().st_size == 0:
+        raise RuntimeError(f"FFmpeg failed to decode {path}\nSTDERR: {result.stderr}")
+    return np.memmap(raw_path, dtype=np.float32, mode="r").reshape(-1, CHANNELS)
+
+
+def _ncc(x: np.ndarray, h: np.ndarray) -> np.ndarray:
+    """Normalized cross-correlation of template `h` at every offset of `x` (FFT based)."""
+    n = len(x) + len(h) - 1
+    nfft = 1 << (n - 1).bit_length()
+    corr = np.fft.irfft(np.fft.rfft(x, nfft) * np.conj(np.fft.rfft(h, nfft)), nfft)[: len(x) - len(h) + 1]
+    energy = np.concatenate(([0.0], np.cumsum(x.astype(np.float64) ** 2)))
+    window = energy[len(h) :] - energy[: -len(h)]
+    return corr / (np.sqrt(np.maximum(window, 0.0) * float(h @ h)) + 1e-12)
+
+
+def _snap_to_zero_crossing(mono: np.ndarray, i: int, radius: int) -> int:
+    """Nearest rising zero crossing to sample `i` within `radius`, else `i`."""
+    lo, hi = max(1, i - radius), min(len(mono), i + radius)
+    seg = mono[lo - 1 : hi]
+    rising = np.flatnonzero((seg[:-1] <= 0) & (seg[1:] > 0)) + lo
+    if rising.size == 0:
+        return i
+    return int(rising[np.argmin(np.abs(rising - i))])
+
+
+def find_audio_loop(pcm: np.ndarray, *, sample_rate: int = SAMPLE_RATE, min_seconds: float | None = None) -> AudioLoop:
+    """Longest-lasting seamless loop: match the head against everything at least `min_seconds` later.
+
+    `min_seconds` defaults to half the track so the loop repeats as rarely as possible.
+    """
+    mono = pcm.mean(axis=1, dtype=np.float32)
+    n = len(mono)
+    win = int(MATCH_SECONDS * sample_rate)
+    # Skip a possible fade-in at the very start.
+    start = min(sample_rate, n // 20)
+    min_len = int((min_seconds if min_seconds is not None else n / sample_rate / 2) * sample_rate)
+    if start + min_len + win > n:
+        raise ValueError(f"Track too short to loop: {n / sample_rate:.1f}s")
+
+    # Coarse: decimated mono, template = head, search = everything after start + min_len.
+    d = DECIMATE
+    coarse = mono[: n - n % d].reshape(-1, d).mean(axis=1)
+    c_start, c_win, c_lo = start // d, win // d, (start + min_len) // d
+    scores = _ncc(coarse[c_lo:], coarse[c_start : c_start + c_win])
+    end = (c_lo + int(np.argmax(scores))) * d
+
+    # Refine at full rate around the coarse match.
+    lo = max(start + min_len, end - REFINE)
+    hi = min(n - win, end + REFINE)
+    if hi > lo:
+        head = mono[start : start + win]
+        cand = np.lib.stride_tricks.sliding_window_view(mono[lo : hi + win], win)
+        norms = np.sqrt((cand.astype(np.float64) ** 2).sum(axis=1) * float(head @ head)) + 1e-12
+        fine = (cand @ head) / norms
+        end = lo + int(np.argmax(fine))
+
+    radius = int(ZERO_CROSS_SECONDS * sample_rate)
+    start = _snap_to_zero_crossing(mono, start, radius)
+    end = _snap_to_zero_crossing(mono, end, radius)
+
+    head, tail = mono[start : start + win], mono[end : end + win]
+    score = float(head @ tail / (np.sqrt(float(head @ head) * float(tail @ tail)) + 1e-12)) if len(tail) == win else 0.0
+    return AudioLoop(start, end, sample_rate, score)
+
+
+def crossfade_loop(pcm: np.ndarray, loop: AudioLoop, *, crossfade: float = 1.0) -> np.ndarray:
+    """Samples [start + X, end) with the last X crossfaded (equal power) into [start, start + X).
+
+    Played back-to-back the result runs ... end - 1 -> start + X ..., which is continuous
+    because the fade already landed on [start, start + X).
+    """
+    xf = max(1, min(int(crossfade * loop.sample_rate), (loop.end - loop.start) // 3))
+    out = np.array(pcm[loop.start + xf : loop.end], dtype=np.float32)
+    t = np.linspace(0.0, np.pi / 2, xf, dtype=np.float32)[:, None]
+    out[-xf:] = out[-xf:] * np.cos(t) + np.asarray(pcm[loop.start : loop.start + xf]) * np.sin(t)
+    return out
+
+
+def write_wav(samples: np.ndarray, out_path: Path, *, sample_rate: int = SAMPLE_RATE) -> Path:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-v",
+        "error",
+        "-f",
+        "f32le",
+        "-ac",
+        str(samples.shape[1]),
+        "-ar",
+        str(sample_rate),
+        "-i",
+        "pipe:0",
+        "-c:a",
+        "pcm_s16le",
+        str(out_path),
+    ]
+    result = subprocess.run(cmd, input=np.ascontiguousarray(samples, dtype=np.float32).tobytes(), capture_output=True)
+    if not out_path.exists() or out_path.stat().st_size < 1000:
+        raise RuntimeError(f"FFmpeg failed - output missing or too small: {out_path}\nSTDERR: {result.stderr.decode(errors='replace')}")
+    return out_path
+
+
+def _cache_key(path: Path, *parts: object) -> str:
+    st = path.stat()
+    raw = "|".join(str(p) for p in (path.resolve(), st.st_size, st.st_mtime_ns, *parts))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def loop_asset(
+    path: Path,
+    *,
+    cache_dir: Path = CACHE_DIR,
+    min_seconds: float | None = None,
+    crossfade: float = 1.0,
+) -> Path:
+    """Seamless loop of `path` as a cached WAV (built once per track/settings)."""
+    path = Path(path)
+    out_path = cache_dir / f"{path.stem}_{_cache_key(path, min_seconds, crossfade)}.wav"
+    if out_path.exists():
+        return out_path
+
+    raw_path = out_path.with_suffix(".f32")
+    pcm = decode_pcm(path, raw_path)
+    try:
+        loop = find_audio_loop(pcm, min_seconds=min_seconds)
+        print(f"[audioloop] {path.name}: {loop.seconds:.2f}s loop, match {loop.score:.3f}")
+        write_wav(crossfade_loop(pcm, loop, crossfade=crossfade), out_path)
+    finally:
+        del pcm
+        raw_path.unlink(missing_ok=True)
+    return out_path
@@ -0,0 +1,121 @@
+"""
+Audio stage of the finishing graph — music bed + optional narration.
+
+`mix_inputs` / `mix_graph` return the extra inputs and the filter_complex
+fragment (ending in [aout]) that the video finishing command appends, so the
+bed is trimmed, loudness-normalized (second pass from the audio index's cached
+measurement), faded and mixed with the voice-over in the same process that
+encodes the video. `prepare_bed` can do the bed part ahead of time (while the
+GPU is busy) so finishing only mixes and encodes.
+"""
+from __future__ import annotations
+
+import subprocess
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from .audio_index import TARGET_LUFS, TARGET_LRA, TARGET_TP, AudioIndex
+
+MIX_RATE = 48000
+BED_UNDER_VOICE = 0.25  # bed gain while narration is mixed in
+FADE_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class AudioMix:
+    bed: Path | None = None
+    bed_filter: str = f"loudnorm=I={TARGET_LUFS}:TP={TARGET_TP}:LRA={TARGET_LRA}"
+    narration: Path | None = None
+    fade: float = FADE_SECONDS
+
+
+def select_mix(
+    bed: str | None,
+    *,
+    channel: str = "default",
+    category: str | None = None,
+    narration: str | None = None,
+    root: Path = Path("."),
+) -> AudioMix | None:
+    """`bed` is a track path or "auto" (least recently used track for `channel` from the index)."""
+    if not bed and not narration:
+        return None
+    track = None
+    if bed:
+        with AudioIndex(root=root) as index:
+            if bed == "auto":
+                index.scan()
+                track = index.select(channel, category=category)
+            else:
+                track = index.get(bed)
+    if track is not None:
+        return AudioMix(bed=root / track.path, bed_filter=track.loudnorm_filter(), narration=Path(narration) if narration else None)
+    # Not indexed: single-pass loudnorm.
+    return AudioMix(bed=Path(bed) if bed else None, narration=Path(narration) if narration else None)
+
+
+def mix_inputs(mix: AudioMix) -> list[str]:
+    """ffmpeg input args; the bed loops forever and is cut by atrim in the graph."""
+    args: list[str] = []
+    if mix.bed:
+        args += ["-stream_loop", "-1", "-i", str(mix.bed)]
+    if mix.narration:
+        args += ["-i", str(mix.narration)]
+    return args
+
+
+def mix_graph(mix: AudioMix, *, duration: float, first_input: int = 1) -> str:
+    """filter_complex fragment producing [aout]; inputs are numbered from `first_input`."""
+    fmt = f"aresample={MIX_RATE},aformat=sample_fmts=fltp:channel_layouts=stereo"
+    fade = min(mix.fade, duration / 4)
+    fades = f",afade=t=in:d={fade:.3f},afade=t=out:st={duration - fade:.3f}:d={fade:.3f}" if fade > 0 else ""
+
+    parts: list[str] = []
+    i = first_input
+    if mix.bed:
+        parts.append(f"[{i}:a]atrim=0:{duration:.3f},asetpts=PTS-STARTPTS,{mix.bed_filter},{fmt}{fades}[bed]")
+        i += 1
+    if mix.narration:
+        parts.append(
+            f"[{i}:a]loudnorm=I={TARGET_LUFS}:TP={TARGET_TP}:LRA={TARGET_LRA},{fmt},"
+            f"apad,atrim=0:{duration:.3f}[vo]"
+        )
+
+    if mix.bed and mix.narration:
+        parts.append(f"[bed]volume={BED_UNDER_VOICE}[bedq];[bedq][vo]amix=inputs=2:duration=first:normalize=0[aout]")
+    elif mix.bed:
+        parts[-1] = parts[-1].replace("[bed]", "[aout]")
+    else:
+        parts[-1] = parts[-1].replace("[vo]", "[aout]")
+    return ";".join(parts)
+
+
+def prepare_bed(mix: AudioMix, *, duration: float, out_path: Path) -> AudioMix:
+    """Render the bed (looped, trimmed, normalized, faded) to a WAV ahead of finishing.
+
+    The returned mix points at that file with no bed processing left, so the
+    finishing pass only has to mix/encode it. Meant to run while the GPU is busy.
+    """
+    if not mix.bed:
+        return mix
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    graph = mix_graph(AudioMix(bed=mix.bed, bed_filter=mix.bed_filter, fade=mix.fade), duration=duration, first_input=0)
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-y",
+        *mix_inputs(AudioMix(bed=mix.bed)),
+        "-filter_complex",
+        graph,
+        "-map",
+        "[aout]",
+        "-t",
+        f"{duration:.3f}",
+        "-c:a",
+        "pcm_s16le",
+        str(out_path),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Preparing audio bed failed\nSTDERR: {result.stderr[-2000:]}")
+    return replace(mix, bed=out_path, bed_filter="anull", fade=0.0)
@@ -35,6 +35,13 @@ def try_register_optional_backends() -> None:
     except Exception:
         pass
 
+    try:
+        from .kenburns import KenBurnsBackend
+
+        _BACKENDS.setdefault("kenburns", KenBurnsBackend())
+    except Exception:
+        pass
+
     try:
         from .wangp_14b import WanGP14BBackend
 
@@ -48,3 +55,8 @@ def get_backend(name: str) -> VideoBackend:
     if name not in _BACKENDS:
         raise ValueError(f"Unknown backend '{name}'. Available: {sorted(_BACKENDS.keys())}")
     return _BACKENDS[name]
+
+
+def available_backends() -> list[str]:
+    try_register_optional_backends()
+    return sorted(_BACKENDS.keys())
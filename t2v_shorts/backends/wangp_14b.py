@@ -8,12 +8,14 @@ import json
 import shutil
 import time
 import zipfile
-import subprocess
 from pathlib import Path
 
+from ..progress import ProgressMonitor, printer, run_monitored
+
 WANGP_DIR = Path(r"C:\Users\lijin\.openclaw\workspace\Wan2GP")
 WANGP_PYTHON = WANGP_DIR / "venv" / "Scripts" / "python.exe"
 OUTPUTS_DIR = WANGP_DIR / "outputs"
+STALL_RETRIES = 1  # restarts of a stalled WanGP run before giving up
 
 
 class WanGP14BBackend:
@@ -76,46 +78,43 @@ class WanGP14BBackend:
                     pass
 
         initial = set(OUTPUTS_DIR.glob("*.mp4")) if OUTPUTS_DIR.exists() else set()
+        found: list[Path] = []
 
-        proc = subprocess.Popen(
-            [str(WANGP_PYTHON), str(WANGP_DIR / "wgp.py"), "--process", str(queue_file)],
-            cwd=str(WANGP_DIR),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-        )
+        def finished() -> bool:
+            new = set(OUTPUTS_DIR.glob("*.mp4")) - initial if OUTPUTS_DIR.exists() else set()
+            if new:
+                found.append(sorted(new, key=lambda f: f.stat().st_mtime)[-1])
+                time.sleep(2)  # Let write finish
+            return bool(new)
 
-        # Stream output + watch for result
+        # Step progress, ETA and stalls from WanGP's output (see progress.py);
+        # a stalled run is killed and started again instead of waiting out max_wait.
         max_wait = 1800  # 30 min
-        t0 = time.time()
-        result_video = None
-
-        while time.time() - t0 < max_wait:
-            # Check for new video
-            if OUTPUTS_DIR.exists():
-                new = set(OUTPUTS_DIR.glob("*.mp4")) - initial
-                if new:
-                    result_video = sorted(new, key=lambda f: f.stat().st_mtime)[-1]
-                    time.sleep(2)  # Let write finish
-                    break
-
-            # Print progress
-            line = proc.stdout.readline()
-            if line:
-                print(f"  [wangp] {line.rstrip()}", flush=True)
-            else:
-                time.sleep(1)
-
-        proc.terminate()
         try:
-            queue_file.unlink()
-        except Exception:
-            pass
+            for attempt in range(1, STALL_RETRIES + 2):
+                run = run_monitored(
+                    [str(WANGP_PYTHON), str(WANGP_DIR / "wgp.py"), "--process", str(queue_file)],
+                    cwd=WANGP_DIR,
+                    monitor=ProgressMonitor("wangp"),
+                    on_line=lambda line: print(f"  [wangp] {line.rstrip()}", flush=True),
+                    on_progress=printer("  [wangp] "),
+                    done=finished,
+                    timeout=max_wait,
+                )
+                if found or not run.stalled:
+                    break
+                print(f"  [wangp] stalled at {run.last}, restarting (attempt {attempt + 1}/{STALL_RETRIES + 1})")
+        finally:
+            try:
+                queue_file.unlink()
+            except Exception:
+                pass
+        result_video = found[0] if found else None
 
         if not result_video:
-            raise RuntimeError(f"WanGP 14B generation timed out after {max_wait}s")
+            if run.stalled:
+                raise RuntimeError(f"WanGP 14B stalled {STALL_RETRIES + 1} times, last at {run.last}")
+            raise RuntimeError(f"WanGP 14B produced no video (exit code {run.returncode}, timed out: {run.timed_out})")
 
         out_path.parent.mkdir(parents=True, exist_ok=True)
         shutil.copy(result_video, out_path)
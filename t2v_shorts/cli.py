@@ -1,11 +1,26 @@
 from __future__ import annotations
 
 import argparse
+from pathlib import Path
 
 from rich import print
 
+from .audio_index import AudioIndex
+from .compiler import StoryboardError, compile_file
 from .config import GenerateRequest
+from .daemon import DAEMON_DB, INTAKE_PATH, Daemon, JobQueue
+from .devices import visible_devices
+from .longform import render_longform
 from .pipeline import run
+from .predictor import ZERO, RuntimePredictor, estimate
+from .scene_cache import NEAR_THRESHOLD, SceneCache, dedup
+from .storyboard import load_storyboard, run_storyboard
+from .variants import plan_outputs, render_variants
+from .workspace_gc import DEFAULT_QUOTA_GB, Policy, Workspace
+
+
+def _split_csv(value: str) -> list[str]:
+    return [x.strip() for x in value.split(",") if x.strip()]
 
 
 def main() -> None:
@@ -21,9 +36,67 @@ def main() -> None:
     g.add_argument("--width", type=int, default=768)
     g.add_argument("--height", type=int, default=1344)
     g.add_argument("--no-upscale", action="store_true")
+    g.add_argument("--interpolate", action="store_true", help="Generate fewer frames, interpolate to --fps")
+    g.add_argument("--variants", default="", help="Comma-separated extra outputs, e.g. 4k,tiktok,preview")
     g.add_argument("--out", default="out/out.mp4")
     g.add_argument("--dry-run", action="store_true")
 
+    sb = sub.add_parser("storyboard", help="Render every scene of a storyboard and concatenate")
+    sb.add_argument("path")
+    sb.add_argument("--video", type=int, help="Only this video (1-based) of a series storyboard")
+    sb.add_argument("--preview", action="store_true", help="Fast 360x640 preview on the cheapest backend")
+    sb.add_argument("--devices", help="Shard scenes across these GPUs: comma-separated ids, or 'all'")
+
+    lf = sub.add_parser("longform", help="Loop one clip into a long video (sleep sounds)")
+    lf.add_argument("--clip", required=True)
+    lf.add_argument("--out", required=True)
+    lf.add_argument("--minutes", type=float, default=60)
+    lf.add_argument("--fps", type=int, default=24)
+    lf.add_argument("--audio")
+
+    es = sub.add_parser("estimate", help="Predict render time of a storyboard from past runs")
+    es.add_argument("path")
+    es.add_argument("--backend", help="Override default.backend (wangp for the WanGP scripts)")
+    es.add_argument("--window", type=float, help="GPU hours available: how many videos fit")
+
+    cp = sub.add_parser("compile", help="Validate storyboards and show their execution plan and cost")
+    cp.add_argument("paths", nargs="+", help="Storyboard files or directories of them")
+    cp.add_argument("--backend", help="Override default.backend (wangp for the WanGP scripts)")
+    cp.add_argument("--timeline", action="store_true", help="Also list every scene with its caption timing")
+
+    dd = sub.add_parser("dedup", help="Find scenes rendered more than once across storyboards")
+    dd.add_argument("paths", nargs="+", help="Storyboard files or directories of them")
+    dd.add_argument("--backend", help="Override default.backend (wangp for the WanGP scripts)")
+    dd.add_argument("--threshold", type=float, default=NEAR_THRESHOLD, help="Near-duplicate similarity (0-1)")
+
+    ai = sub.add_parser("audio-index", help="Scan audio_library/ into the SQLite audio index")
+    ai.add_argument("--library", default="audio_library")
+
+    dm = sub.add_parser("daemon", help="Run the job queue fed by a JSONL intake file, or manage its jobs")
+    dm.add_argument("action", nargs="?", default="run", choices=["run", "status", "cancel", "requeue"])
+    dm.add_argument("ids", nargs="*", type=int, help="Job ids for cancel / requeue")
+    dm.add_argument("--intake", default=str(INTAKE_PATH))
+    dm.add_argument("--db", default=str(DAEMON_DB))
+    dm.add_argument("--max-inflight", type=int, default=2, help="Jobs handed to the GPU scheduler at once")
+    dm.add_argument("--state", help="status: only jobs in this state")
+    dm.add_argument("--once", action="store_true", help="Exit when the queue is drained")
+
+    gc = sub.add_parser("gc", help="Delete intermediates and enforce the workspace disk quota")
+    gc.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+    gc.add_argument("--quota", type=float, default=DEFAULT_QUOTA_GB, help="GB for temp/, out/ and --extra dirs")
+    gc.add_argument("--extra", action="append", default=[], help="Another outputs dir, e.g. WanGP outputs/")
+    gc.add_argument("--drop-uploaded-finals", action="store_true", help="Let uploaded finals go when over quota")
+    gc.add_argument("--full", action="store_true", help="Re-list every directory, not only changed ones")
+
+    v = sub.add_parser("variants", help="Render several outputs of an existing video in one pass")
+    v.add_argument("--in", dest="in_path", required=True)
+    v.add_argument("--out", required=True)
+    v.add_argument("--variants", required=True, help="Comma-separated, e.g. 4k,tiktok,preview")
+    v.add_argument("--width", type=int, default=1080)
+    v.add_argument("--height", type=int, default=1920)
+    v.add_argument("--mode", default="pad", choices=["pad", "crop", "blur"])
+    v.add_argument("--caption")
+
     args = ap.parse_args()
 
     if args.cmd == "generate":
@@ -36,11 +109,145 @@ def main() -> None:
             width=args.width,
             height=args.height,
             upscale_4k=not args.no_upscale,
+            interpolate=args.interpolate,
+            variants=_split_csv(args.variants),
             out=args.out,
         )
         out = run(req, dry_run=args.dry_run)
         print(f"Wrote: {out}")
 
+    elif args.cmd == "storyboard":
+        devices = visible_devices() if args.devices == "all" else _split_csv(args.devices or "")
+        for out in run_storyboard(Path(args.path), preview=args.preview, video_index=args.video, devices=devices):
+            print(f"Wrote: {out}")
+
+    elif args.cmd == "longform":
+        out = render_longform(
+            Path(args.clip),
+            Path(args.out),
+            minutes=args.minutes,
+            fps=args.fps,
+            audio=Path(args.audio) if args.audio else None,
+        )
+        print(f"Wrote: {out}")
+
+    elif args.cmd == "estimate":
+        est = estimate(load_storyboard(Path(args.path)), backend=args.backend)
+        for v in est.videos:
+            print(f"{v.title[:50]:<50}  {v.scenes:>2} scenes  generate {v.generate}  finish {v.finish}")
+        print(f"Total: {est.total}")
+        if args.window:
+            print(f"Fits in {args.window:g}h: {est.fit_window(args.window * 3600)}/{len(est.videos)} videos")
+
+    elif args.cmd == "compile":
+        files = [f for p in map(Path, args.paths) for f in (sorted(p.glob("*.json")) if p.is_dir() else [p])]
+        predictor = RuntimePredictor.from_trace()
+        failed = 0
+        for f in files:
+            try:
+                plan = compile_file(f, backend=args.backend)
+            except StoryboardError as e:
+                failed += 1
+                print(f"FAIL {f}")
+                for err in e.errors:
+                    print(f"     {err}")
+                continue
+            est = predictor.estimate_plan(plan)
+            gpu = sum((v.generate for v in est.videos), ZERO)
+            cpu = sum((v.finish for v in est.videos), ZERO)
+            print(f"OK   {f}  {len(plan.videos)} video(s)  GPU {gpu}  CPU {cpu}")
+            for v, e in zip(plan.videos, est.videos):
+                ladder = " -> ".join(f"{w}x{h}" for _, w, h in v.ladder)
+                fps = f"{v.scenes[0].gen_fps}->{v.fps}fps" if v.interpolates else f"{v.fps}fps"
+                frames = sum(s.frames for s in v.scenes)
+                print(f"     {v.slug[:40]:<40} {len(v.scenes):>2} scenes {v.duration:>4.0f}s {frames:>5} frames  {ladder} {fps}")
+                print(f"       GPU {e.generate}  CPU {e.finish}")
+                for w in v.warnings:
+                    print(f"       warning: {w}")
+                if args.timeline:
+                    for s in v.scenes:
+                        print(f"       {s.index:>2}  {s.start:>5.1f}-{s.end:<5.1f} {s.frames:>4}f  {s.caption or ''}")
+        if failed:
+            raise SystemExit(f"{failed} of {len(files)} storyboard(s) failed to compile")
+
+    elif args.cmd == "dedup":
+        files = [f for p in map(Path, args.paths) for f in (sorted(p.glob("*.json")) if p.is_dir() else [p])]
+        plans = []
+        for f in files:
+            try:
+                plans.append(compile_file(f, backend=args.backend))
+            except StoryboardError as e:
+                print(f"FAIL {e}")
+        with SceneCache() as cache:
+            report = dedup(plans, cache=cache, threshold=args.threshold)
+
+        def ref(r):
+            return f"{Path(r[0]).name}:{r[1]}#{r[2]}"
+
+        print(
+            f"{report.scenes} scenes in {len(plans)} storyboard(s): {len(report.groups)} unique, "
+            f"{len(report.cached)} already cached -> {report.renders} renders ({report.scenes - report.renders} saved)"
+        )
+        if report.duplicates:
+            print("Exact duplicates (rendered once, reused by the others):")
+            for key, refs in report.duplicates.items():
+                print(f"  {key}  x{len(refs)}  {report.prompts[key][:70]}")
+                print(f"    {', '.join(ref(r) for r in refs)}")
+        if report.near:
+            print('Near duplicates (to reuse a clip, set "reuse": "<key>" on the scene):')
+            for r, key, score in report.near:
+                print(f"  {score:.2f}  {ref(r)}  {report.prompts[report.key_of(r)][:70]}")
+                print(f"        ~ {key}  {report.prompts[key][:70]}")
+
+    elif args.cmd == "audio-index":
+        with AudioIndex() as index:
+            n = index.scan(Path(args.library))
+            for t in index.tracks():
+                loop = f"{t.loop_start:.2f}-{t.loop_end:.2f}s" if t.loop_end else "-"
+                print(f"{t.path}  {t.duration:.1f}s  {t.input_i:.1f} LUFS  loop {loop}")
+        print(f"Analyzed {n} new/changed track(s)")
+
+    elif args.cmd == "daemon":
+        if args.action == "run":
+            Daemon(Path(args.db), Path(args.intake), max_inflight=args.max_inflight).run(once=args.once)
+            return
+        with JobQueue(Path(args.db)) as queue:
+            if args.action == "status":
+                for j in queue.jobs(args.state):
+                    what = j.spec.get("out") or j.spec.get("path") or j.spec.get("text", "")[:40]
+                    err = f"  {j.error.splitlines()[0]}" if j.error else ""
+                    print(f"{j.id:>5}  {j.state:<9}  {j.kind or '-':<10}  {j.channel or '-':<11}  {j.attempts}/{j.max_attempts}  {what}{err}")
+                print(queue.counts())
+            for job_id in args.ids:
+                try:
+                    ok = queue.cancel(job_id) if args.action == "cancel" else queue.requeue(job_id)
+                except ValueError as e:  # requeue of a job whose spec is still invalid
+                    print(f"{args.action} {job_id}: {e}")
+                    continue
+                print(f"{args.action} {job_id}: {'ok' if ok else 'not possible in its current state'}")
+
+    elif args.cmd == "gc":
+        policy = Policy(quota_bytes=int(args.quota * 1e9), keep_finals=not args.drop_uploaded_finals)
+        with Workspace(extra=[Path(p) for p in args.extra]) as ws:
+            print(str(ws.sweep(policy, dry_run=args.dry_run, full=args.full)))
+
+    elif args.cmd == "variants":
+        outputs = plan_outputs(
+            Path(args.out),
+            _split_csv(args.variants),
+            master_width=args.width,
+            master_height=args.height,
+        )
+        for out in render_variants(
+            Path(args.in_path),
+            outputs,
+            master_width=args.width,
+            master_height=args.height,
+            mode=args.mode,
+            overlay_text=args.caption,
+        ):
+            print(f"Wrote: {out}")
+
 
 if __name__ == "__main__":
     main()
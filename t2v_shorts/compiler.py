@@ -0,0 +1,281 @@
+"""
+Storyboard compiler — validate a storyboard and resolve it into an execution plan.
+
+Storyboards come in two shapes (single: `scenes` at the top level; series:
+`videos[].scenes`) with a `default` block (`sceneSeconds`, `fps`, `width`,
+`height`, `backend`, ...) that a video may partly override with its own
+`default`, and per-scene `seconds` (or `duration`, from the launch
+storyboards). `compile_storyboard` checks all of it with pydantic before any
+GPU time is spent and returns a `StoryboardPlan`: per scene the seconds, the
+generation fps and frame count, per video the resolution ladder and the
+caption timeline. Unknown keys are kept (storyboards carry notes); wrong types,
+missing prompts and unknown backends are errors, things that only some
+runners handle (frames over the backend cap, scenes longer than one
+generation) are warnings.
+
+Compiling touches no files and no models, so it is cheap enough to run on
+every storyboard up front (`t2v-shorts compile storyboards/`).
+"""
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator, model_validator
+
+from .planner import BACKEND_PROFILES, ResolutionPlan, gen_frames, get_profile, plan_fps, plan_resolution
+
+MAX_SCENE_SECONDS = 20  # GenerateRequest.seconds
+SHORTS_SIZE = (1080, 1920)
+UHD_SIZE = (2160, 3840)
+
+
+class StoryboardError(ValueError):
+    def __init__(self, source: str, errors: list[str]):
+        self.source = source
+        self.errors = errors
+        super().__init__(f"{source}: " + "; ".join(errors))
+
+
+class _Spec(BaseModel):
+    # Storyboards carry notes and per-script extras; keep them, check what we use.
+    model_config = ConfigDict(extra="allow", populate_by_name=True)
+
+
+class Defaults(_Spec):
+    backend: str = "wangp"
+    fps: int = Field(default=24, ge=8, le=60)
+    scene_seconds: float = Field(default=3, alias="sceneSeconds", gt=0, le=MAX_SCENE_SECONDS)
+    width: int = Field(default=480, ge=64, le=4096)
+    height: int = Field(default=832, ge=64, le=4096)
+    upscale_4k: bool = Field(default=False, alias="upscale4k")
+    interpolate: bool = False
+    expand_prompts: bool = Field(default=False, alias="expandPrompts")
+    tags: str | list[str] = ""
+    music: str | None = None
+    music_category: str | None = Field(default=None, alias="musicCategory")
+
+    @field_validator("backend")
+    @classmethod
+    def _known_backend(cls, v: str) -> str:
+        if v not in BACKEND_PROFILES:
+            raise ValueError(f"unknown backend '{v}'. Available: {sorted(BACKEND_PROFILES)}")
+        return v
+
+
+class SceneSpec(_Spec):
+    prompt: str = Field(min_length=1)
+    caption: str | None = None
+    seconds: float | None = Field(default=None, gt=0)
+    duration: float | None = Field(default=None, gt=0)
+    reuse: str | None = None  # scene_cache key of a near-duplicate clip to use instead
+
+
+class VideoSpec(_Spec):
+    slug: str | None = None
+    title: str | None = None
+    description: str = ""
+    tags: str | list[str] | None = None
+    scenes: list[SceneSpec] = Field(min_length=1)
+    default: dict[str, Any] | None = None  # overrides of the storyboard default
+    music: str | None = None
+    music_category: str | None = Field(default=None, alias="musicCategory")
+    narration: str | None = None
+
+
+class StoryboardSpec(_Spec):
+    default: dict[str, Any] | None = None
+    videos: list[VideoSpec] = Field(default_factory=list)
+    channel: str | None = None
+    # single-video storyboards
+    slug: str | None = None
+    title: str | None = None
+    description: str = ""
+    tags: str | list[str] | None = None
+    scenes: list[SceneSpec] = Field(default_factory=list)
+
+    @model_validator(mode="after")
+    def _has_scenes(self) -> "StoryboardSpec":
+        if not self.videos and not self.scenes:
+            raise ValueError("storyboard has neither 'videos' nor 'scenes'")
+        return self
+
+
+@dataclass(frozen=True)
+class ScenePlan:
+    index: int  # 1-based
+    prompt: str
+    caption: str | None
+    start: float  # seconds into the video
+    seconds: int
+    gen_fps: int
+    frames: int  # requested from the generator
+    reuse: str | None = None
+
+    @property
+    def end(self) -> float:
+        return self.start + self.seconds
+
+
+@dataclass
+class VideoPlan:
+    slug: str
+    title: str
+    description: str
+    tags: list[str]
+    backend: str
+    fps: int  # output fps (scenes may generate fewer and interpolate)
+    resolution: ResolutionPlan
+    ladder: list[tuple[str, int, int]]  # (stage, width, height), generation first
+    scenes: list[ScenePlan]
+    interpolates: bool = False
+    expand_prompts: bool = False
+    music: str | None = None
+    music_category: str | None = None
+    narration: str | None = None
+    warnings: list[str] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return self.scenes[-1].end if self.scenes else 0.0
+
+    @property
+    def captions(self) -> list[tuple[float, float, str]]:
+        """(start, end, text) per captioned scene."""
+        return [(s.start, s.end, s.caption) for s in self.scenes if s.caption]
+
+
+@dataclass
+class StoryboardPlan:
+    source: str
+    channel: str
+    videos: list[VideoPlan]
+
+    @property
+    def warnings(self) -> list[str]:
+        return [f"{v.slug}: {w}" for v in self.videos for w in v.warnings]
+
+
+def _slugify(text: str) -> str:
+    # Same as storyboard.slugify (not imported: that pulls in the render pipeline).
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:50] or "video"
+
+
+def _tags(value: str | list[str] | None) -> list[str]:
+    if isinstance(value, list):
+        return [t.strip() for t in value if t.strip()]
+    return [t.strip() for t in (value or "").split(",") if t.strip()]
+
+
+def _errors(e: ValidationError, prefix: str = "") -> list[str]:
+    out = []
+    for err in e.errors():
+        loc = ".".join(str(p) for p in (prefix, *err["loc"]) if p != "")
+        out.append(f"{loc}: {err['msg']}" if loc else err["msg"])
+    return out
+
+
+def _compile_video(i: int, video: VideoSpec, defaults: Defaults) -> VideoPlan:
+    backend = defaults.backend
+    profile = get_profile(backend)
+    res = plan_resolution(backend, defaults.width, defaults.height)
+    ladder = [("generate", res.gen_width, res.gen_height)]
+    for step in [("storyboard", res.out_width, res.out_height), ("4k", *UHD_SIZE) if defaults.upscale_4k else ("shorts", *SHORTS_SIZE)]:
+        if step[1:] != ladder[-1][1:]:
+            ladder.append(step)
+
+    plan = VideoPlan(
+        slug=video.slug or _slugify(video.title or f"video-{i}"),
+        title=video.title or video.slug or f"video-{i}",
+        description=video.description,
+        tags=_tags(video.tags if video.tags is not None else defaults.tags),
+        backend=backend,
+        fps=defaults.fps,
+        resolution=res,
+        ladder=ladder,
+        scenes=[],
+        expand_prompts=defaults.expand_prompts,
+        music=video.music or defaults.music,
+        music_category=video.music_category or defaults.music_category,
+        narration=video.narration,
+    )
+    start = 0.0
+    too_long, capped = [], []
+    for n, s in enumerate(video.scenes, start=1):
+        # storyboard.scene_seconds: `seconds`, else `duration`, else the default; whole seconds
+        seconds = max(int(s.seconds or s.duration or defaults.scene_seconds), 1)
+        if seconds > MAX_SCENE_SECONDS:
+            too_long.append(n)
+        fps_plan = plan_fps(backend, defaults.fps, seconds, interpolate=defaults.interpolate)
+        plan.interpolates |= fps_plan.interpolates
+        frames = gen_frames(backend, seconds, fps_plan.gen_fps)
+        if profile.max_frames and frames > profile.max_frames:
+            capped.append(n)
+        plan.scenes.append(ScenePlan(n, s.prompt, s.caption or None, start, seconds, fps_plan.gen_fps, frames, s.reuse))
+        start += seconds
+    if too_long:
+        plan.warnings.append(f"{_scenes(too_long)}: longer than {MAX_SCENE_SECONDS}s, which the storyboard runner rejects")
+    if capped:
+        longest = max(plan.scenes[n - 1].frames for n in capped)
+        plan.warnings.append(
+            f"{_scenes(capped)}: up to {longest} frames requested, {backend} stops at {profile.max_frames}"
+        )
+    return plan
+
+
+def _scenes(ns: list[int]) -> str:
+    """[1, 2, 3, 5] -> "scenes 1-3,5"."""
+    out, first = [], ns[0]
+    for a, b in zip(ns, ns[1:] + [None]):
+        if b != a + 1:
+            out.append(f"{first}-{a}" if a != first else str(a))
+            first = b
+    return ("scenes " if len(ns) > 1 else "scene ") + ",".join(out)
+
+
+def compile_storyboard(sb: dict, *, source: str = "<storyboard>", backend: str | None = None) -> StoryboardPlan:
+    """Validate `sb` and resolve every video into a plan; raises `StoryboardError` listing all problems.
+
+    `backend` overrides `default.backend` (the WanGP scripts ignore that key).
+    """
+    override = {"backend": backend} if backend else {}
+    errors = []
+    try:
+        spec = StoryboardSpec.model_validate(sb)
+    except ValidationError as e:
+        errors += _errors(e)
+    default = sb.get("default") if isinstance(sb, dict) else None
+    try:
+        Defaults.model_validate({**(default if isinstance(default, dict) else {}), **override})
+    except ValidationError as e:
+        errors += _errors(e, "default")
+    if errors:
+        raise StoryboardError(source, errors)
+
+    videos = spec.videos or [
+        VideoSpec(slug=spec.slug, title=spec.title, description=spec.description, tags=spec.tags, scenes=spec.scenes)
+    ]
+    plans = []
+    for i, video in enumerate(videos, start=1):
+        try:
+            defaults = Defaults.model_validate({**(spec.default or {}), **(video.default or {}), **override})
+        except ValidationError as e:
+            errors += _errors(e, f"videos.{i - 1}.default")
+            continue
+        plans.append(_compile_video(i, video, defaults))
+    if errors:
+        raise StoryboardError(source, errors)
+    return StoryboardPlan(source, spec.channel or "default", plans)
+
+
+def compile_file(path: Path, *, backend: str | None = None) -> StoryboardPlan:
+    path = Path(path)
+    try:
+        # Some storyboards were saved with a BOM by Windows editors.
+        sb = json.loads(path.read_text(encoding="utf-8-sig"))
+    except (OSError, json.JSONDecodeError) as e:
+        raise StoryboardError(str(path), [str(e)]) from None
+    return compile_storyboard(sb, source=str(path), backend=backend)
@@ -9,6 +9,7 @@ class GenerateRequest(BaseModel):
     seconds: int = Field(default=6, ge=1, le=20)
     fps: int = Field(default=24, ge=8, le=60)
     seed: int | None = None
+    seed_policy: str | None = None  # set with a policy-derived `seed` (seeds.DERIVED); cache keys use it
     backend: str = Field(default="cogvideox")
 
     # output
@@ -18,6 +19,32 @@ class GenerateRequest(BaseModel):
     width: int = 768
     height: int = 1344  # 9:16-ish base
 
+    # generate at the backend's native size, upscale in finishing (see planner.py)
+    native_resolution: bool = True
+    sharpen: bool = False
+
+    # reject black/frozen/flashing/corrupt clips before finishing (see quality.py)
+    quality_gate: bool = False
+
+    # reuse a clip rendered before for the same scene (see scene_cache.py);
+    # `reuse` names a cached near-duplicate to use instead
+    # (clips of unseeded requests are neither looked up nor stored: each run is a new draw)
+    scene_cache: bool = True
+    reuse: str | None = None
+    expand_prompts: bool = False  # expand `text` into a cinematic prompt (prompt_expander.py) first
+
     # post
+    caption_size: int = 64  # drawtext fontsize at WxH
+    preset: str = "slow"  # x264 preset for finishing encodes
     upscale_4k: bool = True
-    interpolate: bool = False
+    interpolate: bool = False  # generate fewer frames, interpolate up to fps (see planner.plan_fps)
+    interpolator: str = "minterpolate"
+
+    # extra outputs rendered from the same decode (see variants.VARIANTS)
+    variants: list[str] = Field(default_factory=list)
+
+    # audio mixed in the finishing pass (see audiomix.py)
+    audio_bed: str | None = None  # track path, or "auto" = least recently used from the audio index
+    audio_category: str | None = None  # with "auto": rain / ocean / fire / nature
+    narration: str | None = None  # voice-over file, bed is ducked under it
+    channel: str = "default"  # rotation state in the audio index is per channel
@@ -0,0 +1,493 @@
+"""
+Job queue daemon — tails a JSONL intake file into SQLite and runs the jobs.
+
+Each intake line is one job::
+
+    {"kind": "generate", "channel": "dogs", "text": "...", "out": "out/x.mp4"}
+    {"kind": "storyboard", "channel": "aitools", "path": "storyboards/ai.json", "video": 2}
+    {"kind": "longform", "channel": "sleepsounds", "clip": "...", "out": "...", "minutes": 600}
+
+optionally with "id" (lines repeating a known id are ignored), "max_attempts"
+and "deadline" (unix time). The byte offset of the last complete line is
+stored with the inserted jobs in one transaction, so a restart neither loses
+nor duplicates lines. Jobs go to the shared `GpuScheduler`; at most
+`max_inflight` are handed over at a time and intake pauses while `max_queued`
+jobs are waiting, so the backlog stays in SQLite (and in the file) rather
+than in memory. Failed jobs are retried with exponential backoff; a job that
+was running when the daemon died is queued again on start. Before jobs are
+handed over, an incremental workspace sweep (see `workspace_gc.py`) frees
+disk space. The running scene's step progress and ETA (see `progress.py`) is
+logged every `PROGRESS_SECONDS`.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from pydantic import ValidationError
+
+from .config import GenerateRequest
+from .scheduler import DEFAULT_WEIGHTS, GpuJob, GpuScheduler
+from .workspace_gc import Policy, Workspace
+
+DAEMON_DB = Path("out") / "daemon.sqlite"
+INTAKE_PATH = Path("requests.jsonl")
+
+KINDS = ("generate", "storyboard", "longform")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+REJECTED = "rejected"  # intake line that is not a valid job
+
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 30.0  # seconds before the first retry, doubled each time
+RETRY_BACKOFF_MAX = 900.0
+MAX_INFLIGHT = 2
+MAX_QUEUED = 100
+POLL_SECONDS = 2.0
+PROGRESS_SECONDS = 60.0  # how often the running scene's progress is logged
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS intake (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    external_id TEXT UNIQUE,
+    kind TEXT,
+    channel TEXT,
+    spec TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    deadline REAL,
+    next_run_at REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, next_run_at, id);
+"""
+
+
+def _generator_outputs() -> list[Path]:
+    from .backends.wangp_14b import OUTPUTS_DIR
+
+    return [OUTPUTS_DIR] if OUTPUTS_DIR.exists() else []
+
+
+@dataclass(frozen=True)
+class QueuedJob:
+    id: int
+    external_id: str | None
+    kind: str | None
+    channel: str | None
+    spec: dict
+    state: str
+    attempts: int
+    max_attempts: int
+    deadline: float | None
+    next_run_at: float
+    error: str | None
+    result: list | None
+    created_at: float
+    updated_at: float
+
+
+def validate(spec: dict, channels: set[str]) -> str | None:
+    """Why `spec` can't be run (None when it can)."""
+    kind = spec.get("kind")
+    if kind is None:
+        return "missing 'kind'"
+    if kind not in KINDS:
+        return f"Unknown kind '{kind}'. Available: {list(KINDS)}"
+    channel = spec.get("channel", "default")
+    if channel not in channels:
+        return f"Unknown channel '{channel}'. Available: {sorted(channels)}"
+    attempts = spec.get("max_attempts", MAX_ATTEMPTS)
+    if isinstance(attempts, bool) or not isinstance(attempts, int) or attempts < 1:
+        return f"'max_attempts' must be a positive integer, got {attempts!r}"
+    deadline = spec.get("deadline")
+    if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float))):
+        return f"'deadline' must be unix seconds, got {deadline!r}"
+    if kind == "generate":
+        try:
+            GenerateRequest(**_fields(spec))
+        except ValidationError as e:
+            return str(e)
+    elif kind == "storyboard" and not spec.get("path"):
+        return "storyboard job needs 'path'"
+    elif kind == "longform" and not (spec.get("clip") and spec.get("out")):
+        return "longform job needs 'clip' and 'out'"
+    return None
+
+
+def _fields(spec: dict) -> dict:
+    """The job-specific part of an intake line."""
+    return {k: v for k, v in spec.items() if k not in ("kind", "id", "max_attempts", "deadline")}
+
+
+Finish = Callable[[list[Any]], Any]
+
+
+def job_tasks(spec: dict) -> tuple[list[Callable[[], Any]], Finish | None]:
+    """GPU units of a job (the scheduler may switch channels between them) and its CPU finish step."""
+    kind = spec["kind"]
+    if kind == "generate":
+        from .pipeline import run
+
+        req = GenerateRequest(**_fields(spec))
+        return [lambda: str(run(req))], None
+
+    if kind == "storyboard":
+        from .compiler import compile_storyboard
+        from .storyboard import finish_video, iter_videos, load_storyboard, render_scene, scene_outputs
+
+        sb = load_storyboard(Path(spec["path"]))
+        compile_storyboard(sb, source=spec["path"])
+        videos = iter_videos(sb)
+        if spec.get("video") is not None:
+            videos = [videos[int(spec["video"]) - 1]]
+        root = Path(spec.get("root", "."))
+        preview = bool(spec.get("preview", False))
+        # one unit per scene, as run_video renders them; the videos are concatenated on the CPU pool
+        scenes = [
+            lambda v=v, i=i, out=out: render_scene(sb, v, i, out=out, preview=preview)
+            for v in videos
+            for i, out in enumerate(scene_outputs(v, root=root, preview=preview), start=1)
+        ]
+
+        def finish(paths: list[Path]) -> list[str]:
+            finals, k = [], 0
+            for v in videos:
+                n = len(v["scenes"])
+                finals.append(str(finish_video(sb, v, paths[k : k + n], root=root, preview=preview)))
+                k += n
+            return finals
+
+        return scenes, finish
+
+    from .longform import render_longform
+
+    return [
+        lambda: str(
+            render_longform(
+                Path(spec["clip"]),
+                Path(spec["out"]),
+                minutes=float(spec.get("minutes", 60)),
+                fps=int(spec.get("fps", 24)),
+                audio=Path(spec["audio"]) if spec.get("audio") else None,
+            )
+        )
+    ], None
+
+
+class JobQueue:
+    """The SQLite side: intake offsets and job rows (no execution)."""
+
+    def __init__(self, db_path: Path = DAEMON_DB, *, channels: set[str] | None = None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self.channels = channels or {*DEFAULT_WEIGHTS, "default"}
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def ingest(self, intake: Path = INTAKE_PATH, *, limit: int | None = None) -> int:
+        """Insert complete lines past the stored offset (at most `limit` jobs). Returns lines read."""
+        intake = Path(intake)
+        if not intake.exists():
+            return 0
+        key = str(intake.resolve())
+        row = self.conn.execute("SELECT offset FROM intake WHERE path = ?", (key,)).fetchone()
+        offset = row["offset"] if row else 0
+        if intake.stat().st_size < offset:
+            print(f"[daemon] {intake} shrank, reading it from the start")
+            offset = 0
+
+        n = 0
+        now = time.time()
+        with open(intake, "rb") as f:
+            f.seek(offset)
+            while limit is None or n < limit:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break  # EOF or a line still being written
+                offset += len(line)
+                if not line.strip():
+                    continue
+                n += 1
+                self._insert(line, now)
+        self.conn.execute("INSERT OR REPLACE INTO intake (path, offset) VALUES (?, ?)", (key, offset))
+        self.conn.commit()
+        return n
+
+    def _insert(self, line: bytes, now: float) -> None:
+        try:
+            spec = json.loads(line)
+            error = None if isinstance(spec, dict) else "intake line is not a JSON object"
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            spec, error = {"raw": line.decode("utf-8", "replace").strip()}, f"invalid JSON: {e}"
+        if not isinstance(spec, dict):
+            spec = {"raw": spec}
+        error = error or validate(spec, self.channels)
+        self.conn.execute(
+            "INSERT OR IGNORE INTO jobs (external_id, kind, channel, spec, state, max_attempts, deadline,"
+            " error, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?,?,?)",
+            (
+                str(spec["id"]) if spec.get("id") is not None else None,
+                spec.get("kind"),
+                spec.get("channel", "default"),
+                json.dumps(spec),
+                REJECTED if error else QUEUED,
+                MAX_ATTEMPTS if error else spec.get("max_attempts", MAX_ATTEMPTS),
+                None if error else spec.get("deadline"),
+                error,
+                now,
+                now,
+            ),
+        )
+        if error:
+            print(f"[daemon] rejected intake line: {error.splitlines()[0]}")
+
+    def _job(self, row: sqlite3.Row) -> QueuedJob:
+        d = dict(row)
+        d["spec"] = json.loads(d["spec"])
+        d["result"] = json.loads(d["result"]) if d["result"] else None
+        return QueuedJob(**d)
+
+    def get(self, job_id: int) -> QueuedJob | None:
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def jobs(self, state: str | None = None) -> list[QueuedJob]:
+        if state:
+            rows = self.conn.execute("SELECT * FROM jobs WHERE state = ? ORDER BY id", (state,))
+        else:
+            rows = self.conn.execute("SELECT * FROM jobs ORDER BY id")
+        return [self._job(r) for r in rows]
+
+    def counts(self) -> dict[str, int]:
+        rows = self.conn.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state")
+        return {r["state"]: r["n"] for r in rows}
+
+    def due(self, limit: int, now: float | None = None) -> list[QueuedJob]:
+        """Queued jobs whose retry backoff has passed, oldest first."""
+        rows = self.conn.execute(
+            "SELECT * FROM jobs WHERE state = ? AND next_run_at <= ? ORDER BY id LIMIT ?",
+            (QUEUED, now if now is not None else time.time(), limit),
+        )
+        return [self._job(r) for r in rows]
+
+    def _update(self, job_id: int, **fields) -> None:
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        self.conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+        self.conn.commit()
+
+    def start(self, job_id: int) -> None:
+        self.conn.execute("UPDATE jobs SET attempts = attempts + 1 WHERE id = ?", (job_id,))
+        self._update(job_id, state=RUNNING)
+
+    def finish(self, job_id: int, result: list) -> None:
+        if self.get(job_id).state == RUNNING:  # not cancelled meanwhile
+            self._update(job_id, state=DONE, result=json.dumps(result), error=None)
+
+    def fail(self, job_id: int, error: str, *, retry: bool = True) -> str:
+        """Queue a retry with backoff, or mark failed once attempts are used up. Returns the new state."""
+        job = self.get(job_id)
+        if job.state != RUNNING:
+            return job.state
+        if retry and job.attempts < job.max_attempts:
+            delay = min(RETRY_BACKOFF * 2 ** (job.attempts - 1), RETRY_BACKOFF_MAX)
+            self._update(job_id, state=QUEUED, error=error, next_run_at=time.time() + delay)
+            return QUEUED
+        self._update(job_id, state=FAILED, error=error)
+        return FAILED
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued or running job; the daemon stops a running one after its current scene."""
+        cur = self.conn.execute(
+            "UPDATE jobs SET state = ?, updated_at = ? WHERE id = ? AND state IN (?, ?)",
+            (CANCELLED, time.time(), job_id, QUEUED, RUNNING),
+        )
+        self.conn.commit()
+        return cur.rowcount > 0
+
+    def requeue(self, job_id: int) -> bool:
+        """Run a finished, failed or cancelled job again with a fresh attempt budget."""
+        job = self.get(job_id)
+        if job is None or job.state not in (DONE, FAILED, CANCELLED, REJECTED):
+            return False
+        if job.state == REJECTED:
+            error = validate(job.spec, self.channels)
+            if error:
+                raise ValueError(f"Job {job_id} is still invalid: {error}")
+            # rejected rows were stored with the defaults
+            self.conn.execute(
+                "UPDATE jobs SET max_attempts = ?, deadline = ? WHERE id = ?",
+                (job.spec.get("max_attempts", MAX_ATTEMPTS), job.spec.get("deadline"), job_id),
+            )
+        self.conn.execute("UPDATE jobs SET attempts = 0 WHERE id = ?", (job_id,))
+        self._update(job_id, state=QUEUED, error=None, next_run_at=0)
+        return True
+
+    def recover(self) -> int:
+        """Jobs left running by a dead daemon go back to the queue (attempt kept)."""
+        cur = self.conn.execute(
+            "UPDATE jobs SET state = ?, updated_at = ? WHERE state = ?", (QUEUED, time.time(), RUNNING)
+        )
+        self.conn.commit()
+        return cur.rowcount
+
+
+class Daemon:
+    def __init__(
+        self,
+        db_path: Path = DAEMON_DB,
+        intake: Path = INTAKE_PATH,
+        *,
+        weights: dict[str, float] | None = None,
+        max_inflight: int = MAX_INFLIGHT,
+        max_queued: int = MAX_QUEUED,
+        poll: float = POLL_SECONDS,
+        gc: Policy | None = Policy(),
+    ):
+        self.intake = Path(intake)
+        self.scheduler = GpuScheduler({"default": 1.0, **(weights or {})})
+        self.queue = JobQueue(db_path, channels=set(self.scheduler.weights))
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+        self.poll = poll
+        self.inflight: dict[int, Future] = {}
+        self._gpu_jobs: dict[int, GpuJob] = {}
+        self.gc = gc
+        self.workspace = Workspace(extra=_generator_outputs()) if gc else None
+        self._progress_at = float("-inf")
+
+    def step(self) -> int:
+        """One round: intake, hand due jobs to the scheduler, collect finished ones."""
+        waiting = self.queue.counts().get(QUEUED, 0)
+        if waiting < self.max_queued:
+            self.queue.ingest(self.intake, limit=self.max_queued - waiting)
+
+        due = self.queue.due(self.max_inflight - len(self.inflight))
+        if due and self.workspace is not None:
+            self._sweep()
+        for job in due:
+            self._submit(job)
+        self._stop_cancelled()
+        self._progress()
+        return self._collect()
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job; if it is on the GPU, its remaining scenes are dropped."""
+        ok = self.queue.cancel(job_id)
+        if ok and job_id in self._gpu_jobs:
+            self.scheduler.cancel(self._gpu_jobs[job_id])
+        return ok
+
+    def _stop_cancelled(self) -> None:
+        """Jobs cancelled from another process (`t2v-shorts daemon cancel`) leave the scheduler too."""
+        for job_id, gpu_job in list(self._gpu_jobs.items()):
+            job = self.queue.get(job_id)
+            if job is not None and job.state == CANCELLED:
+                self.scheduler.cancel(gpu_job)
+
+    def _progress(self) -> None:
+        now = time.monotonic()
+        if now - self._progress_at < PROGRESS_SECONDS:
+            return
+        running = self.scheduler.running()
+        if running is not None and running[2] is not None:
+            job, scene, event = running
+            print(f"[daemon] {job.name} scene {scene}/{len(job.scenes)}: {event}")
+            self._progress_at = now
+
+    def _sweep(self) -> None:
+        try:
+            report = self.workspace.sweep(self.gc)
+        except Exception as e:  # a full disk is the job's problem, not the daemon's
+            print(f"[daemon] workspace sweep failed: {e}")
+            return
+        if report.deleted:
+            print(f"[daemon] gc freed {report.freed / 1e9:.2f} GB ({len(report.deleted)} file(s))")
+
+    def _submit(self, job: QueuedJob) -> None:
+        self.queue.start(job.id)
+        try:
+            tasks, finish = job_tasks(job.spec)
+        except Exception as e:  # bad storyboard path etc.
+            print(f"[daemon] job {job.id} -> {self.queue.fail(job.id, repr(e))}: {e}")
+            return
+        try:
+            deadline = None
+            if job.deadline is not None:
+                deadline = self.scheduler.clock() + (float(job.deadline) - time.time())
+        except (TypeError, ValueError) as e:  # rows stored before deadlines were validated
+            print(f"[daemon] job {job.id} -> {self.queue.fail(job.id, f'bad deadline: {e}', retry=False)}: {e}")
+            return
+        name = job.spec.get("out") or job.spec.get("path") or f"job_{job.id}"
+        gpu_job = GpuJob(job.channel, str(name), tasks, finish=finish, deadline=deadline)
+        self.inflight[job.id] = self.scheduler.submit(gpu_job)
+        self._gpu_jobs[job.id] = gpu_job
+        print(f"[daemon] job {job.id} ({job.kind}, {job.channel}) started, attempt {job.attempts + 1}")
+
+    def _collect(self) -> int:
+        """Record finished jobs; SQLite is only touched from the daemon thread."""
+        n = 0
+        for job_id, future in list(self.inflight.items()):
+            if not future.done():
+                continue
+            del self.inflight[job_id]
+            self._gpu_jobs.pop(job_id, None)
+            n += 1
+            if future.cancelled():
+                print(f"[daemon] job {job_id} cancelled")
+                continue
+            e = future.exception()
+            if e is None:
+                self.queue.finish(job_id, future.result())
+                print(f"[daemon] job {job_id} done: {future.result()}")
+            else:
+                print(f"[daemon] job {job_id} -> {self.queue.fail(job_id, repr(e))}: {e}")
+        return n
+
+    def run(self, *, once: bool = False) -> None:
+        """Serve until interrupted; with `once`, exit when nothing is queued or running."""
+        n = self.queue.recover()
+        if n:
+            print(f"[daemon] re-queued {n} job(s) left running by the last run")
+        self.scheduler.start()
+        try:
+            while True:
+                self.step()
+                if once and not self.inflight and not self.queue.counts().get(QUEUED):
+                    break
+                time.sleep(self.poll)
+        except KeyboardInterrupt:
+            print("[daemon] stopping; running jobs are re-queued on the next start")
+        finally:
+            self.scheduler.stop(wait=not self.inflight)
+            self.queue.close()
+            if self.workspace is not None:
+                self.workspace.close()
@@ -0,0 +1,304 @@
+"""
+Device pool — one backend worker per GPU, scenes sharded across them by cost.
+
+Backends address "cuda", i.e. the first GPU the process can see, so every
+worker is a process of its own started with `CUDA_VISIBLE_DEVICES=<device>`.
+Models load once per worker and stay resident between scenes.
+
+Scenes are sharded longest-processing-time first: by decreasing estimated
+cost, each scene goes to the device that would finish it earliest given the
+device's measured speed. A device that runs out of work steals the cheapest
+pending scene of the device with the most left, so a wrong estimate doesn't
+leave a GPU idle.
+
+A worker whose process dies, or that fails `MAX_FAILURES` scenes in a row, is
+marked down and its pending scenes go to the healthy devices (the scene it was
+running too, if the process died). Errors that are the scene's own fault
+(`task_errors`, e.g. a clip failing the quality gate) fail just that scene:
+they neither count against the device nor move the scene to another one. `DevicePool.stats()` reports scenes,
+failures, busy time and throughput per device.
+
+The wangp backend finds its result by scanning the one WanGP install's
+outputs/ folder, so it isn't run on more than one device at a time.
+
+With `processes=False` the workers are threads of this process and no CUDA
+environment is set: fake devices for exercising the sharding and scheduling
+with the stub backend.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Hashable
+
+MAX_FAILURES = 2  # scenes failed in a row before a device is taken out
+TASK_ERRORS: tuple[type[Exception], ...] = (ValueError,)  # bad input, not a bad device
+SERIAL_BACKENDS = {"wangp"}  # backends that can't run twice at once on one host
+
+_local = threading.local()
+
+
+def visible_devices() -> list[str]:
+    """GPUs this process may use: `CUDA_VISIBLE_DEVICES` if set, else every device torch finds."""
+    env = os.environ.get("CUDA_VISIBLE_DEVICES")
+    if env is not None:
+        return [d.strip() for d in env.split(",") if d.strip() and d.strip() != "-1"]
+    try:
+        import torch
+
+        return [str(i) for i in range(torch.cuda.device_count())]
+    except Exception:
+        return []
+
+
+def current_device() -> str | None:
+    """The device of the pool worker running the caller (None outside a pool)."""
+    return getattr(_local, "device", None)
+
+
+def _init_worker(device: str, set_env: bool) -> None:
+    if set_env:
+        # Before any backend imports torch in this process.
+        os.environ["CUDA_VISIBLE_DEVICES"] = device
+    _local.device = device
+
+
+@dataclass(frozen=True)
+class Task:
+    key: Hashable
+    fn: Callable[..., Any]  # module-level, so it can be sent to a worker process
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    cost: float = 1.0  # any unit, the same for all tasks of a `map`
+
+
+@dataclass
+class DeviceStats:
+    device: str
+    healthy: bool = True
+    scenes: int = 0
+    failed: int = 0
+    failed_in_row: int = 0
+    busy_seconds: float = 0.0
+    work: float = 0.0  # cost of the completed scenes
+    error: str | None = None
+
+    @property
+    def throughput(self) -> float:
+        """Cost units per busy second."""
+        return self.work / self.busy_seconds if self.busy_seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        state = "ok" if self.healthy else f"DOWN ({self.error})"
+        return (
+            f"gpu {self.device}: {state}, {self.scenes} scenes, {self.failed} failed, "
+            f"busy {self.busy_seconds:.0f}s, {self.throughput:.3g} work/s"
+        )
+
+
+def shard(costs: list[float], speeds: dict[str, float]) -> dict[str, list[int]]:
+    """Longest processing time first: task indices per device, most expensive first."""
+    loads = {d: 0.0 for d in speeds}
+    out: dict[str, list[int]] = {d: [] for d in speeds}
+    for i in sorted(range(len(costs)), key=lambda i: -costs[i]):
+        d = min(speeds, key=lambda d: (loads[d] + costs[i]) / speeds[d])
+        loads[d] += costs[i]
+        out[d].append(i)
+    return out
+
+
+class DevicePool:
+    def __init__(
+        self,
+        devices: list[str] | None = None,
+        *,
+        processes: bool = True,
+        task_errors: tuple[type[Exception], ...] = TASK_ERRORS,
+    ):
+        devices = visible_devices() if devices is None else list(devices)
+        if len(set(devices)) != len(devices):
+            raise ValueError(f"Duplicate devices: {devices}")
+        self.devices = devices or [""]  # "": whatever the process sees (CPU-only boxes)
+        self.processes = processes
+        self.task_errors = task_errors
+        self._stats = {d: DeviceStats(d) for d in self.devices}
+        self._executors: dict[str, Executor] = {}
+        self._cond = threading.Condition()
+
+    def close(self) -> None:
+        for ex in self._executors.values():
+            ex.shutdown(wait=True, cancel_futures=True)
+        self._executors.clear()
+
+    def __enter__(self) -> "DevicePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _executor(self, device: str) -> Executor:
+        ex = self._executors.get(device)
+        if ex is None:
+            if self.processes:
+                # spawn: a fork would inherit this process' CUDA state
+                ex = ProcessPoolExecutor(
+                    1,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(device, bool(device)),
+                )
+            else:
+                ex = ThreadPoolExecutor(1, thread_name_prefix=f"gpu{device}", initializer=_init_worker, initargs=(device, False))
+            self._executors[device] = ex
+        return ex
+
+    def healthy(self) -> list[str]:
+        with self._cond:
+            return [d for d in self.devices if self._stats[d].healthy]
+
+    def speeds(self) -> dict[str, float]:
+        """Relative speed of each healthy device; 1.0 until a device has completed work."""
+        with self._cond:
+            measured = [self._stats[d].throughput for d in self.devices if self._stats[d].throughput > 0]
+            mean = sum(measured) / len(measured) if measured else 0.0
+            return {
+                d: (self._stats[d].throughput / mean if self._stats[d].throughput > 0 else 1.0)
+                for d in self.devices
+                if self._stats[d].healthy
+            }
+
+    def stats(self) -> list[DeviceStats]:
+        with self._cond:
+            return [replace(self._stats[d]) for d in self.devices]
+
+    def report(self) -> str:
+        return "\n".join(str(s) for s in self.stats())
+
+    def map(self, tasks: list[Task]) -> list[Any]:
+        """Run `tasks` across the healthy devices and return their results in order.
+
+        A task that fails is tried once more on another device (a bad GPU, not a
+        bad scene), unless the error is one of `task_errors`; every task runs
+        before the first failure, in task order, is raised.
+        """
+        results: dict[int, Any] = {}
+        errors: dict[int, BaseException] = {}
+        tried: dict[int, set[str]] = {i: set() for i in range(len(tasks))}
+        pending = list(range(len(tasks)))
+        while pending:
+            speeds = self.speeds()
+            for i in [i for i in pending if not set(speeds) - tried[i]]:
+                errors.setdefault(i, RuntimeError(f"No healthy device left for {tasks[i].key!r}"))
+                pending.remove(i)
+            if not pending:
+                break
+            queues = {d: [pending[j] for j in q] for d, q in shard([tasks[i].cost for i in pending], speeds).items()}
+            self._round(tasks, queues, tried, results, errors)
+            # scenes of a device that went down after the others had finished
+            pending = [i for i in range(len(tasks)) if i not in results and i not in errors]
+        for i in sorted(errors):
+            raise errors[i]
+        return [results[i] for i in range(len(tasks))]
+
+    def _round(
+        self,
+        tasks: list[Task],
+        queues: dict[str, list[int]],
+        tried: dict[int, set[str]],
+        results: dict[int, Any],
+        errors: dict[int, BaseException],
+    ) -> None:
+        def left(d: str) -> float:
+            return sum(tasks[i].cost for i in queues[d])
+
+        def place(i: int) -> bool:
+            """Queue `i` on the least loaded healthy device it hasn't failed on."""
+            alive = [d for d in queues if self._stats[d].healthy and d not in tried[i]]
+            if alive:
+                queues[min(alive, key=left)].append(i)
+            return bool(alive)
+
+        with self._cond:
+            for d in queues:
+                for i in [i for i in queues[d] if d in tried[i]]:
+                    queues[d].remove(i)
+                    place(i)
+
+        def take(d: str) -> int | None:
+            with self._cond:
+                if not self._stats[d].healthy:
+                    return None
+                if queues[d]:
+                    return queues[d].pop(0)
+                # steal the cheapest scene of the device with the most work left
+                for donor in sorted((o for o in queues if queues[o]), key=left, reverse=True):
+                    for i in reversed(queues[donor]):
+                        if d not in tried[i]:
+                            queues[donor].remove(i)
+                            return i
+                return None
+
+        def down(d: str, error: str, requeue: list[int]) -> None:
+            with self._cond:
+                s = self._stats[d]
+                s.healthy = False
+                s.error = error
+                orphans, queues[d] = requeue + queues[d], []
+                for i in orphans:
+                    if not place(i):
+                        errors[i] = RuntimeError(f"No healthy device left for {tasks[i].key!r}")
+            print(f"[devices] gpu {d} is down: {error}")
+
+        def serve(d: str) -> None:
+            while (i := take(d)) is not None:
+                task = tasks[i]
+                t0 = time.monotonic()
+                try:
+                    result = self._executor(d).submit(task.fn, *task.args, **task.kwargs).result()
+                except BrokenProcessPool as e:
+                    ex = self._executors.pop(d, None)
+                    if ex is not None:
+                        ex.shutdown(wait=False, cancel_futures=True)
+                    down(d, f"worker died: {e}", [i])
+                    return
+                except self.task_errors as e:
+                    with self._cond:
+                        s = self._stats[d]
+                        s.failed += 1
+                        s.busy_seconds += time.monotonic() - t0
+                        errors[i] = e
+                    continue
+                except Exception as e:
+                    elapsed = time.monotonic() - t0
+                    with self._cond:
+                        s = self._stats[d]
+                        s.failed += 1
+                        s.failed_in_row += 1
+                        s.busy_seconds += elapsed
+                        tried[i].add(d)
+                        if len(tried[i]) > 1 or not place(i):
+                            errors[i] = e
+                        failing = s.failed_in_row >= MAX_FAILURES
+                    if failing:
+                        down(d, f"{MAX_FAILURES} scenes failed in a row, last: {e}", [])
+                        return
+                    continue
+                elapsed = time.monotonic() - t0
+                with self._cond:
+                    s = self._stats[d]
+                    s.scenes += 1
+                    s.failed_in_row = 0
+                    s.busy_seconds += elapsed
+                    s.work += task.cost
+                    results[i] = result
+
+        threads = [threading.Thread(target=serve, args=(d,), name=f"dispatch-gpu{d}") for d in queues]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
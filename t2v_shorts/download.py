@@ -0,0 +1,118 @@
+"""
+Bulk file downloader — pooled connections, bounded concurrency, resumable.
+
+Each item streams to `<dest>.part` and is renamed into place once complete and
+(if an expected hash is given) verified. An interrupted download resumes with an
+HTTP Range request; files already present are skipped. The session and the
+base URL are injectable so the whole thing runs against a local HTTP server.
+"""
+from __future__ import annotations
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CHUNK = 1 << 20
+TIMEOUT = 60
+
+
+@dataclass(frozen=True)
+class DownloadItem:
+    url: str
+    dest: Path
+    sha256: str | None = None  # expected hash, if known (e.g. from the manifest)
+
+
+@dataclass
+class DownloadResult:
+    item: DownloadItem
+    status: str  # skipped | downloaded | resumed | failed
+    sha256: str | None = None
+    size: int = 0
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status != "failed"
+
+
+def make_session(pool_size: int = 8, retries: int = 3) -> requests.Session:
+    """Session whose connection pool matches the worker count, with retry/backoff."""
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def rebase(url: str, base_url: str | None) -> str:
+    """Swap scheme+host of `url` for `base_url` (a mirror or a local test server)."""
+    if not base_url:
+        return url
+    base, src = urlsplit(base_url), urlsplit(url)
+    return urlunsplit((base.scheme, base.netloc, base.path.rstrip("/") + src.path, src.query, ""))
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def fetch(session: requests.Session, item: DownloadItem, *, timeout: float = TIMEOUT) -> DownloadResult:
+    dest = Path(item.dest)
+    if dest.exists():
+        digest = sha256_file(dest)
+        if item.sha256 is None or digest == item.sha256:
+            return DownloadResult(item, "skipped", digest, dest.stat().st_size)
+        dest.unlink()  # present but wrong: fetch again
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = dest.with_name(dest.name + ".part")
+    offset = part.stat().st_size if part.exists() else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    try:
+        with session.get(item.url, headers=headers, stream=True, timeout=timeout) as r:
+            if r.status_code == 416:
+                # Range past the end: the .part already holds the whole file.
+                status = "resumed"
+            else:
+                r.raise_for_status()
+                resumed = offset > 0 and r.status_code == 206
+                status = "resumed" if resumed else "downloaded"
+                with open(part, "ab" if resumed else "wb") as f:
+                    for block in r.iter_content(CHUNK):
+                        f.write(block)
+    except requests.RequestException as e:
+        return DownloadResult(item, "failed", error=str(e))
+
+    digest = sha256_file(part)
+    if item.sha256 and digest != item.sha256:
+        part.unlink()
+        return DownloadResult(item, "failed", digest, error=f"sha256 mismatch: expected {item.sha256}, got {digest}")
+    part.replace(dest)
+    return DownloadResult(item, status, digest, dest.stat().st_size)
+
+
+def download_all(
+    items: list[DownloadItem],
+    *,
+    workers: int = 4,
+    session: requests.Session | None = None,
+    base_url: str | None = None,
+) -> list[DownloadResult]:
+    """Fetch every item with at most `workers` in flight; results keep the input order."""
+    session = session or make_session(pool_size=workers)
+    items = [DownloadItem(rebase(i.url, base_url), i.dest, i.sha256) for i in items]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda i: fetch(session, i), items))
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+
+# Light luma-only unsharp: recovers some edge contrast lost to a large upscale.
+SHARPEN_FILTER = "unsharp=5:5:0.6:5:5:0.0"
+
+
+def fit_filter(
+    width: int,
+    height: int,
+    mode: str = "pad",
+    *,
+    scale_flags: str | None = None,
+    sharpen: bool = False,
+    pre: str | None = None,
+    src: str = "[0:v]",
+    tag: str = "",
+) -> str:
+    """Filter that fits the input video to exact WxH (see `pipeline.ffmpeg_fit`).
+
+    "blur" returns a filter_complex fragment reading `src`; the other modes
+    return a plain -vf chain. scale_flags (e.g. "lanczos") applies to the
+    foreground scale, which is where upscaling quality matters. pre is a chain
+    run on the source first, at generation size (e.g. frame interpolation).
+    tag suffixes the internal labels, for several fits in one graph.
+    """
+    flags = f":flags={scale_flags}" if scale_flags else ""
+    if mode == "blur" and (pre or src != "[0:v]"):
+        # a graph label (unlike an input stream) can only be read once
+        vf = (
+            f"{src}{pre + ',' if pre else ''}split=2[src_bg{tag}][src_fg{tag}];"
+            f"[src_bg{tag}]scale={width}:{height}:force_original_aspect_ratio=increase,"
+            f"crop={width}:{height},gblur=sigma=30[bg{tag}];"
+            f"[src_fg{tag}]scale={width}:{height}:force_original_aspect_ratio=decrease{flags}[fg{tag}];"
+            f"[bg{tag}][fg{tag}]overlay=(W-w)/2:(H-h)/2"
+        )
+    elif mode == "crop":
+        vf = f"scale={width}:{height}:force_original_aspect_ratio=increase{flags},crop={width}:{height}"
+    elif mode == "blur":
+        # Full-frame vertical with blurred background + sharp foreground (no ugly zoom crop).
+        # 1) bg: scale to fill, blur
+        # 2) fg: scale to fit, overlay centered
+        vf = (
+            f"[0:v]scale={width}:{height}:force_original_aspect_ratio=increase,"
+            f"crop={width}:{height},gblur=sigma=30[bg];"
+            f"[0:v]scale={width}:{height}:force_original_aspect_ratio=decrease{flags}[fg];"
+            f"[bg][fg]overlay=(W-w)/2:(H-h)/2"
+        )
+    else:
+        vf = (
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease{flags},"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2"
+        )
+    if pre and mode != "blur":
+        vf = pre + "," + vf
+    if sharpen:
+        vf += "," + SHARPEN_FILTER
+    return vf
+
+
+def fit_graph(width: int, height: int, mode: str = "pad", *, src: str = "[0:v]", **kwargs) -> str:
+    """Like `fit_filter`, but always a filter_complex fragment reading `src`."""
+    vf = fit_filter(width, height, mode, src=src, **kwargs)
+    return vf if mode == "blur" else src + vf
+
+
+def text_filter(textfile: Path, *, fontsize: int = 64, y: float = 0.78) -> str:
+    """Bottom-center captions.
+
+    Safe: uses textfile to avoid quoting/escaping user text, and a font name
+    (avoids Windows drive-letter escaping issues).
+    """
+    font_name = os.environ.get("T2V_SHORTS_FONT_NAME", "Arial")
+    txt_p = textfile.as_posix()
+
+    return (
+        "drawtext="
+        f"font={font_name}:"
+        f"textfile={txt_p}:"
+        "reload=0:"
+        f"fontsize={fontsize}:"
+        "fontcolor=white:"
+        f"borderw={max(1, round(fontsize / 16))}:"
+        "bordercolor=black:"
+        "x=(w-text_w)/2:"
+        f"y=h*{y}"
+    )
+
+
+def write_caption_file(out_path: Path, overlay_text: str | None) -> Path | None:
+    """Write the caption next to `out_path` for drawtext's textfile= option."""
+    if not overlay_text:
+        return None
+    textfile = out_path.parent / (out_path.stem + "_caption.txt")
+    textfile.parent.mkdir(parents=True, exist_ok=True)
+    textfile.write_text(overlay_text, encoding="utf-8")
+    return textfile
@@ -0,0 +1,45 @@
+"""
+Frame interpolation for the finishing graph.
+
+Backends are asked for fewer frames (see `planner.plan_fps`) and the clip is
+brought back up to the requested fps on the CPU. Interpolators are ffmpeg
+filter builders keyed by name so a different one (e.g. an external RIFE
+build exposed as a filter) can be registered without touching the pipeline.
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict
+
+Interpolator = Callable[[int], str]
+
+
+def _minterpolate(fps: int) -> str:
+    # Motion-compensated, bidirectional ME + overlapped blocks: best quality ffmpeg has.
+    return f"minterpolate=fps={fps}:mi_mode=mci:mc_mode=aobmc:me_mode=bidir:vsbmc=1"
+
+
+def _blend(fps: int) -> str:
+    # Linear frame blending: much cheaper, ghosting on fast motion.
+    return f"framerate=fps={fps}"
+
+
+def _dup(fps: int) -> str:
+    # No new motion, just repeat frames (fallback / A-B comparison).
+    return f"fps={fps}"
+
+
+_INTERPOLATORS: Dict[str, Interpolator] = {
+    "minterpolate": _minterpolate,
+    "blend": _blend,
+    "dup": _dup,
+}
+
+
+def register_interpolator(name: str, build: Interpolator) -> None:
+    _INTERPOLATORS[name] = build
+
+
+def interpolate_filter(fps: int, method: str = "minterpolate") -> str:
+    if method not in _INTERPOLATORS:
+        raise ValueError(f"Unknown interpolator '{method}'. Available: {sorted(_INTERPOLATORS.keys())}")
+    return _INTERPOLATORS[method](fps)
@@ -0,0 +1,128 @@
+"""
+Durable job journal — per-scene / per-video checkpoints in SQLite.
+
+Every unit of work (a scene clip, a finished video, an upload) gets a row
+keyed by a stable name such as `video_3_title/scene_05`, moving through
+pending -> generating -> generated -> finished -> uploaded with its artifact
+path and SHA-256. A re-run asks `done(key, state)` first and skips work whose
+artifact is still on disk with the recorded hash and whose inputs (the
+fingerprint) haven't changed.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .download import sha256_file
+
+JOURNAL_PATH = Path("out") / "journal.sqlite"
+
+PENDING = "pending"
+GENERATING = "generating"
+GENERATED = "generated"
+FINISHED = "finished"
+UPLOADED = "uploaded"
+STATES = (PENDING, GENERATING, GENERATED, FINISHED, UPLOADED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    fingerprint TEXT,
+    path TEXT,
+    sha256 TEXT,
+    detail TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def fingerprint(*parts: object) -> str:
+    """Stable hash of the inputs that produced an artifact (prompt, size, frames...)."""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class Entry:
+    key: str
+    state: str
+    fingerprint: str | None
+    path: str | None
+    sha256: str | None
+    detail: dict
+    updated_at: float
+
+    def reached(self, state: str) -> bool:
+        return STATES.index(self.state) >= STATES.index(state)
+
+
+class Journal:
+    def __init__(self, db_path: Path = JOURNAL_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def get(self, key: str) -> Entry | None:
+        row = self.conn.execute("SELECT * FROM jobs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return Entry(**{**dict(row), "detail": json.loads(row["detail"] or "{}")})
+
+    def set(
+        self,
+        key: str,
+        state: str,
+        *,
+        fingerprint: str | None = None,
+        path: Path | str | None = None,
+        detail: dict | None = None,
+    ) -> Entry:
+        """Record `state` for `key`; an artifact `path` is hashed now. Unset fields keep their value."""
+        if state not in STATES:
+            raise ValueError(f"Unknown state '{state}'. Available: {list(STATES)}")
+        prev = self.get(key)
+        sha = sha256_file(Path(path)) if path else (prev.sha256 if prev else None)
+        values = (
+            key,
+            state,
+            fingerprint if fingerprint is not None else (prev.fingerprint if prev else None),
+            str(path) if path else (prev.path if prev else None),
+            sha,
+            json.dumps({**(prev.detail if prev else {}), **(detail or {})}),
+            time.time(),
+        )
+        self.conn.execute("INSERT OR REPLACE INTO jobs VALUES (?,?,?,?,?,?,?)", values)
+        self.conn.commit()
+        return self.get(key)
+
+    def done(self, key: str, state: str, *, fingerprint: str | None = None) -> Entry | None:
+        """The entry if `key` reached `state` with the same inputs and an intact artifact, else None."""
+        e = self.get(key)
+        if e is None or not e.reached(state):
+            return None
+        if fingerprint is not None and e.fingerprint != fingerprint:
+            return None
+        if e.path and state != UPLOADED:  # once uploaded the local file may be gone
+            p = Path(e.path)
+            if not p.exists() or (e.sha256 and sha256_file(p) != e.sha256):
+                return None
+        return e
+
+    def entries(self, prefix: str = "") -> list[Entry]:
+        rows = self.conn.execute("SELECT key FROM jobs WHERE key LIKE ? ORDER BY key", (prefix + "%",))
+        return [self.get(r["key"]) for r in rows.fetchall()]
@@ -0,0 +1,185 @@
+"""
+Long-form loop renderer — hour-long (or 10-hour) videos from one short clip.
+
+1. find the best loop point with a vectorized frame-similarity search over
+   the first `MAX_CLIP_SECONDS` of the clip (at most `MAX_SEARCH_FRAMES`
+   candidate starts at a time, so memory stays bounded)
+2. render the loop once, with the seam crossfaded
+3. repeat it with the concat demuxer and stream copy, muxing the audio bed
+   (itself a cached click-free loop, see `audioloop.loop_asset`)
+
+Only step 2 encodes video, so the output length barely matters.
+"""
+from __future__ import annotations
+
+import math
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from .audioloop import loop_asset
+from .quality import decode_gray
+
+MAX_CLIP_SECONDS = 120.0  # only the start of longer clips is decoded and searched
+MAX_SEARCH_FRAMES = 1024  # loop starts compared at once (against every frame)
+
+
+@dataclass(frozen=True)
+class LoopPoint:
+    start: int  # first frame of the loop
+    end: int  # frame that looks most like `start` (exclusive end of the loop)
+    distance: float  # mean squared luma difference between the two, 0-255 scale
+
+    @property
+    def frames(self) -> int:
+        return self.end - self.start
+
+
+def _distances(starts: np.ndarray, ends: np.ndarray, x: np.ndarray, min_frames: int) -> np.ndarray:
+    """Mean squared difference of frames `starts` x `ends`; inf where the loop would be too short.
+
+    All pairs in one shot: |a - b|^2 = |a|^2 + |b|^2 - 2ab.
+    """
+    a, b = x[starts], x[ends]
+    d = ((a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2.0 * (a @ b.T)) / x.shape[1]
+    d[(ends[None, :] - starts[:, None]) < min_frames] = np.inf
+    return d
+
+
+def find_loop(frames: np.ndarray, *, min_frames: int, max_frames: int = MAX_SEARCH_FRAMES) -> LoopPoint:
+    """Pair (i, j), j - i >= min_frames, whose frames are most alike.
+
+    Longer clips try every k-th frame as the start (at most `max_frames` of
+    them) against every end, then every start within k of the best one.
+    """
+    n = len(frames)
+    if n <= min_frames:
+        raise ValueError(f"Clip too short to loop: {n} frames, need > {min_frames}")
+
+    x = frames.reshape(n, -1).astype(np.float32)
+    ends = np.arange(n)
+    step = max(1, math.ceil(n / max_frames))
+    starts = np.arange(0, n - min_frames, step)
+    d = _distances(starts, ends, x, min_frames)
+    i, j = np.unravel_index(int(np.argmin(d)), d.shape)
+    if step > 1:
+        start = int(starts[i])
+        starts = np.arange(max(0, start - step + 1), min(n - min_frames, start + step))
+        d = _distances(starts, ends, x, min_frames)
+        i, j = np.unravel_index(int(np.argmin(d)), d.shape)
+    return LoopPoint(int(starts[i]), int(ends[j]), float(max(0.0, d[i, j])))
+
+
+def crossfade_frames(loop: LoopPoint, *, fps: int, crossfade: float) -> int:
+    return max(1, min(int(round(crossfade * fps)), loop.frames // 3))
+
+
+def render_loop(
+    clip: Path,
+    out_path: Path,
+    loop: LoopPoint,
+    *,
+    fps: int,
+    crossfade: float = 0.5,
+    crf: int = 18,
+) -> Path:
+    """Encode frames [start, end) once so that playing it back-to-back is seamless.
+
+    The loop is played from start+X and its last X frames are crossfaded into
+    [start, start+X), so it ends exactly on the frame before where it begins.
+    Frame numbers count at `fps` (the clip is resampled first, as in `decode_gray(fps=)`).
+    """
+    xf = crossfade_frames(loop, fps=fps, crossfade=crossfade)
+    body = loop.frames - xf
+    graph = (
+        f"[0:v]fps={fps},trim=start_frame={loop.start + xf}:end_frame={loop.end},setpts=PTS-STARTPTS,fps={fps}[a];"
+        f"[0:v]fps={fps},trim=start_frame={loop.start}:end_frame={loop.start + xf},setpts=PTS-STARTPTS,fps={fps}[b];"
+        f"[a][b]xfade=transition=fade:duration={xf / fps:.4f}:offset={(body - xf) / fps:.4f},"
+        "format=yuv420p[v]"
+    )
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-i",
+        str(clip),
+        "-filter_complex",
+        graph,
+        "-map",
+        "[v]",
+        "-an",
+        "-r",
+        str(fps),
+        "-c:v",
+        "libx264",
+        "-crf",
+        str(crf),
+        "-preset",
+        "slow",
+        str(out_path),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if not out_path.exists() or out_path.stat().st_size < 1000:
+        raise RuntimeError(f"FFmpeg failed - output missing or too small: {out_path}\nSTDERR: {result.stderr}")
+    return out_path
+
+
+def repeat_loop(
+    loop_clip: Path,
+    out_path: Path,
+    *,
+    loop_seconds: float,
+    seconds: float,
+    audio: Path | None = None,
+    audio_codec: str = "copy",
+) -> Path:
+    """Concat-demux the loop N times with stream copy; audio is looped with -stream_loop."""
+    repeats = math.ceil(seconds / loop_seconds)
+    lst = out_path.parent / (out_path.stem + "_loop_list.txt")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    lst.write_text(f"file '{loop_clip.resolve().as_posix()}'\n" * repeats, encoding="utf-8")
+
+    cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(lst)]
+    if audio:
+        cmd += ["-stream_loop", "-1", "-i", str(audio), "-map", "0:v", "-map", "1:a", "-c:a", audio_codec]
+    cmd += ["-c:v", "copy", "-t", f"{seconds:.3f}", "-movflags", "+faststart", str(out_path)]
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if not out_path.exists() or out_path.stat().st_size < 1000:
+        raise RuntimeError(f"FFmpeg failed - output missing or too small: {out_path}\nSTDERR: {result.stderr}")
+    return out_path
+
+
+def render_longform(
+    clip: Path,
+    out_path: Path,
+    *,
+    minutes: float,
+    fps: int = 24,
+    audio: Path | None = None,
+    min_loop_seconds: float = 2.0,
+    crossfade: float = 0.5,
+) -> Path:
+    # at the output rate, so frame numbers and frames / fps agree whatever the clip's own rate
+    frames = decode_gray(clip, seconds=MAX_CLIP_SECONDS, fps=fps)
+    if len(frames) >= MAX_CLIP_SECONDS * fps:
+        print(f"[longform] searching the first {MAX_CLIP_SECONDS:.0f}s of {clip} for a loop")
+    loop = find_loop(frames, min_frames=int(min_loop_seconds * fps))
+    print(f"[longform] loop frames {loop.start}->{loop.end} ({loop.frames / fps:.2f}s, distance {loop.distance:.1f})")
+
+    loop_clip = out_path.parent / (out_path.stem + "_loop.mp4")
+    render_loop(clip, loop_clip, loop, fps=fps, crossfade=crossfade)
+
+    loop_seconds = (loop.frames - crossfade_frames(loop, fps=fps, crossfade=crossfade)) / fps
+    if audio is None:
+        return repeat_loop(loop_clip, out_path, loop_seconds=loop_seconds, seconds=minutes * 60)
+    return repeat_loop(
+        loop_clip,
+        out_path,
+        loop_seconds=loop_seconds,
+        seconds=minutes * 60,
+        audio=loop_asset(audio),
+        audio_codec="aac",
+    )
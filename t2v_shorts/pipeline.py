@@ -1,11 +1,20 @@
 from __future__ import annotations
 
-import os
+import shutil
 import subprocess
 from pathlib import Path
 
+from .audiomix import AudioMix, mix_graph, mix_inputs, select_mix
 from .config import GenerateRequest
+from .devices import current_device
 from .backends.registry import get_backend
+from .filters import fit_filter, text_filter, write_caption_file
+from .interpolate import interpolate_filter
+from .planner import ResolutionPlan, estimated_savings, gen_frames, get_profile, plan_fps, plan_resolution
+from .quality import BadClipError, analyze_clip
+from .scene_cache import SceneCache, scene_key
+from .trace import span
+from .variants import plan_outputs, render_variants
 
 
 def ensure_parent(path: str) -> Path:
@@ -22,6 +31,13 @@ def ffmpeg_fit(
     height: int,
     mode: str = "pad",
     overlay_text: str | None = None,
+    fontsize: int = 64,
+    preset: str = "slow",
+    scale_flags: str | None = None,
+    sharpen: bool = False,
+    pre: str | None = None,
+    audio: AudioMix | None = None,
+    duration: float | None = None,
 ) -> None:
     """Fit video to exact WxH.
 
@@ -30,71 +46,39 @@ def ffmpeg_fit(
       - "crop": fill frame (zoom) then center-crop
 
     For SVD (which is 16:9 / landscape), "pad" avoids heavy zoom and quality loss.
-    """
-    if mode == "crop":
-        vf = f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height}"
-    elif mode == "blur":
-        # Full-frame vertical with blurred background + sharp foreground (no ugly zoom crop).
-        # 1) bg: scale to fill, blur
-        # 2) fg: scale to fit, overlay centered
-        vf = (
-            f"[0:v]scale={width}:{height}:force_original_aspect_ratio=increase,"
-            f"crop={width}:{height},gblur=sigma=30[bg];"
-            f"[0:v]scale={width}:{height}:force_original_aspect_ratio=decrease[fg];"
-            f"[bg][fg]overlay=(W-w)/2:(H-h)/2"
-        )
-    else:
-        vf = (
-            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
-            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2"
-        )
-    font_name = os.environ.get("T2V_SHORTS_FONT_NAME", "Arial")
-
-    def _text_filter(textfile: Path) -> str:
-        # Bottom-center captions (safe: use textfile to avoid quoting/escaping user text)
-        # Use font name (avoids Windows drive-letter escaping issues).
-        txt_p = textfile.as_posix()
-
-        return (
-            "drawtext="
-            f"font={font_name}:"
-            f"textfile={txt_p}:"
-            "reload=0:"
-            "fontsize=64:"
-            "fontcolor=white:"
-            "borderw=4:"
-            "bordercolor=black:"
-            "x=(w-text_w)/2:"
-            "y=h*0.78"
-        )
 
-    textfile = None
-    if overlay_text:
-        textfile = out_path.parent / (out_path.stem + "_caption.txt")
-        textfile.parent.mkdir(parents=True, exist_ok=True)
-        textfile.write_text(overlay_text, encoding="utf-8")
+    audio: optional bed/narration mixed in the same pass (needs `duration`).
+    """
+    vf = fit_filter(width, height, mode, scale_flags=scale_flags, sharpen=sharpen, pre=pre)
+    textfile = write_caption_file(out_path, overlay_text)
+    audio_in = mix_inputs(audio) if audio else []
+    audio_map = ["-map", "[aout]", "-c:a", "aac", "-b:a", "128k", "-t", f"{duration:.3f}"] if audio else []
 
     if mode == "blur":
         graph = vf
         if textfile:
-            graph = graph + "," + _text_filter(textfile)
+            graph = graph + "," + text_filter(textfile, fontsize=fontsize)
         graph = graph + "[v]"
+        if audio:
+            graph += ";" + mix_graph(audio, duration=duration)
 
         cmd = [
             "ffmpeg",
             "-y",
             "-i",
             str(in_path),
+            *audio_in,
             "-filter_complex",
             graph,
             "-map",
             "[v]",
+            *audio_map,
             "-c:v",
             "libx264",
             "-crf",
             "18",
             "-preset",
-            "slow",
+            preset,
             str(out_path),
         ]
         
@@ -108,21 +92,26 @@ def ffmpeg_fit(
     else:
         vf2 = vf
         if textfile:
-            vf2 = vf2 + "," + _text_filter(textfile)
+            vf2 = vf2 + "," + text_filter(textfile, fontsize=fontsize)
 
         cmd = [
             "ffmpeg",
             "-y",
             "-i",
             str(in_path),
+            *audio_in,
             "-vf",
             vf2,
+        ]
+        if audio:
+            cmd += ["-filter_complex", mix_graph(audio, duration=duration), "-map", "0:v", *audio_map]
+        cmd += [
             "-c:v",
             "libx264",
             "-crf",
             "18",
             "-preset",
-            "slow",
+            preset,
             str(out_path),
         ]
 
@@ -138,51 +127,159 @@ def ffmpeg_scale_to_4k(in_path: Path, out_path: Path) -> None:
     ffmpeg_fit(in_path, out_path, width=2160, height=3840)
 
 
+def plan_for(req: GenerateRequest) -> ResolutionPlan:
+    if req.native_resolution:
+        return plan_resolution(req.backend, req.width, req.height)
+    return ResolutionPlan(req.width, req.height, req.width, req.height)
+
+
 def run(req: GenerateRequest, *, dry_run: bool = False) -> Path:
     out_path = ensure_parent(req.out)
+    plan = plan_for(req)
+    fps_plan = plan_fps(req.backend, req.fps, req.seconds, interpolate=req.interpolate)
+    frames = req.seconds * fps_plan.gen_fps
 
     backend = get_backend(req.backend)
     if dry_run:
         print("DRY RUN")
         print("backend:", backend.name)
+        print("generate at:", f"{plan.gen_width}x{plan.gen_height}", "->", f"{plan.out_width}x{plan.out_height}")
+        print("generate fps:", fps_plan.gen_fps, "->", fps_plan.out_fps)
         print(req.model_dump())
         return out_path
 
-    tmp_dir = Path("temp")
-    tmp_dir.mkdir(exist_ok=True)
+    # scenes running on several GPUs at once each get their own (see devices.py)
+    device = current_device()
+    tmp_dir = Path("temp") / f"gpu{device}" if device else Path("temp")
+    tmp_dir.mkdir(parents=True, exist_ok=True)
     base_video = tmp_dir / "base.mp4"
 
-    # 1) generate base video
-    backend.generate(
-        prompt=req.text,
-        seconds=req.seconds,
-        fps=req.fps,
-        width=req.width,
-        height=req.height,
-        seed=req.seed,
-        out_path=base_video,
+    # 1) generate base video at the backend's native size, unless the same scene
+    #    (or the one named by `reuse`) was rendered before (see scene_cache.py).
+    #    Keyed like scene_cache.plan_key, so `dedup` keys and `reuse` match these clips.
+    seeded = req.seed is not None or req.seed_policy is not None
+    key = req.reuse or scene_key(
+        req.text,
+        backend=req.backend,
+        width=plan.gen_width,
+        height=plan.gen_height,
+        fps=fps_plan.gen_fps,
+        frames=gen_frames(req.backend, req.seconds, fps_plan.gen_fps),
+        seed=req.seed_policy or req.seed,
+        expand=req.expand_prompts,
     )
+    cached = None
+    if req.scene_cache and (seeded or req.reuse):
+        with SceneCache() as cache:
+            cached = cache.get(key)
+            if cached is not None:
+                print(f"reusing rendered scene {key} ({cached}, seed={cache.params(key).get('seed')})")
+    if cached is not None:
+        shutil.copy(cached, base_video)
+    else:
+        with span(
+            "generate",
+            backend=req.backend,
+            seconds_requested=req.seconds,
+            fps=req.fps,
+            gen_fps=fps_plan.gen_fps,
+            frames=frames,
+            gen_width=plan.gen_width,
+            gen_height=plan.gen_height,
+            out_width=plan.out_width,
+            out_height=plan.out_height,
+            seed=req.seed,
+            device=device,
+            est_saved_seconds=round(estimated_savings(req.backend, plan, frames), 1),
+            out=str(out_path),
+        ):
+            prompt = req.text
+            if req.expand_prompts:
+                from .prompt_expander import expand_prompt
 
-    # 2) fit to requested WxH (center-crop) for Shorts aspect ratio
-    fitted = tmp_dir / "fit.mp4"
-    ffmpeg_fit(
-        base_video,
-        fitted,
-        width=req.width,
-        height=req.height,
-        mode="blur",
-        overlay_text=req.overlay_text,
-    )
+                prompt = expand_prompt(req.text)
+            backend.generate(
+                prompt=prompt,
+                seconds=req.seconds,
+                fps=fps_plan.gen_fps,
+                width=plan.gen_width,
+                height=plan.gen_height,
+                seed=req.seed,
+                out_path=base_video,
+            )
+
+    if req.quality_gate and cached is None:
+        max_frames = get_profile(req.backend).max_frames
+        with span("quality", backend=req.backend, out=str(out_path)) as t:
+            report = analyze_clip(
+                base_video,
+                fps=fps_plan.gen_fps,
+                expected_frames=min(frames, max_frames) if max_frames else frames,
+            )
+            t.update(report.summary())
+        if not report.ok:
+            raise BadClipError(base_video, report)
+    if req.scene_cache and seeded and cached is None:
+        with SceneCache() as cache:
+            cache.put(key, req.text, base_video, backend=req.backend, seed=req.seed)
+
+    audio = select_mix(req.audio_bed, channel=req.channel, category=req.audio_category, narration=req.narration)
+
+    # Upscaling happens in the finishing graph: lanczos for the sharp foreground.
+    scale_flags = "lanczos" if plan.upscales else None
+    sharpen = req.sharpen and plan.upscales
+    # ...and interpolation runs first, while frames are still at generation size.
+    pre = interpolate_filter(fps_plan.out_fps, req.interpolator) if fps_plan.interpolates else None
 
-    # 3) optional 4K upscale (still cropped vertical)
-    final_video = fitted
-    if req.upscale_4k:
-        up = tmp_dir / "up4k.mp4"
-        ffmpeg_scale_to_4k(fitted, up)
-        final_video = up
+    if req.variants:
+        # 2-4) decode once, composite each output size, encode master + variants from a single ffmpeg process
+        names = list(req.variants)
+        if req.upscale_4k and "4k" not in names:
+            names.append("4k")
+        outputs = plan_outputs(out_path, names, master_width=req.width, master_height=req.height)
+        with span(
+            "finish", out=str(out_path), variants=names, out_width=req.width, out_height=req.height, duration=req.seconds
+        ):
+            render_variants(
+                base_video,
+                outputs,
+                master_width=req.width,
+                master_height=req.height,
+                mode="blur",
+                overlay_text=req.overlay_text,
+                fontsize=req.caption_size,
+                scale_flags=scale_flags,
+                sharpen=sharpen,
+                pre=pre,
+                audio=audio,
+                duration=req.seconds,
+                preset=req.preset,
+            )
+        return out_path
+
+    # 2) fit to requested WxH for Shorts aspect ratio; with upscale_4k go straight
+    #    from the generated clip to 4K vertical (2160x3840) instead of re-scaling an encode
+    width, height = (2160, 3840) if req.upscale_4k else (req.width, req.height)
+    fitted = tmp_dir / "fit.mp4"
+    with span("finish", out=str(out_path), out_width=width, out_height=height, duration=req.seconds):
+        ffmpeg_fit(
+            base_video,
+            fitted,
+            width=width,
+            height=height,
+            mode="blur",
+            overlay_text=req.overlay_text,
+            fontsize=round(req.caption_size * width / req.width),
+            preset=req.preset,
+            scale_flags="lanczos" if req.upscale_4k else scale_flags,
+            sharpen=sharpen,
+            pre=pre,
+            audio=audio,
+            duration=req.seconds,
+        )
 
-    # 4) copy to output
-    out_path.write_bytes(final_video.read_bytes())
+    # 3) copy to output
+    out_path.write_bytes(fitted.read_bytes())
 
-    # cleanup left intentionally for inspection
+    # intermediates stay for inspection; `t2v-shorts gc` expires them (see workspace_gc.py)
     return out_path
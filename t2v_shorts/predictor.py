@@ -0,0 +1,202 @@
+"""
+Runtime predictor — learns stage costs from the trace (see `trace.py`).
+
+Generation is modelled per (backend, model_type) as
+
+    seconds = a + b * megapixel_frames * (steps / default steps)
+
+and finishing (ffmpeg) as `seconds = a + b * output megapixel-seconds`, both
+fitted by least squares over the recorded spans. Estimates come with a
+prediction interval from the residual spread and the fit's own uncertainty;
+groups with too little history fall back to the hand-measured planner
+profiles with a wide interval.
+"""
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from .compiler import StoryboardPlan, compile_storyboard
+from .planner import get_profile
+from .trace import read_trace
+
+MIN_SAMPLES = 4  # per group, below this the planner profile is used
+DEFAULT_STEPS = 20
+PRIOR_SPREAD = 0.5  # +-50% around the planner profile when there is no history
+FFMPEG_SEC_PER_MPIX_SECOND = 1.0  # prior for finishing (x264 medium, blur layout)
+Z = 1.96  # ~95% interval (normal approximation)
+
+SHORTS_WIDTH = 1080
+SHORTS_HEIGHT = 1920
+
+
+@dataclass(frozen=True)
+class Estimate:
+    seconds: float
+    low: float
+    high: float
+
+    def __add__(self, other: "Estimate") -> "Estimate":
+        return Estimate(self.seconds + other.seconds, self.low + other.low, self.high + other.high)
+
+    def __str__(self) -> str:
+        return f"{self.seconds / 60:.1f} min ({self.low / 60:.1f}-{self.high / 60:.1f})"
+
+
+ZERO = Estimate(0.0, 0.0, 0.0)
+
+
+@dataclass
+class LinearFit:
+    """seconds = coef . [1, x], with what's needed for prediction intervals."""
+
+    coef: np.ndarray
+    sigma: float  # residual standard deviation
+    xtx_inv: np.ndarray
+    n: int
+
+    @classmethod
+    def fit(cls, x: np.ndarray, y: np.ndarray) -> "LinearFit":
+        X = np.column_stack([np.ones_like(x), x])
+        coef, *_ = np.linalg.lstsq(X, y, rcond=None)
+        resid = y - X @ coef
+        dof = max(len(y) - 2, 1)
+        sigma = float(np.sqrt(resid @ resid / dof))
+        return cls(coef, sigma, np.linalg.pinv(X.T @ X), len(y))
+
+    def predict(self, xs: list[float]) -> Estimate:
+        """Sum over several items: residual noise adds per item, coefficient error adds up front."""
+        if not xs:
+            return ZERO
+        s = np.array([len(xs), sum(xs)], dtype=np.float64)
+        mean = float(s @ self.coef)
+        var = self.sigma**2 * (len(xs) + float(s @ self.xtx_inv @ s))
+        half = Z * math.sqrt(max(var, 0.0))
+        return Estimate(max(mean, 0.0), max(mean - half, 0.0), mean + half)
+
+
+def _prior(seconds: float) -> Estimate:
+    return Estimate(seconds, seconds * (1 - PRIOR_SPREAD), seconds * (1 + PRIOR_SPREAD))
+
+
+def generation_work(width: int, height: int, frames: int, steps: int | None) -> float:
+    """Megapixel-frames scaled by sampling steps relative to the default."""
+    return width * height / 1e6 * frames * (steps or DEFAULT_STEPS) / DEFAULT_STEPS
+
+
+def finishing_work(width: int, height: int, seconds: float) -> float:
+    return width * height / 1e6 * seconds
+
+
+@dataclass
+class VideoEstimate:
+    title: str
+    scenes: int
+    generate: Estimate
+    finish: Estimate
+
+    @property
+    def total(self) -> Estimate:
+        return self.generate + self.finish
+
+
+@dataclass
+class StoryboardEstimate:
+    videos: list[VideoEstimate] = field(default_factory=list)
+
+    @property
+    def total(self) -> Estimate:
+        return sum((v.total for v in self.videos), ZERO)
+
+    def fit_window(self, seconds: float, *, pessimistic: bool = True) -> int:
+        """How many videos (in order) finish within `seconds`, by the high (or mean) estimate."""
+        used, n = 0.0, 0
+        for v in self.videos:
+            used += v.total.high if pessimistic else v.total.seconds
+            if used > seconds:
+                break
+            n += 1
+        return n
+
+
+class RuntimePredictor:
+    def __init__(self, generate: dict[tuple[str, str | None], LinearFit], finish: LinearFit | None):
+        self.generate_fits = generate
+        self.finish_fit = finish
+
+    @classmethod
+    def from_trace(cls, events: list[dict] | None = None, *, path: Path | None = None) -> "RuntimePredictor":
+        events = read_trace(path) if events is None else events
+        groups: dict[tuple[str, str | None], list[tuple[float, float]]] = {}
+        finish: list[tuple[float, float]] = []
+        for e in events:
+            if not e.get("ok") or "seconds" not in e:
+                continue
+            if e.get("stage") == "generate" and e.get("gen_width") and e.get("frames") and e.get("produced", True):
+                work = generation_work(e["gen_width"], e["gen_height"], e["frames"], e.get("steps"))
+                groups.setdefault((e.get("backend"), e.get("model_type")), []).append((work, e["seconds"]))
+            elif e.get("stage") == "finish" and e.get("out_width") and e.get("duration") and e.get("produced", True):
+                finish.append((finishing_work(e["out_width"], e["out_height"], e["duration"]), e["seconds"]))
+
+        def fit(samples: list[tuple[float, float]]) -> LinearFit | None:
+            if len(samples) < MIN_SAMPLES:
+                return None
+            x, y = np.array(samples, dtype=np.float64).T
+            return LinearFit.fit(x, y)
+
+        fits = {k: f for k, f in ((k, fit(v)) for k, v in groups.items()) if f is not None}
+        return cls(fits, fit(finish))
+
+    def estimate_generation(
+        self,
+        backend: str,
+        works: list[float],
+        *,
+        model_type: str | None = None,
+    ) -> Estimate:
+        """GPU seconds for scenes of the given `generation_work`."""
+        f = self.generate_fits.get((backend, model_type)) or self.generate_fits.get((backend, None))
+        if f is not None:
+            return f.predict(works)
+        # megapixel-frames at default steps x hand-measured seconds per megapixel-frame
+        return _prior(get_profile(backend).sec_per_mpix_frame * sum(works))
+
+    def estimate_finishing(self, works: list[float]) -> Estimate:
+        if self.finish_fit is not None:
+            return self.finish_fit.predict(works)
+        return _prior(FFMPEG_SEC_PER_MPIX_SECOND * sum(works))
+
+    def estimate(self, storyboard: dict, *, backend: str | None = None) -> StoryboardEstimate:
+        """Per-video generate + finish estimates for a storyboard (single or series).
+
+        `backend` overrides `default.backend` (the WanGP scripts ignore that key).
+        Raises `StoryboardError` for an invalid storyboard.
+        """
+        return self.estimate_plan(compile_storyboard(storyboard, backend=backend))
+
+    def estimate_plan(self, plan: StoryboardPlan) -> StoryboardEstimate:
+        out = StoryboardEstimate()
+        for video in plan.videos:
+            wangp = video.backend == "wangp"
+            model_type = os.environ.get("WANGP_MODEL_TYPE", "t2v") if wangp else None
+            steps = int(os.environ.get("WANGP_STEPS", DEFAULT_STEPS)) if wangp else None
+            res = video.resolution
+            gen = [generation_work(res.gen_width, res.gen_height, s.frames, steps) for s in video.scenes]
+            out.videos.append(
+                VideoEstimate(
+                    title=video.title,
+                    scenes=len(video.scenes),
+                    generate=self.estimate_generation(video.backend, gen, model_type=model_type),
+                    finish=self.estimate_finishing([finishing_work(SHORTS_WIDTH, SHORTS_HEIGHT, video.duration)]),
+                )
+            )
+        return out
+
+
+def estimate(storyboard: dict, *, backend: str | None = None, trace: Path | None = None) -> StoryboardEstimate:
+    """`RuntimePredictor.from_trace(...).estimate(storyboard)`."""
+    return RuntimePredictor.from_trace(path=trace).estimate(storyboard, backend=backend)
@@ -0,0 +1,46 @@
+"""
+CPU work queued ahead of need, run while the GPU is busy.
+
+Scene generation blocks the orchestrator on the generator process for minutes
+at a time. `Prefetcher` runs the CPU side of upcoming work (prompt expansion,
+audio bed preparation, finishing a scene clip that has already landed) on
+background threads meanwhile; the orchestrator later `get`s the result by key
+and only waits if the work isn't done yet.
+"""
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable
+
+
+class Prefetcher:
+    def __init__(self, workers: int = 1):
+        # One worker by default: the generator process needs some CPU too.
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._futures: dict[Hashable, Future] = {}
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Start `fn` in the background unless `key` is already queued."""
+        if key not in self._futures:
+            self._futures[key] = self._pool.submit(fn, *args, **kwargs)
+        return self._futures[key]
+
+    def get(self, key: Hashable, fn: Callable[..., Any] | None = None, *args, **kwargs) -> Any:
+        """Result for `key` (waiting if needed); runs `fn` inline if it was never submitted."""
+        f = self._futures.pop(key, None)
+        if f is not None:
+            return f.result()
+        if fn is None:
+            raise KeyError(key)
+        return fn(*args, **kwargs)
+
+    def close(self, *, wait: bool = True) -> None:
+        for f in self._futures.values():
+            f.cancel()
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self) -> "Prefetcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
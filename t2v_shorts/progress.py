@@ -0,0 +1,304 @@
+"""
+Generator progress — step progress, ETA and stall detection from console output.
+
+WanGP reports its sampling loop with tqdm (`9/20 [00:31<00:38,  3.49s/it]`,
+redrawn with carriage returns) and some builds print `Step 9/20`.
+`run_monitored` reads the subprocess output as it comes, feeds every line to a
+`ProgressMonitor` and publishes a `ProgressEvent` whenever the step changes.
+Subscribers include the `GpuScheduler` (the running job's progress) and the
+loggers of the WanGP scripts.
+
+A run counts as stalled when no step has completed for `STALL_FACTOR` times
+the step time (measured, or the expected one given up front), but at least
+`MIN_STALL_SECONDS`. Between progress bars (model loading before the first
+step, VAE decoding and saving after the last) there is nothing to measure, so
+`QUIET_SECONDS` applies instead. A stalled process is killed so the caller can
+retry without waiting for a fixed timeout.
+"""
+from __future__ import annotations
+
+import codecs
+import queue
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Callable
+
+from .trace import record
+
+STALL_FACTOR = 5.0
+MIN_STALL_SECONDS = 60.0
+QUIET_SECONDS = 900.0  # model load (14B int8 from disk), VAE decode, saving
+POLL_SECONDS = 1.0
+TAIL_LINES = 30
+
+# tqdm: " 45%|####5     | 9/20 [00:31<00:38,  3.49s/it]"; the rate is "?it/s" before the first step
+_TQDM = re.compile(r"(\d+)/(\d+) \[[\d:]+<[\d:?]+(?:,\s*(?:([\d.]+)(s/it|it/s)|\?it/s))?")
+_STEP = re.compile(r"\b[Ss]tep\s+(\d+)\s*/\s*(\d+)")
+_LINE_END = re.compile(r"[\r\n]+")
+
+
+def parse_progress(line: str) -> tuple[int, int, float | None] | None:
+    """(step, total, seconds per step or None) from one console line."""
+    m = _TQDM.search(line)
+    if m:
+        rate = None
+        if m.group(3):
+            value = float(m.group(3))
+            rate = value if m.group(4) == "s/it" else (1 / value if value else None)
+        return int(m.group(1)), int(m.group(2)), rate
+    m = _STEP.search(line)
+    if m:
+        return int(m.group(1)), int(m.group(2)), None
+    return None
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    label: str
+    step: int
+    total: int
+    sec_per_step: float | None
+    elapsed: float  # since the process started
+    eta: float | None  # seconds left in the current progress bar
+    stalled: bool = False
+
+    def __str__(self) -> str:
+        parts = [f"{self.label}: step {self.step}/{self.total}" if self.label else f"step {self.step}/{self.total}"]
+        if self.sec_per_step:
+            parts.append(f"{self.sec_per_step:.1f}s/step")
+        if self.eta is not None:
+            parts.append(f"ETA {self.eta:.0f}s")
+        if self.stalled:
+            parts.append("STALLED")
+        return ", ".join(parts)
+
+
+_listeners: list[Callable[[ProgressEvent], None]] = []
+_listeners_lock = threading.Lock()
+
+
+def subscribe(fn: Callable[[ProgressEvent], None]) -> Callable[[], None]:
+    """Call `fn` with every published event; returns the unsubscribe function."""
+    with _listeners_lock:
+        _listeners.append(fn)
+
+    def unsubscribe() -> None:
+        with _listeners_lock:
+            if fn in _listeners:
+                _listeners.remove(fn)
+
+    return unsubscribe
+
+
+def publish(event: ProgressEvent) -> None:
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for fn in listeners:
+        try:
+            fn(event)
+        except Exception as e:  # a listener must never break a render
+            print(f"[progress] listener failed: {e}")
+
+
+def printer(
+    prefix: str = "",
+    *,
+    every: float = 10.0,
+    write: Callable[[str], None] | None = None,
+    clock: Callable[[], float] = time.monotonic,
+) -> Callable[[ProgressEvent], None]:
+    """A listener printing (or `write`-ing) at most one line per `every` seconds, plus finished bars and stalls."""
+    last = [float("-inf")]
+
+    def show(event: ProgressEvent) -> None:
+        now = clock()
+        if event.stalled or event.step >= event.total or now - last[0] >= every:
+            last[0] = now
+            if write is not None:
+                write(f"{prefix}{event}")
+            else:
+                print(f"{prefix}{event}", flush=True)
+
+    return show
+
+
+class ProgressMonitor:
+    def __init__(
+        self,
+        label: str = "",
+        *,
+        expected_step: float | None = None,
+        stall_factor: float = STALL_FACTOR,
+        min_stall: float = MIN_STALL_SECONDS,
+        quiet: float = QUIET_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.label = label
+        self.expected_step = expected_step
+        self.stall_factor = stall_factor
+        self.min_stall = min_stall
+        self.quiet = quiet
+        self.clock = clock
+        self.started = self.last_progress = clock()
+        self.step = 0
+        self.total = 0
+        self.sec_per_step: float | None = None
+
+    def feed(self, line: str) -> ProgressEvent | None:
+        """Event if `line` moved the progress (a new step or a new bar), else None."""
+        parsed = parse_progress(line)
+        if parsed is None:
+            return None
+        step, total, rate = parsed
+        now = self.clock()
+        if (step, total) == (self.step, self.total):
+            if rate:
+                self.sec_per_step = rate
+            return None
+        if total == self.total and step > self.step and not rate:
+            # "Step x/y" lines carry no rate: time it ourselves
+            self.sec_per_step = (now - self.last_progress) / (step - self.step)
+        elif rate:
+            self.sec_per_step = rate
+        elif total != self.total:
+            self.sec_per_step = None  # a new bar (e.g. a second pass) runs at its own pace
+        self.step, self.total = step, total
+        self.last_progress = now
+        return self.event(now)
+
+    @property
+    def running(self) -> bool:
+        """Inside a progress bar (otherwise loading, decoding or saving)."""
+        return 0 < self.total and self.step < self.total
+
+    def stall_after(self) -> float:
+        step = self.sec_per_step or self.expected_step
+        if not self.running or step is None:
+            return self.quiet
+        return max(self.min_stall, self.stall_factor * step)
+
+    def stalled(self, now: float | None = None) -> bool:
+        now = self.clock() if now is None else now
+        return now - self.last_progress > self.stall_after()
+
+    def event(self, now: float | None = None) -> ProgressEvent:
+        now = self.clock() if now is None else now
+        step = self.sec_per_step or self.expected_step
+        eta = (self.total - self.step) * step if step is not None and self.total else None
+        return ProgressEvent(self.label, self.step, self.total, self.sec_per_step, now - self.started, eta)
+
+
+@dataclass
+class MonitoredRun:
+    returncode: int | None  # None: killed (stall or timeout) or stopped once `done`
+    stalled: bool = False
+    timed_out: bool = False
+    last: ProgressEvent | None = None
+    tail: list[str] | None = None  # last non-progress output lines
+
+    @property
+    def ok(self) -> bool:
+        return not self.stalled and not self.timed_out and self.returncode in (0, None)
+
+
+def _emit(event: ProgressEvent, on_progress: Callable[[ProgressEvent], None] | None) -> None:
+    publish(event)
+    if on_progress is not None:
+        on_progress(event)
+
+
+def _read_lines(stream, out: queue.Queue) -> None:
+    # tqdm redraws with "\r", so split on both; decode incrementally (multibyte chars may straddle reads)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buf = ""
+    while True:
+        chunk = stream.read1(4096) if hasattr(stream, "read1") else stream.read(4096)
+        if not chunk:
+            break
+        buf += decoder.decode(chunk)
+        *lines, buf = _LINE_END.split(buf)
+        for line in lines:
+            out.put(line)
+        if buf and parse_progress(buf):
+            # tqdm ends a redraw with the *next* "\r": don't sit on the latest step until then
+            out.put(buf)
+    buf += decoder.decode(b"", final=True)
+    if buf:
+        out.put(buf)
+    out.put(None)
+
+
+def run_monitored(
+    cmd: list[str],
+    *,
+    cwd: Path | str | None = None,
+    monitor: ProgressMonitor | None = None,
+    on_line: Callable[[str], None] | None = None,
+    on_progress: Callable[[ProgressEvent], None] | None = None,
+    done: Callable[[], bool] | None = None,
+    timeout: float | None = None,
+) -> MonitoredRun:
+    """Run `cmd`, publishing progress; kill it on a stall or after `timeout` seconds.
+
+    Events go to the subscribers and to `on_progress` (this run only, e.g. a
+    `printer`); `on_line` gets every output line that isn't progress. `done` is
+    polled and ends the run (terminating the process) once it returns True, for
+    tools that keep running after writing their result.
+    """
+    monitor = monitor or ProgressMonitor()
+    tail: deque[str] = deque(maxlen=TAIL_LINES)
+    proc = subprocess.Popen(cmd, cwd=str(cwd) if cwd else None, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    lines: queue.Queue = queue.Queue()
+    reader = threading.Thread(target=_read_lines, args=(proc.stdout, lines), daemon=True)
+    reader.start()
+    result = MonitoredRun(returncode=None)
+    eof = False
+    try:
+        while True:
+            try:
+                line = lines.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                line = ""
+            if line is None:
+                eof = True
+            elif line:
+                event = monitor.feed(line)
+                if event is not None:
+                    result.last = event
+                    _emit(event, on_progress)
+                elif line.strip() and parse_progress(line) is None:
+                    tail.append(line)
+                    if on_line:
+                        on_line(line)
+            if done is not None and done():
+                break
+            if eof and proc.poll() is not None:
+                result.returncode = proc.returncode
+                break
+            if monitor.stalled():
+                result.stalled = True
+                result.last = replace(monitor.event(), stalled=True)
+                _emit(result.last, on_progress)
+                record("stall", label=monitor.label, step=monitor.step, total=monitor.total, waited=round(monitor.stall_after()))
+                break
+            if timeout is not None and monitor.clock() - monitor.started > timeout:
+                result.timed_out = True
+                break
+    finally:
+        if proc.poll() is None:
+            if result.stalled or result.timed_out:
+                proc.kill()
+            else:
+                proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        reader.join(timeout=5)
+    result.tail = list(tail)
+    return result
@@ -0,0 +1,116 @@
+"""
+Clip quality gate — catch black, frozen, flashing or broken clips before finishing.
+
+Frames are decoded by ffmpeg straight to tiny 64x64 grayscale, so the whole
+analysis is a few NumPy reductions over a (frames, 64, 64) uint8 array and
+takes well under a second even for WanGP's 121-frame clips.
+"""
+from __future__ import annotations
+
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+SIZE = 64
+
+# Thresholds on the 0-255 luma scale.
+BLACK_LUMA = 16.0  # mean luma below this = black frame
+FREEZE_DIFF = 0.4  # mean abs frame-to-frame difference below this = no motion
+FLASH_JUMP = 40.0  # luma jump that reverts within a frame or two = flash
+
+
+class BadClipError(RuntimeError):
+    def __init__(self, path: Path, report: "ClipReport"):
+        super().__init__(f"Bad clip {path}: {', '.join(report.issues)}")
+        self.path = path
+        self.report = report
+
+    def __reduce__(self):
+        # raised in device pool workers (devices.py) and sent back to the parent
+        return type(self), (self.path, self.report)
+
+
+@dataclass
+class ClipReport:
+    frames: int
+    luma: np.ndarray = field(repr=False)  # (frames,)
+    diff: np.ndarray = field(repr=False)  # (frames - 1,)
+    issues: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.issues
+
+    def summary(self) -> dict:
+        return {
+            "frames": self.frames,
+            "luma_mean": round(float(self.luma.mean()), 1) if self.frames else 0.0,
+            "diff_mean": round(float(self.diff.mean()), 2) if self.diff.size else 0.0,
+            "issues": self.issues,
+        }
+
+
+def decode_gray(path: Path, size: int = SIZE, *, seconds: float | None = None, fps: int | None = None) -> np.ndarray:
+    """Decode every frame (of the first `seconds`; resampled to `fps`) as size x size luma -> (frames, size, size) uint8."""
+    cmd = [
+        "ffmpeg",
+        "-v",
+        "error",
+        *(["-t", f"{seconds:.3f}"] if seconds else []),
+        "-i",
+        str(path),
+        "-vf",
+        (f"fps={fps}," if fps else "") + f"scale={size}:{size}:flags=area,format=gray",
+        "-f",
+        "rawvideo",
+        "pipe:1",
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    buf = np.frombuffer(result.stdout, dtype=np.uint8)
+    n = buf.size // (size * size)
+    return buf[: n * size * size].reshape(n, size, size)
+
+
+def _longest_run(mask: np.ndarray) -> int:
+    """Length of the longest run of True in a 1-D bool array."""
+    if not mask.any():
+        return 0
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return int((edges[1::2] - edges[::2]).max())
+
+
+def analyze_frames(frames: np.ndarray, *, fps: int, expected_frames: int | None = None) -> ClipReport:
+    n = len(frames)
+    if n < 2:
+        return ClipReport(n, np.zeros(n), np.zeros(0), ["corrupt: no decodable frames"])
+
+    f = frames.astype(np.float32)
+    luma = f.mean(axis=(1, 2))
+    diff = np.abs(f[1:] - f[:-1]).mean(axis=(1, 2))
+    report = ClipReport(n, luma, diff)
+
+    if expected_frames and n < expected_frames * 0.5:
+        report.issues.append(f"corrupt: {n}/{expected_frames} frames decoded")
+
+    black = luma < BLACK_LUMA
+    if black.mean() > 0.5 or _longest_run(black) >= max(2, fps // 2):
+        report.issues.append(f"black: {int(black.sum())}/{n} frames")
+
+    frozen = diff < FREEZE_DIFF
+    if frozen.all() or _longest_run(frozen) >= max(2, fps):
+        report.issues.append(f"frozen: {_longest_run(frozen) + 1} identical frames")
+
+    # Flash = big luma jump that snaps back (a scene cut jumps but doesn't revert).
+    d = np.diff(luma)
+    spikes = (np.abs(d[:-1]) > FLASH_JUMP) & (np.abs(d[1:]) > FLASH_JUMP) & (np.sign(d[:-1]) != np.sign(d[1:]))
+    if spikes.any():
+        report.issues.append(f"flash: {int(spikes.sum())} frame(s)")
+
+    return report
+
+
+def analyze_clip(path: Path, *, fps: int, expected_frames: int | None = None) -> ClipReport:
+    return analyze_frames(decode_gray(path), fps=fps, expected_frames=expected_frames)
@@ -0,0 +1,287 @@
+"""
+Scene reuse — render a scene once, use the clip wherever the scene comes back.
+
+The daily series repeat scenes across days and videos. A generated clip is
+stored under `out/cache/scenes/` keyed by its normalized prompt, seed policy
+and render parameters (backend, generation size, fps, frames, model knobs);
+the next scene with the same key copies the clip instead of spending GPU time
+on it. Captions, audio and layout are applied in finishing, so they may differ
+between the videos sharing a clip.
+
+Near-duplicates are only reported: a word-shingle index over the cached
+prompts finds scenes worded slightly differently, and a storyboard opts in by
+setting `"reuse": "<key>"` on the scene (`t2v-shorts dedup` prints the keys).
+The cache lives in `out/cache`, so `workspace_gc` evicts clips least recently
+used first when the workspace is over its quota.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import sqlite3
+import time
+import unicodedata
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .compiler import ScenePlan, StoryboardPlan, VideoPlan
+from .journal import fingerprint
+
+SCENE_DB = Path("out") / "scenes.sqlite"
+CLIP_DIR = Path("out") / "cache" / "scenes"
+SHINGLE_WORDS = 2
+NEAR_THRESHOLD = 0.4  # Jaccard similarity of prompt shingles (tuned on storyboards/)
+COMMON_SHINGLES = 0.05  # shingles in more prompts than this are boilerplate
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenes (
+    key TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    path TEXT NOT NULL,
+    params TEXT,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    uses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def normalize_prompt(text: str) -> str:
+    """Case, punctuation and spacing don't change what gets rendered."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def shingles(text: str, n: int = SHINGLE_WORDS) -> frozenset[int]:
+    words = normalize_prompt(text).split()
+    if len(words) <= n:
+        return frozenset([zlib.crc32(" ".join(words).encode())]) if words else frozenset()
+    return frozenset(zlib.crc32(" ".join(words[i : i + n]).encode()) for i in range(len(words) - n + 1))
+
+
+def backend_params(backend: str) -> dict:
+    """Model knobs that change the clip but aren't in the storyboard (WanGP reads them from the env)."""
+    if backend == "wangp":
+        return {"model_type": os.environ.get("WANGP_MODEL_TYPE", "t2v"), "steps": int(os.environ.get("WANGP_STEPS", "20"))}
+    return {}
+
+
+def scene_key(
+    prompt: str,
+    *,
+    backend: str,
+    width: int,
+    height: int,
+    fps: int,
+    frames: int,
+    seed: int | str | None = None,
+    **params,
+) -> str:
+    """Identity of a rendered clip; `seed` is a fixed seed or a policy name (None: random)."""
+    return fingerprint(
+        normalize_prompt(prompt),
+        backend,
+        width,
+        height,
+        fps,
+        frames,
+        "random" if seed is None else seed,
+        sorted({**backend_params(backend), **params}.items()),
+    )
+
+
+def plan_key(video: VideoPlan, scene: ScenePlan, *, seed: int | str = "derived", **params) -> str:
+    """Key of a planned scene; storyboards render with derived seeds (seeds.DERIVED)."""
+    res = video.resolution
+    return scene_key(
+        scene.prompt,
+        backend=video.backend,
+        width=res.gen_width,
+        height=res.gen_height,
+        fps=scene.gen_fps,
+        frames=scene.frames,
+        seed=seed,
+        expand=video.expand_prompts,
+        **params,
+    )
+
+
+class ShingleIndex:
+    """In-memory inverted index of prompt shingles for Jaccard near-duplicate lookups.
+
+    Shingles found in more than `common` of the indexed prompts (style boilerplate
+    such as "cinematic 4k, shallow depth of field") are ignored on both sides.
+    """
+
+    def __init__(self, *, common: float = COMMON_SHINGLES):
+        self.common = common
+        self._postings: dict[int, set[str]] = {}
+        self._shingles: dict[str, frozenset[int]] = {}
+        self._rare: dict[str, frozenset[int]] = {}  # without boilerplate; reset when the index grows
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def add(self, key: str, text: str) -> None:
+        if key in self._shingles:
+            return
+        sh = shingles(text)
+        self._shingles[key] = sh
+        self._rare.clear()
+        for s in sh:
+            self._postings.setdefault(s, set()).add(key)
+
+    def similar(self, text: str, *, threshold: float = NEAR_THRESHOLD, limit: int = 5) -> list[tuple[str, float]]:
+        """(key, similarity) of indexed prompts at or above `threshold`, best first."""
+        max_df = max(2, int(self.common * len(self._shingles)))
+        rare = {s for s in shingles(text) if len(self._postings.get(s, ())) <= max_df}
+        candidates = {k for s in rare for k in self._postings.get(s, ())}
+        scored = []
+        for k in candidates:
+            if k not in self._rare:
+                self._rare[k] = frozenset(s for s in self._shingles[k] if len(self._postings[s]) <= max_df)
+            other = self._rare[k]
+            scored.append((k, len(rare & other) / len(rare | other)))
+        return sorted((x for x in scored if x[1] >= threshold), key=lambda x: -x[1])[:limit]
+
+
+class SceneCache:
+    def __init__(self, db_path: Path = SCENE_DB, *, clip_dir: Path = CLIP_DIR):
+        self.db_path = Path(db_path)
+        self.clip_dir = Path(clip_dir)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self._index: ShingleIndex | None = None
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "SceneCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def has(self, key: str) -> bool:
+        row = self.conn.execute("SELECT path FROM scenes WHERE key = ?", (key,)).fetchone()
+        return row is not None and Path(row["path"]).exists()
+
+    def get(self, key: str) -> Path | None:
+        """The cached clip for `key`, if it is still on disk (the GC may have evicted it)."""
+        row = self.conn.execute("SELECT path FROM scenes WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        path = Path(row["path"])
+        if not path.exists():
+            self.conn.execute("DELETE FROM scenes WHERE key = ?", (key,))
+            self.conn.commit()
+            self._index = None
+            return None
+        self.conn.execute("UPDATE scenes SET used_at = ?, uses = uses + 1 WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+        return path
+
+    def params(self, key: str) -> dict:
+        """What `put` recorded with the clip (backend, seed, ...)."""
+        row = self.conn.execute("SELECT params FROM scenes WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["params"]) if row and row["params"] else {}
+
+    def put(self, key: str, prompt: str, clip: Path, **params) -> Path:
+        """Keep a copy of a freshly generated `clip` (the original stays with its job)."""
+        self.clip_dir.mkdir(parents=True, exist_ok=True)
+        path = self.clip_dir / f"{key}{Path(clip).suffix}"
+        shutil.copy(clip, path)
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO scenes (key, prompt, path, params, created_at, used_at, uses) VALUES (?,?,?,?,?,?,0)",
+            (key, prompt, str(path), json.dumps(params, sort_keys=True) if params else None, now, now),
+        )
+        self.conn.commit()
+        if self._index is not None:
+            self._index.add(key, prompt)
+        return path
+
+    def used_at(self) -> dict[str, float]:
+        """When each cached clip was last used, by file name (for the workspace GC)."""
+        return {Path(r["path"]).name: r["used_at"] for r in self.conn.execute("SELECT path, used_at FROM scenes")}
+
+    def prompts(self) -> dict[str, str]:
+        return {r["key"]: r["prompt"] for r in self.conn.execute("SELECT key, prompt FROM scenes")}
+
+    def similar(self, prompt: str, *, threshold: float = NEAR_THRESHOLD, limit: int = 5) -> list[tuple[str, str, float]]:
+        """(key, prompt, similarity) of cached scenes worded like `prompt`."""
+        if self._index is None:
+            self._index = ShingleIndex()
+            for key, text in self.prompts().items():
+                self._index.add(key, text)
+        prompts = self.prompts()
+        return [(k, prompts[k], s) for k, s in self._index.similar(prompt, threshold=threshold, limit=limit) if k in prompts]
+
+
+SceneRef = tuple[str, str, int]  # (storyboard, video slug, scene index)
+
+
+@dataclass
+class DedupReport:
+    groups: dict[str, list[SceneRef]] = field(default_factory=dict)  # key -> every scene rendering it
+    prompts: dict[str, str] = field(default_factory=dict)  # key -> prompt
+    cached: set[str] = field(default_factory=set)  # keys with a clip in the cache already
+    near: list[tuple[SceneRef, str, float]] = field(default_factory=list)  # scene, similar key, similarity
+
+    @property
+    def scenes(self) -> int:
+        return sum(len(v) for v in self.groups.values())
+
+    @property
+    def renders(self) -> int:
+        """GPU renders needed: one per key without a cached clip."""
+        return sum(1 for k in self.groups if k not in self.cached)
+
+    def key_of(self, ref: SceneRef) -> str:
+        return next(k for k, refs in self.groups.items() if ref in refs)
+
+    @property
+    def duplicates(self) -> dict[str, list[SceneRef]]:
+        return {k: v for k, v in self.groups.items() if len(v) > 1}
+
+
+def dedup(
+    plans: list[StoryboardPlan],
+    *,
+    cache: SceneCache | None = None,
+    threshold: float = NEAR_THRESHOLD,
+) -> DedupReport:
+    """Exact duplicates across `plans` (and the cache), plus near-duplicates of every unique scene.
+
+    Near-duplicates are looked up among the cached clips and the other scenes of `plans`.
+    """
+    report = DedupReport()
+    for plan in plans:
+        for video in plan.videos:
+            for scene in video.scenes:
+                key = scene.reuse or plan_key(video, scene)
+                report.groups.setdefault(key, []).append((plan.source, video.slug, scene.index))
+                report.prompts.setdefault(key, scene.prompt)
+
+    index = ShingleIndex()
+    cached_prompts = cache.prompts() if cache is not None else {}
+    report.cached = {k for k in report.groups if cache is not None and cache.has(k)}
+    for key, text in {**cached_prompts, **report.prompts}.items():
+        index.add(key, text)
+
+    seen: set[frozenset[str]] = set()
+    for key, refs in report.groups.items():
+        if key in report.cached:
+            continue
+        match = next((m for m in index.similar(report.prompts[key], threshold=threshold) if m[0] != key), None)
+        if match is None or frozenset((key, match[0])) in seen:
+            continue
+        seen.add(frozenset((key, match[0])))
+        report.prompts.setdefault(match[0], cached_prompts.get(match[0], ""))
+        report.near.append((refs[0], match[0], match[1]))
+    return report
@@ -0,0 +1,250 @@
+"""
+GPU scheduler shared by all channels.
+
+One thread owns the GPU and runs scenes, one at a time, from jobs submitted
+by any channel (aitools, dogs, finance, sleepsounds). After every scene it
+picks again, so a job can be preempted between scenes:
+
+1. a job whose deadline is at risk (remaining work >= time left, with a margin)
+   runs first, earliest deadline first;
+2. otherwise channels share the GPU in proportion to their weights (stride
+   scheduling on GPU seconds used / weight), FIFO within a channel.
+
+A job's `finish` step (concat, captions, upload) runs on a CPU pool so the GPU
+moves straight on to the next scene. Progress events a backend publishes while
+a scene runs (see progress.py) are kept on the job, for `running()`.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from .progress import ProgressEvent, subscribe
+
+CHANNELS = ("aitools", "dogs", "finance", "sleepsounds")
+DEFAULT_WEIGHTS = {c: 1.0 for c in CHANNELS}
+
+# A deadline counts as at risk when the remaining estimate times this exceeds the time left.
+DEADLINE_MARGIN = 1.5
+
+
+@dataclass
+class GpuJob:
+    channel: str
+    name: str
+    scenes: list[Callable[[], Any]]  # each runs one scene on the GPU
+    finish: Callable[[list[Any]], Any] | None = None  # CPU step, gets the scene results
+    deadline: float | None = None  # in scheduler clock seconds
+    est_scene_seconds: float = 60.0  # until a scene of this job has been timed
+
+    # filled in by the scheduler
+    seq: int = 0
+    done: int = 0
+    results: list[Any] = field(default_factory=list)
+    gpu_seconds: float = 0.0
+    progress: ProgressEvent | None = None  # of the scene running now
+    cancelled: bool = False
+    future: Future = field(default_factory=Future)
+
+    @property
+    def remaining(self) -> int:
+        return len(self.scenes) - self.done
+
+    def remaining_seconds(self) -> float:
+        per_scene = self.gpu_seconds / self.done if self.done else self.est_scene_seconds
+        return per_scene * self.remaining
+
+
+class GpuScheduler:
+    def __init__(
+        self,
+        weights: dict[str, float] | None = None,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        cpu_workers: int = 2,
+    ):
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.clock = clock
+        self._jobs: list[GpuJob] = []
+        self._futures: list[Future] = []
+        self._vtime: dict[str, float] = {}  # GPU seconds used / weight, per channel
+        self._gpu_seconds: dict[str, float] = {}
+        self._seq = itertools.count(1)
+        self._cond = threading.Condition()
+        self._cpu = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="finish")
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self._running: tuple[GpuJob, int] | None = None  # job, thread running its scene
+        self._unsubscribe = subscribe(self._on_progress)
+        self.log: list[tuple[str, str, int]] = []  # (channel, job, scene) in run order
+
+    def submit(self, job: GpuJob) -> Future:
+        """Queue a job; the future resolves to `finish(results)` (or the results)."""
+        if job.channel not in self.weights:
+            raise ValueError(f"Unknown channel '{job.channel}'. Available: {sorted(self.weights)}")
+        if not job.scenes:  # nothing for the GPU: finish right away
+            job.seq = next(self._seq)
+            self._finish(job)
+            return job.future
+        with self._cond:
+            job.seq = next(self._seq)
+            # A channel coming back from idle starts level with the least-served active
+            # channel instead of cashing in the credit it built up while idle.
+            active = [self._vtime[j.channel] for j in self._jobs if j.channel in self._vtime]
+            self._vtime.setdefault(job.channel, 0.0)
+            if not any(j.channel == job.channel for j in self._jobs) and active:
+                self._vtime[job.channel] = max(self._vtime[job.channel], min(active))
+            self._jobs.append(job)
+            self._futures = [f for f in self._futures if not f.done()] + [job.future]
+            self._cond.notify_all()
+        return job.future
+
+    def cancel(self, job: GpuJob) -> bool:
+        """Drop the job's remaining scenes; a scene already on the GPU runs to its end. False if it was done."""
+        with self._cond:
+            if job not in self._jobs:
+                return False
+            job.cancelled = True
+            if self._running is None or self._running[0] is not job:
+                self._jobs.remove(job)
+            job.future.cancel()
+            self._cond.notify_all()
+        return True
+
+    def pick(self) -> GpuJob | None:
+        """The job whose next scene would run now (read-only)."""
+        with self._cond:
+            return self._pick()
+
+    def _pick(self) -> GpuJob | None:
+        runnable = [j for j in self._jobs if j.remaining > 0]
+        if not runnable:
+            return None
+        now = self.clock()
+        at_risk = [
+            j
+            for j in runnable
+            if j.deadline is not None and j.remaining_seconds() * DEADLINE_MARGIN >= j.deadline - now
+        ]
+        if at_risk:
+            return min(at_risk, key=lambda j: (j.deadline, j.seq))
+        return min(runnable, key=lambda j: (self._vtime[j.channel], j.deadline or float("inf"), j.seq))
+
+    def run_next(self) -> bool:
+        """Run one scene of the picked job. False when there is nothing to run."""
+        with self._cond:
+            job = self._pick()
+        if job is None:
+            return False
+
+        index = job.done
+        self.log.append((job.channel, job.name, index + 1))
+        t0 = self.clock()
+        with self._cond:
+            self._running = (job, threading.get_ident())
+        try:
+            result = job.scenes[index]()
+        except Exception as e:  # Ctrl-C / SystemExit stop the GPU thread, not just the job
+            with self._cond:
+                self._running = None
+                job.progress = None
+                self._jobs.remove(job)
+            if not job.cancelled:
+                job.future.set_exception(e)
+            return True
+        except BaseException:
+            with self._cond:
+                self._running = None
+                job.progress = None
+            raise
+        elapsed = self.clock() - t0
+
+        with self._cond:
+            self._running = None
+            job.progress = None
+            job.results.append(result)
+            job.done += 1
+            job.gpu_seconds += elapsed
+            self._vtime[job.channel] += max(elapsed, 1e-6) / self.weights[job.channel]
+            self._gpu_seconds[job.channel] = self._gpu_seconds.get(job.channel, 0.0) + elapsed
+            if job.cancelled:  # while its scene ran
+                self._jobs.remove(job)
+            elif job.remaining == 0:
+                self._jobs.remove(job)
+                self._finish(job)
+        return True
+
+    def _on_progress(self, event: ProgressEvent) -> None:
+        with self._cond:
+            # only the GPU thread's own scene; other threads may be rendering previews
+            if self._running is not None and self._running[1] == threading.get_ident():
+                self._running[0].progress = event
+
+    def running(self) -> tuple[GpuJob, int, ProgressEvent | None] | None:
+        """The job on the GPU, the scene (1-based) and its latest progress."""
+        with self._cond:
+            if self._running is None:
+                return None
+            job = self._running[0]
+            return job, job.done + 1, job.progress
+
+    def _finish(self, job: GpuJob) -> None:
+        if job.finish is None:
+            job.future.set_result(job.results)
+            return
+
+        def run() -> None:
+            try:
+                job.future.set_result(job.finish(job.results))
+            except BaseException as e:
+                job.future.set_exception(e)
+
+        self._cpu.submit(run)
+
+    def run_until_idle(self) -> None:
+        """Drain the queue on the calling thread, then wait for finish steps."""
+        while self.run_next():
+            pass
+        wait(list(self._futures))  # errors stay on the job's future
+
+    def start(self) -> None:
+        """Serve forever on a background GPU thread (until `stop`)."""
+
+        def loop() -> None:
+            while True:
+                with self._cond:
+                    while not self._stopping and self._pick() is None:
+                        self._cond.wait()
+                    if self._stopping:
+                        return
+                self.run_next()
+
+        self._thread = threading.Thread(target=loop, name="gpu", daemon=True)
+        self._thread.start()
+
+    def stop(self, *, wait: bool = True) -> None:
+        self._unsubscribe()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread and wait:
+            self._thread.join()
+        self._cpu.shutdown(wait=wait)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        with self._cond:
+            queued: dict[str, int] = {}
+            for j in self._jobs:
+                queued[j.channel] = queued.get(j.channel, 0) + j.remaining
+            return {
+                c: {
+                    "weight": self.weights[c],
+                    "gpu_seconds": self._gpu_seconds.get(c, 0.0),
+                    "queued_scenes": queued.get(c, 0),
+                }
+                for c in self.weights
+            }
@@ -0,0 +1,43 @@
+"""
+Seed policy — a scene's seed follows from what the scene is.
+
+`derive_seed` hashes (storyboard id, video slug, scene index, normalized
+prompt, attempt). Rerunning an unchanged scene renders with the same seed, so
+the result is reproducible and the scene cache may stand in for it; a retry
+after a bad clip (attempt 2, 3, ...) gets a fresh seed; editing one prompt
+changes only that scene's seed.
+
+The storyboard id is the storyboard's `id`, else its series title or title,
+so renaming or re-dating the file keeps the seeds. Cache keys use the policy
+name (`DERIVED`), not the seed: identical scenes in other videos share a clip
+whichever seed rendered it, and the seed used is recorded with the clip.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+
+from .scene_cache import normalize_prompt
+
+DERIVED = "derived"  # scene_key seed policy (scene_cache.plan_key assumes it)
+MAX_SEED = 2**31 - 1  # WanGP and torch both take a positive int32
+
+
+def derive_seed(storyboard: str, slug: str, index: int, prompt: str, attempt: int = 1) -> int:
+    """Seed in 1..MAX_SEED for attempt `attempt` (1-based) at scene `index` of `slug`."""
+    key = json.dumps([storyboard, slug, int(index), normalize_prompt(prompt), int(attempt)])
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % MAX_SEED + 1
+
+
+def storyboard_id(sb: dict) -> str:
+    for k in ("id", "seriesTitle", "series_name", "title", "slug"):
+        if sb.get(k):
+            return str(sb[k])
+    return ""
+
+
+def scene_seed(sb: dict, video: dict, index: int, prompt: str, attempt: int = 1) -> int:
+    """`derive_seed` for scene `index` of `video` (the storyboard itself for single-video storyboards)."""
+    slug = video.get("slug") or video.get("title") or ""
+    return derive_seed(storyboard_id(sb), str(slug), index, prompt, attempt)
@@ -0,0 +1,120 @@
+"""
+Publish slots — turn per-channel target times into render deadlines.
+
+`out/publish_slots.json` maps a channel to its daily publish times in local
+time, e.g. {"dogs": ["14:00", "18:00", "22:00"]} (`best_upload_time.py --save`
+writes it). Videos are assigned to the upcoming slots in order, working back
+from each slot by the upload margin and the runtime estimate (see
+`predictor.py`) to a deadline that `GpuScheduler` jobs can carry. The upload
+itself is then scheduled with YouTube's `publishAt`.
+
+Assignments are a plan, not a promise: at upload time `SlotBook.take` hands out
+the earliest slot still reachable, so a video that ran late moves to the next
+free slot instead of publishing at the wrong time.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+from .predictor import Estimate
+
+SLOTS_PATH = Path("out") / "publish_slots.json"
+UPLOAD_MARGIN = timedelta(minutes=20)  # upload + YouTube processing before publish
+
+
+def load_slots(path: Path = SLOTS_PATH) -> dict[str, list[str]]:
+    path = Path(path)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_slots(channel: str, times: list[str], path: Path = SLOTS_PATH) -> None:
+    path = Path(path)
+    slots = load_slots(path)
+    slots[channel] = sorted(times)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(slots, indent=2), encoding="utf-8")
+
+
+def upcoming(times: list[str], *, count: int, now: datetime | None = None) -> list[datetime]:
+    """The next `count` slot datetimes (local, tz-aware) after `now` for daily `HH:MM` times."""
+    now = now or datetime.now().astimezone()
+    if not times or count <= 0:
+        return []
+    clock = sorted(datetime.strptime(t, "%H:%M").time() for t in times)
+    out: list[datetime] = []
+    day = now.date()
+    while len(out) < count:
+        for t in clock:
+            at = datetime.combine(day, t, tzinfo=now.tzinfo)
+            if at > now and len(out) < count:
+                out.append(at)
+        day += timedelta(days=1)
+    return out
+
+
+def slots_for(channel: str, count: int, *, times: list[str] | None = None, root: Path = Path(".")) -> list[datetime]:
+    """Upcoming slots for `channel`: explicit `times`, else those in `root / SLOTS_PATH`."""
+    return upcoming(times or load_slots(root / SLOTS_PATH).get(channel, []), count=count)
+
+
+@dataclass(frozen=True)
+class SlotAssignment:
+    video: int  # index in the storyboard
+    title: str
+    publish_at: datetime | None  # None: no reachable slot, publish on upload
+    deadline: datetime | None  # render must be done by this (publish_at - margin)
+    ready_at: datetime  # pessimistic finish time if rendered in order from now
+
+    @property
+    def late(self) -> bool:
+        return self.publish_at is None
+
+
+def assign_slots(
+    videos: list[tuple[str, Estimate]],
+    slots: list[datetime],
+    *,
+    now: datetime | None = None,
+    margin: timedelta = UPLOAD_MARGIN,
+) -> list[SlotAssignment]:
+    """Give each (title, estimate), rendered back to back, the first slot it can still make."""
+    now = now or datetime.now().astimezone()
+    free = sorted(slots)
+    ready = now
+    out = []
+    for i, (title, est) in enumerate(videos):
+        ready = ready + timedelta(seconds=est.high)
+        slot = next((s for s in free if s - margin >= ready), None)
+        if slot is not None:
+            free = [s for s in free if s > slot]
+        out.append(SlotAssignment(i, title, slot, slot - margin if slot else None, ready))
+    return out
+
+
+def to_clock(when: datetime, clock: Callable[[], float] = time.monotonic) -> float:
+    """A wall-clock datetime on a scheduler's clock (for `GpuJob.deadline`)."""
+    return clock() + (when - datetime.now(when.tzinfo)).total_seconds()
+
+
+class SlotBook:
+    """Hands out slots at upload time; safe to share between upload threads."""
+
+    def __init__(self, slots: list[datetime], *, margin: timedelta = UPLOAD_MARGIN):
+        self._free = sorted(slots)
+        self.margin = margin
+        self._lock = threading.Lock()
+
+    def take(self, now: datetime | None = None) -> datetime | None:
+        """Earliest slot still at least `margin` away (passed slots are dropped)."""
+        with self._lock:
+            now = now or datetime.now().astimezone()
+            self._free = [s for s in self._free if s - self.margin >= now]
+            return self._free.pop(0) if self._free else None
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import json
+import re
+import subprocess
+from pathlib import Path
+
+from .audiomix import AudioMix, mix_graph, mix_inputs, select_mix
+from .config import GenerateRequest
+from .pipeline import run
+from .quality import BadClipError
+from .backends.registry import available_backends
+from .compiler import compile_storyboard
+from .devices import SERIAL_BACKENDS, TASK_ERRORS, DevicePool, Task
+from .seeds import DERIVED, scene_seed
+
+# Preview renders at 360x640 (same 9:16 layout as the final Short).
+PREVIEW_WIDTH = 360
+PREVIEW_HEIGHT = 640
+PREVIEW_FPS = 12
+
+# Scenes failing the quality gate are regenerated with the next attempt's seed this many times in total.
+MAX_SCENE_ATTEMPTS = 3
+
+
+def load_storyboard(path: Path) -> dict:
+    # Some storyboards were saved with a BOM by Windows editors.
+    return json.loads(Path(path).read_text(encoding="utf-8-sig"))
+
+
+def slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:50] or "video"
+
+
+def iter_videos(sb: dict) -> list[dict]:
+    """Normalize single (`scenes` at top level) and series (`videos[].scenes`) storyboards."""
+    if sb.get("videos"):
+        videos = sb["videos"]
+    else:
+        videos = [{k: sb[k] for k in ("slug", "title", "description", "tags", "scenes") if k in sb}]
+
+    out = []
+    for i, v in enumerate(videos, start=1):
+        v = dict(v)
+        v.setdefault("slug", slugify(v.get("title") or f"video-{i}"))
+        out.append(v)
+    return out
+
+
+def video_default(sb: dict, video: dict) -> dict:
+    """The storyboard `default` with the video's own `default` over it, as the compiler resolves it."""
+    return {**(sb.get("default") or {}), **(video.get("default") or {})}
+
+
+def scene_seconds(scene: dict, default: dict) -> int:
+    # Per-scene override: `seconds` (runner) or `duration` (launch storyboards).
+    return int(scene.get("seconds") or scene.get("duration") or default.get("sceneSeconds", 3))
+
+
+def preview_backend() -> str:
+    """Fastest available path: SDXL-Turbo keyframe + Ken Burns on a GPU box, else stub."""
+    if "kenburns" in available_backends():
+        try:
+            import torch
+
+            if torch.cuda.is_available():
+                return "kenburns"
+        except Exception:
+            pass
+    return "stub"
+
+
+def scene_request(
+    scene: dict,
+    default: dict,
+    *,
+    out: Path,
+    seed: int | None = None,
+    seed_policy: str | None = None,
+    preview: bool = False,
+) -> GenerateRequest:
+    width = int(default.get("width", 480))
+    height = int(default.get("height", 832))
+    req = GenerateRequest(
+        text=scene["prompt"],
+        overlay_text=scene.get("caption") or None,
+        seconds=scene_seconds(scene, default),
+        fps=int(default.get("fps", 24)),
+        seed=seed,
+        seed_policy=seed_policy,
+        backend=default.get("backend", "wangp"),
+        out=str(out),
+        width=width,
+        height=height,
+        upscale_4k=bool(default.get("upscale4k", False)),
+        interpolate=bool(default.get("interpolate", False)),
+        quality_gate=not preview,
+        reuse=scene.get("reuse"),
+        expand_prompts=bool(default.get("expandPrompts", False)),
+    )
+    if preview:
+        # Same caption timing and portrait layout, just smaller and on the fastest backend.
+        req = req.model_copy(
+            update={
+                "backend": preview_backend(),
+                "fps": min(req.fps, PREVIEW_FPS),
+                "width": PREVIEW_WIDTH,
+                "height": PREVIEW_HEIGHT,
+                "caption_size": max(8, round(req.caption_size * PREVIEW_WIDTH / width)),
+                "preset": "ultrafast",
+                "upscale_4k": False,
+                "interpolate": False,
+                "expand_prompts": False,
+                "variants": [],
+                "scene_cache": False,
+                "reuse": None,
+            }
+        )
+    return req
+
+
+def concat_scenes(
+    scene_paths: list[Path],
+    out_path: Path,
+    *,
+    copy: bool = False,
+    audio: AudioMix | None = None,
+    duration: float | None = None,
+) -> None:
+    """Concatenate scene clips. `copy` skips the re-encode (clips must share codec params).
+
+    With `audio`, the bed/narration mix (see audiomix.py) replaces the scene audio
+    in the same pass; `duration` is the total video length.
+    """
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    lst = out_path.parent / (out_path.stem + "_concat_list.txt")
+    lst.write_text("\n".join([f"file '{p.resolve().as_posix()}'" for p in scene_paths]), encoding="utf-8")
+
+    video_codec = ["-c:v", "copy"] if copy else ["-c:v", "libx264", "-crf", "18", "-preset", "fast"]
+    if audio:
+        mix = [
+            *mix_inputs(audio),
+            "-filter_complex",
+            mix_graph(audio, duration=duration),
+            "-map",
+            "0:v",
+            "-map",
+            "[aout]",
+            "-c:a",
+            "aac",
+            "-b:a",
+            "128k",
+            "-t",
+            f"{duration:.3f}",
+        ]
+        codec = [*mix, *video_codec]
+    else:
+        codec = ["-c", "copy"] if copy else video_codec
+    subprocess.check_call(
+        ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(lst), *codec, str(out_path)]
+    )
+
+
+def video_audio(sb: dict, video: dict, *, root: Path) -> AudioMix | None:
+    """Bed/narration for a video: `music` ("auto" or a path), `musicCategory`, `narration`.
+
+    Video-level keys override the (video's) `default`; rotation uses the storyboard's `channel`.
+    """
+    default = video_default(sb, video)
+    return select_mix(
+        video.get("music") or default.get("music"),
+        channel=sb.get("channel") or "default",
+        category=video.get("musicCategory") or default.get("musicCategory"),
+        narration=video.get("narration"),
+        root=root,
+    )
+
+
+def render_scene(sb: dict, video: dict, i: int, *, out: Path, preview: bool = False) -> Path:
+    """Render scene `i` (1-based) of `video` to `out`, retrying clips that fail the quality gate."""
+    default = video_default(sb, video)
+    s = video["scenes"][i - 1]
+    for attempt in range(1, MAX_SCENE_ATTEMPTS + 1):
+        # Same scene, same attempt -> same seed (see seeds.py); a retry gets the next one.
+        seed = scene_seed(sb, video, i, s["prompt"], attempt)
+        req = scene_request(s, default, out=out, seed=seed, seed_policy=DERIVED, preview=preview)
+        print(f"scene {i}/{len(video['scenes'])} ({req.seconds}s) backend={req.backend} seed={seed}")
+        try:
+            run(req)
+            return out
+        except BadClipError as e:
+            # Only this scene is redone; earlier scenes are already on disk.
+            print(f"  {e} (attempt {attempt}/{MAX_SCENE_ATTEMPTS})")
+            if attempt == MAX_SCENE_ATTEMPTS:
+                raise
+    return out
+
+
+def run_video(
+    sb: dict,
+    video: dict,
+    *,
+    root: Path,
+    preview: bool = False,
+    pool: DevicePool | None = None,
+) -> Path:
+    """Render every scene of one video through `pipeline.run`, then concatenate.
+
+    With a `pool` of several devices the scenes render in parallel, one per GPU.
+    """
+    default = video_default(sb, video)
+    scenes = video["scenes"]
+    slug = video["slug"]
+
+    outs = scene_outputs(video, root=root, preview=preview)
+    if pool is not None and len(pool.healthy()) > 1:
+        # Scenes of a video share size and fps, so their length is their cost.
+        tasks = [
+            Task((slug, i), render_scene, (sb, video, i), {"out": out, "preview": preview}, scene_seconds(s, default))
+            for (i, s), out in zip(enumerate(scenes, start=1), outs)
+        ]
+        scene_paths = pool.map(tasks)
+    else:
+        scene_paths = [render_scene(sb, video, i, out=out, preview=preview) for i, out in enumerate(outs, start=1)]
+    return finish_video(sb, video, scene_paths, root=root, preview=preview)
+
+
+def scene_outputs(video: dict, *, root: Path, preview: bool = False) -> list[Path]:
+    """Where `run_video` renders each scene of `video` (the directory is created)."""
+    temp_dir = root / "temp" / ("preview" if preview else "single") / video["slug"]
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    return [temp_dir / f"scene_{i:02d}.mp4" for i in range(1, len(video["scenes"]) + 1)]
+
+
+def finish_video(sb: dict, video: dict, scene_paths: list[Path], *, root: Path, preview: bool = False) -> Path:
+    """Concatenate the rendered scenes of `video` with its audio (CPU only)."""
+    slug = video["slug"]
+    final = root / "out" / "preview" / f"{slug}_preview.mp4" if preview else root / "out" / f"{slug}.mp4"
+    print("Concatenating ->", final)
+    duration = sum(scene_seconds(s, video_default(sb, video)) for s in video["scenes"])
+    concat_scenes(scene_paths, final, copy=preview, audio=video_audio(sb, video, root=root), duration=duration)
+    return final
+
+
+def run_storyboard(
+    path: Path,
+    *,
+    root: Path = Path("."),
+    preview: bool = False,
+    video_index: int | None = None,
+    devices: list[str] | None = None,
+) -> list[Path]:
+    """Render all videos of a storyboard (or only `video_index`, 1-based).
+
+    With two or more `devices` (CUDA device ids), scenes are sharded across them (see devices.py).
+    """
+    sb = load_storyboard(path)
+    compile_storyboard(sb, source=str(path))  # every video is checked before the first scene renders
+    videos = iter_videos(sb)
+    if video_index is not None:
+        videos = [videos[video_index - 1]]
+    backends = {preview_backend()} if preview else {video_default(sb, v).get("backend", "wangp") for v in videos}
+    serial = sorted(backends & SERIAL_BACKENDS)
+    if devices and len(devices) > 1 and serial:
+        print(f"[devices] {', '.join(serial)} runs on one device at a time, not sharding")
+        devices = None
+    if not devices or len(devices) < 2:
+        return [run_video(sb, v, root=root, preview=preview) for v in videos]
+    with DevicePool(devices, task_errors=(BadClipError, *TASK_ERRORS)) as pool:
+        try:
+            return [run_video(sb, v, root=root, preview=preview, pool=pool) for v in videos]
+        finally:
+            print("[devices]\n" + pool.report())
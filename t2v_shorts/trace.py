@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+def trace_path() -> Path:
+    """Where stage timings are appended (override with T2V_SHORTS_TRACE)."""
+    return Path(os.environ.get("T2V_SHORTS_TRACE", "out/trace.jsonl"))
+
+
+def record(stage: str, **fields) -> None:
+    """Append one event to the trace. Tracing must never break a render."""
+    event = {"ts": round(time.time(), 3), "stage": stage, **fields}
+    try:
+        p = trace_path()
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with open(p, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, default=str) + "\n")
+    except OSError:
+        pass
+
+
+@contextmanager
+def span(stage: str, **fields) -> Iterator[dict]:
+    """Time a stage; callers may add fields to the yielded dict before it is recorded."""
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        yield fields
+        ok = True
+    finally:
+        record(stage, seconds=round(time.perf_counter() - t0, 3), ok=ok, **fields)
+
+
+def read_trace(path: Path | None = None) -> list[dict]:
+    p = path or trace_path()
+    if not p.exists():
+        return []
+    events = []
+    for line in p.read_text(encoding="utf-8").splitlines():
+        try:
+            events.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue  # torn write from a killed run
+    return events
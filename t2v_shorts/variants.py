@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+from .audiomix import AudioMix, mix_graph, mix_inputs
+from .filters import fit_graph, text_filter, write_caption_file
+
+
+@dataclass(frozen=True)
+class Variant:
+    """One output of a variant render.
+
+    caption_y is the caption top as a fraction of the frame height; platforms
+    differ in how much of the bottom their UI covers.
+    """
+
+    name: str
+    width: int
+    height: int
+    caption_y: float = 0.78
+    crf: int = 18
+    preset: str | None = None  # x264 preset; None: the render's
+    audio_bitrate: str = "128k"
+
+
+VARIANTS: dict[str, Variant] = {
+    "shorts": Variant("shorts", 1080, 1920),
+    "4k": Variant("4k", 2160, 3840),
+    # TikTok / Reels: caption + description UI covers the bottom ~30%.
+    "tiktok": Variant("tiktok", 1080, 1920, caption_y=0.62, crf=20),
+    "preview": Variant("preview", 360, 640, crf=30, preset="veryfast", audio_bitrate="64k"),
+}
+
+
+def get_variant(name: str) -> Variant:
+    if name not in VARIANTS:
+        raise ValueError(f"Unknown variant '{name}'. Available: {sorted(VARIANTS.keys())}")
+    return VARIANTS[name]
+
+
+def variant_path(out_path: Path, name: str) -> Path:
+    """out/video.mp4 -> out/video_<name>.mp4"""
+    return out_path.with_name(f"{out_path.stem}_{name}{out_path.suffix}")
+
+
+def build_variant_graph(
+    variants: list[Variant],
+    *,
+    master_width: int,
+    master_height: int,
+    mode: str = "blur",
+    textfile: Path | None = None,
+    fontsize: int = 64,
+    scale_flags: str | None = None,
+    sharpen: bool = False,
+    pre: str | None = None,
+) -> str:
+    """Composite each output size from the source, then split into one labelled branch per variant.
+
+    The source is decoded (and `pre` run) once; variants sharing a size share
+    a composite, so a 4K variant is laid out at 4K rather than scaled up from
+    the master. Captions are drawn after the split so each variant gets its own
+    safe area; the font size is scaled with the variant width so the layout
+    matches the master.
+    """
+    sizes = list(dict.fromkeys((v.width, v.height) for v in variants))
+    parts = []
+    sources = ["[0:v]"]
+    if len(sizes) > 1:
+        sources = [f"[c{k}]" for k in range(len(sizes))]
+        parts.append(f"[0:v]{pre + ',' if pre else ''}split={len(sizes)}" + "".join(sources))
+        pre = None
+    for k, (w, h) in enumerate(sizes):
+        members = [i for i, v in enumerate(variants) if (v.width, v.height) == (w, h)]
+        fit = fit_graph(
+            w, h, mode, scale_flags=scale_flags, sharpen=sharpen, pre=pre, src=sources[k], tag=str(k) if k else ""
+        )
+        parts.append(fit + f",split={len(members)}" + "".join(f"[m{i}]" for i in members))
+
+    for i, v in enumerate(variants):
+        chain = f"[m{i}]null"
+        if textfile:
+            size = max(8, round(fontsize * v.width / master_width))
+            chain += "," + text_filter(textfile, fontsize=size, y=v.caption_y)
+        parts.append(f"{chain}[v{i}]")
+    return ";".join(parts)
+
+
+def plan_outputs(
+    out_path: Path,
+    names: list[str],
+    *,
+    master_width: int,
+    master_height: int,
+) -> list[tuple[Variant, Path]]:
+    """The master (requested WxH) goes to `out_path`; each named variant next to it."""
+    outputs = [(Variant("master", master_width, master_height), out_path)]
+    for name in names:
+        outputs.append((get_variant(name), variant_path(out_path, name)))
+    return outputs
+
+
+def render_variants(
+    in_path: Path,
+    outputs: list[tuple[Variant, Path]],
+    *,
+    master_width: int,
+    master_height: int,
+    mode: str = "blur",
+    overlay_text: str | None = None,
+    fontsize: int = 64,
+    scale_flags: str | None = None,
+    sharpen: bool = False,
+    pre: str | None = None,
+    audio: AudioMix | None = None,
+    duration: float | None = None,
+    preset: str = "slow",
+) -> list[Path]:
+    """Decode `in_path` once and encode every variant from one ffmpeg process.
+
+    Audio is the source's (if any) or, with `audio`, the bed/narration mix
+    (built once, split to every output; needs `duration`).
+    """
+    if not outputs:
+        return []
+    variants = [v for v, _ in outputs]
+    textfile = write_caption_file(outputs[0][1], overlay_text)
+
+    graph = build_variant_graph(
+        variants,
+        master_width=master_width,
+        master_height=master_height,
+        mode=mode,
+        textfile=textfile,
+        fontsize=fontsize,
+        scale_flags=scale_flags,
+        sharpen=sharpen,
+        pre=pre,
+    )
+
+    audio_in: list[str] = []
+    audio_labels = ["0:a?"] * len(outputs)
+    if audio:
+        audio_in = mix_inputs(audio)
+        audio_labels = [f"[a{i}]" for i in range(len(outputs))]
+        graph += ";" + mix_graph(audio, duration=duration) + f";[aout]asplit={len(outputs)}" + "".join(audio_labels)
+
+    cmd = ["ffmpeg", "-y", "-i", str(in_path), *audio_in, "-filter_complex", graph]
+    for i, (v, out) in enumerate(outputs):
+        out.parent.mkdir(parents=True, exist_ok=True)
+        cmd += [
+            "-map",
+            f"[v{i}]",
+            "-map",
+            audio_labels[i],
+            "-c:v",
+            "libx264",
+            "-crf",
+            str(v.crf),
+            "-preset",
+            v.preset or preset,
+            "-pix_fmt",
+            "yuv420p",
+            "-c:a",
+            "aac",
+            "-b:a",
+            v.audio_bitrate,
+            *(["-t", f"{duration:.3f}"] if audio else []),
+            str(out),
+        ]
+
+    # Run ffmpeg and check outputs exist (ignore exit code due to fontconfig warnings on Windows)
+    result = subprocess.run(cmd, capture_output=True, text=True)
+
+    paths = [out for _, out in outputs]
+    for out in paths:
+        if not out.exists() or out.stat().st_size < 1000:
+            raise RuntimeError(f"FFmpeg failed - output missing or too small: {out}\nSTDERR: {result.stderr}")
+    return paths
@@ -0,0 +1,325 @@
+"""
+WanGP outputs watcher — pick up clips generated in the WanGP web UI as they land.
+
+Files are handled when the writer closes them (inotify close-write through
+`watchdog`, if installed) or once their size and mtime have held still for
+`STABLE_SECONDS` (Windows has no close events). Without watchdog the folder is
+polled, re-listed only when its mtime changes. The set of processed files is
+kept in SQLite (`out/watcher.sqlite`), so a restart neither redoes nor loses
+work and a lookup costs the same however long the history gets. A new session
+starts with every clip already in the folder (and the old auto-processor's
+`.processed_list.txt`) marked as seen: only clips that arrive later are taken.
+
+With a storyboard, each clip goes to the scene it was generated for rather
+than the next free number: the prompt WanGP stored with the clip (a `.json`
+next to it, or the JSON settings in the file's comment tag) is matched against
+the storyboard prompts, exactly after normalization or else by shingle
+similarity (see `scene_cache.py`); WanGP's file name, which starts with the
+prompt, is the fallback text. Clips that match no scene are recorded as
+"unmatched" and left out rather than filling a scene by arrival order.
+Clips are copied to `out/processed_scenes/scene_NN.mp4`, where
+`combine_and_upload.py` picks them up.
+"""
+from __future__ import annotations
+
+import json
+import os
+import queue
+import re
+import shutil
+import sqlite3
+import subprocess
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from .scene_cache import normalize_prompt, shingles
+
+WATCH_DB = Path("out") / "watcher.sqlite"
+PROCESSED_DIR = Path("out") / "processed_scenes"
+LEGACY_LIST = ".processed_list.txt"  # in PROCESSED_DIR, written by the polling auto-processor
+STABLE_SECONDS = 2.0
+POLL_SECONDS = 3.0
+MATCH_THRESHOLD = 0.5  # Jaccard similarity of prompt shingles
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    session TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    prompt TEXT,
+    slot INTEGER,
+    how TEXT,
+    path TEXT,
+    processed_at REAL NOT NULL,
+    PRIMARY KEY (session, name)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS files_slot ON files (session, slot) WHERE slot IS NOT NULL;
+CREATE TABLE IF NOT EXISTS sessions (
+    session TEXT PRIMARY KEY,
+    started_at REAL NOT NULL
+);
+"""
+
+
+@dataclass(frozen=True)
+class Slot:
+    index: int  # 1-based scene number
+    prompt: str
+
+
+@dataclass(frozen=True)
+class Processed:
+    name: str
+    slot: int | None  # None: matched no scene, or no free scene left
+    how: str  # "prompt", "similar 0.72", "next", "unmatched" or "no free scene"
+    path: Path | None
+
+
+def storyboard_slots(path: Path, video: int = 1) -> list[Slot]:
+    """The scenes of `video` (1-based) of a storyboard; raises StoryboardError."""
+    from .compiler import compile_file
+
+    plan = compile_file(path)
+    return [Slot(s.index, s.prompt) for s in plan.videos[video - 1].scenes]
+
+
+def clip_prompt(path: Path) -> str | None:
+    """The prompt WanGP recorded for a clip: `.json` settings beside it, else the comment tag."""
+    sidecar = path.with_suffix(".json")
+    try:
+        if sidecar.exists():
+            return json.loads(sidecar.read_text(encoding="utf-8")).get("prompt")
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format_tags=comment", "-of", "json", str(path)],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+        comment = json.loads(out.stdout or "{}").get("format", {}).get("tags", {}).get("comment")
+        return json.loads(comment).get("prompt") if comment else None
+    except (OSError, ValueError, AttributeError, subprocess.TimeoutExpired):
+        return None
+
+
+def _name_text(name: str) -> str:
+    # "2026-02-16-14h03m22s_seed42_A golden retriever runs.mp4" -> "A golden retriever runs"
+    stem = Path(name).stem
+    return re.sub(r"^[\dhms-]+_(?:seed-?\d+_)?", "", stem).replace("_", " ")
+
+
+def match_slot(text: str, free: list[Slot], *, threshold: float = MATCH_THRESHOLD) -> tuple[Slot, str] | None:
+    """The free scene whose prompt `text` is, exactly or by similarity."""
+    norm = normalize_prompt(text)
+    for slot in free:
+        if normalize_prompt(slot.prompt) == norm:
+            return slot, "prompt"
+    mine = shingles(text)
+    best, score = None, 0.0
+    for slot in free:
+        theirs = shingles(slot.prompt)
+        s = len(mine & theirs) / len(mine | theirs) if mine | theirs else 0.0
+        if s > score:
+            best, score = slot, s
+    if best is not None and score >= threshold:
+        return best, f"similar {score:.2f}"
+    return None
+
+
+class OutputWatcher:
+    def __init__(
+        self,
+        folder: Path,
+        *,
+        slots: list[Slot] | None = None,
+        session: str = "",
+        db_path: Path = WATCH_DB,
+        out_dir: Path = PROCESSED_DIR,
+        stable: float = STABLE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.folder = Path(folder)
+        self.slots = slots
+        self.session = session  # e.g. the storyboard; slots are numbered per session
+        self.out_dir = Path(out_dir)
+        self.stable = stable
+        self.clock = clock
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self._pending: dict[str, tuple[int, float, float]] = {}  # name -> (size, mtime, unchanged since)
+        self._closed: set[str] = set()
+        self._events: queue.Queue[tuple[str, bool]] = queue.Queue()  # (name, closed), from watchdog's thread
+        self._folder_mtime: float | None = None
+        self._start_session()
+
+    def _start_session(self) -> None:
+        """On a session's first run, mark what is already there as seen (one transaction)."""
+        if self.conn.execute("SELECT 1 FROM sessions WHERE session = ?", (self.session,)).fetchone():
+            return
+        sizes: dict[str, int] = {}
+        legacy = self.out_dir / LEGACY_LIST
+        if legacy.exists():
+            sizes.update((n, 0) for n in legacy.read_text(encoding="utf-8", errors="replace").splitlines() if n)
+        if self.folder.exists():
+            with os.scandir(self.folder) as it:
+                sizes.update((e.name, e.stat().st_size) for e in it if e.name.endswith(".mp4"))
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO files (session, name, size, how, processed_at) VALUES (?, ?, ?, 'before session', ?)",
+            [(self.session, name, size, now) for name, size in sizes.items()],
+        )
+        self.conn.execute("INSERT INTO sessions (session, started_at) VALUES (?, ?)", (self.session, now))
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "OutputWatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def processed(self, name: str) -> bool:
+        row = self.conn.execute("SELECT 1 FROM files WHERE session = ? AND name = ?", (self.session, name)).fetchone()
+        return row is not None
+
+    def filled(self) -> dict[int, Path]:
+        rows = self.conn.execute("SELECT slot, path FROM files WHERE session = ? AND slot IS NOT NULL", (self.session,))
+        return {r["slot"]: Path(r["path"]) for r in rows}
+
+    def missing(self) -> list[Slot]:
+        filled = self.filled()
+        return [s for s in self.slots or [] if s.index not in filled]
+
+    def notify(self, path: Path | str, *, closed: bool = False) -> None:
+        """A file event (thread-safe); `closed` when the writer is known to be done."""
+        self._events.put((Path(path).name, closed))
+
+    def scan(self) -> None:
+        """Queue unprocessed clips in the folder, listing it only if it changed since the last scan."""
+        try:
+            mtime = self.folder.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._folder_mtime:
+            return
+        self._folder_mtime = mtime
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.name.endswith(".mp4") and entry.name not in self._pending and not self.processed(entry.name):
+                    self.notify(entry.name)
+
+    def step(self) -> list[Processed]:
+        """Handle queued events; process every clip that is closed or has stopped growing."""
+        while True:
+            try:
+                name, closed = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if name.endswith(".mp4") and not self.processed(name):
+                self._pending.setdefault(name, (-1, 0.0, self.clock()))
+                if closed:
+                    self._closed.add(name)
+
+        now = self.clock()
+        ready = []
+        for name, (size, mtime, since) in list(self._pending.items()):
+            try:
+                st = (self.folder / name).stat()
+            except FileNotFoundError:  # deleted or renamed before it settled
+                del self._pending[name]
+                self._closed.discard(name)
+                continue
+            if (st.st_size, st.st_mtime) != (size, mtime):
+                self._pending[name] = (st.st_size, st.st_mtime, now)
+                since = now
+            if st.st_size > 0 and (name in self._closed or now - since >= self.stable):
+                ready.append(name)
+
+        done = []
+        for name in sorted(ready, key=lambda n: self._pending[n][1]):  # oldest first
+            done.append(self._process(name))
+            del self._pending[name]
+            self._closed.discard(name)
+        return done
+
+    def _next_slot(self, path: Path) -> tuple[int | None, str, str | None]:
+        prompt = clip_prompt(path)
+        if self.slots is None:
+            row = self.conn.execute("SELECT MAX(slot) AS n FROM files WHERE session = ?", (self.session,)).fetchone()
+            return (row["n"] or 0) + 1, "next", prompt
+        free = self.missing()
+        if not free:
+            return None, "no free scene", prompt
+        found = match_slot(prompt or _name_text(path.name), free)
+        if found is None:
+            return None, "unmatched", prompt
+        return found[0].index, found[1], prompt
+
+    def _process(self, name: str) -> Processed:
+        src = self.folder / name
+        slot, how, prompt = self._next_slot(src)
+        dest = None
+        if slot is not None:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            dest = self.out_dir / f"scene_{slot:02d}.mp4"
+            tmp = dest.with_suffix(".part")
+            shutil.copy(src, tmp)
+            os.replace(tmp, dest)  # a crash leaves the old scene or the new one, never half of it
+        # Recorded after the copy: a crash in between redoes the copy on restart.
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (session, name, size, prompt, slot, how, path, processed_at) VALUES (?,?,?,?,?,?,?,?)",
+            (self.session, name, src.stat().st_size, prompt, slot, how, str(dest) if dest else None, time.time()),
+        )
+        self.conn.commit()
+        return Processed(name, slot, how, dest)
+
+    def run(self, on_processed: Callable[[Processed], None] | None = None, *, poll: float = POLL_SECONDS) -> None:
+        """Serve until interrupted (or, with slots, until every scene is filled)."""
+        observer = self._observe()
+        try:
+            self.scan()
+            while not (self.slots and not self.missing()):
+                if observer is None:
+                    self.scan()
+                for p in self.step():
+                    if on_processed:
+                        on_processed(p)
+                time.sleep(poll if observer is None else min(poll, self.stable / 2 or poll))
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def _observe(self):
+        """A watchdog observer feeding `notify`, or None (polling) without watchdog."""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                watcher.notify(event.src_path)
+
+            def on_modified(self, event):
+                watcher.notify(event.src_path)
+
+            def on_moved(self, event):
+                watcher.notify(event.dest_path)
+
+            def on_closed(self, event):
+                watcher.notify(event.src_path, closed=True)
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        observer = Observer()
+        observer.schedule(Handler(), str(self.folder), recursive=False)
+        observer.start()
+        return observer
@@ -0,0 +1,348 @@
+"""
+Workspace garbage collector — keeps temp/, out/ and WanGP outputs/ under a byte quota.
+
+Every media file under the workspace roots is classified by where it lives:
+
+    final         out/**/*.mp4 (outside the dirs below) — the deliverables
+    cache         out/cache/** — rebuildable, evicted least recently used first
+    scene         temp/{wangp,single,preview}/<job>/scene_NN.mp4 — resume points
+    intermediate  everything else in temp/, out/processed_scenes/, WanGP outputs/
+
+and tied to its job (the journal key, or the slug for storyboard runs) and that
+job's state in the journal. The policy then:
+
+- deletes a job's scenes and intermediates once it is uploaded,
+- deletes job-less intermediates (raw WanGP outputs, pipeline scratch in
+  temp/ and temp/gpu<N>/) after `intermediate_ttl`,
+- when still over the quota, evicts intermediates, then cache entries, then
+  scenes of finished jobs, then scenes of unfinished ones, oldest first
+  (scene cache clips by their last cache hit in `out/scenes.sqlite`, as
+  atime is often not updated),
+- never touches finals (unless `keep_finals=False`, then uploaded ones go
+  last), non-media files (databases, tokens, reports) or anything written in
+  the last `min_age` seconds, which may belong to a running job.
+
+The file listing is kept in `out/gc.sqlite`. A sweep stats every directory
+but only re-lists those whose mtime changed, so it is cheap enough to run
+before every job; `full=True` re-lists everything.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+from . import journal as jobs
+
+GC_DB = Path("out") / "gc.sqlite"
+DEFAULT_QUOTA_GB = float(os.environ.get("T2V_WORKSPACE_QUOTA_GB", 100))
+
+MEDIA_SUFFIXES = {".mp4", ".mkv", ".mov", ".webm", ".avi", ".wav", ".mp3", ".m4a", ".aac", ".flac", ".png", ".jpg"}
+SCENE_DIRS = ("wangp", "single", "preview")  # temp/<dir>/<job>/scene_NN.mp4
+
+FINAL = "final"
+CACHE = "cache"
+SCENE = "scene"
+INTERMEDIATE = "intermediate"
+KINDS = (FINAL, CACHE, SCENE, INTERMEDIATE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    atime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+"""
+
+
+def _gb(n: float) -> str:
+    return f"{n / 1e9:.2f} GB"
+
+
+@dataclass(frozen=True)
+class Policy:
+    quota_bytes: int = int(DEFAULT_QUOTA_GB * 1e9)
+    keep_finals: bool = True
+    intermediate_ttl: float = 24 * 3600.0  # job-less intermediates older than this go
+    min_age: float = 600.0  # never delete files younger than this (a job may be writing them)
+
+
+@dataclass(frozen=True)
+class Artifact:
+    path: Path
+    size: int
+    mtime: float
+    atime: float
+    kind: str
+    job: str | None = None
+    state: str | None = None  # journal state of the job, FINISHED if only its final is known
+    used_at: float | None = None  # last scene cache hit, for clips the cache knows
+
+    @property
+    def last_used(self) -> float:
+        return self.used_at if self.used_at is not None else max(self.mtime, self.atime)
+
+
+def classify(rel: Path, *, extra: bool = False) -> tuple[str, str | None]:
+    """(kind, job) for a path relative to the workspace root; `extra` roots hold raw generator outputs."""
+    parts = rel.parts
+    if extra:
+        return INTERMEDIATE, None
+    if parts[0] == "out":
+        if len(parts) > 2 and parts[1] == "cache":
+            return CACHE, None
+        if len(parts) > 2 and parts[1] == "processed_scenes":
+            return INTERMEDIATE, None
+        return FINAL, rel.stem
+    # temp/
+    if len(parts) >= 3 and parts[1].startswith("gpu") and parts[1][3:].isdigit():
+        return INTERMEDIATE, None  # temp/gpu<N>/base.mp4 etc., per-device pipeline scratch
+    if len(parts) == 4 and parts[1] in SCENE_DIRS:
+        job = parts[2]
+        if rel.name.startswith("scene_") and rel.stem[6:].isdigit():
+            return SCENE, job
+        return INTERMEDIATE, job
+    if len(parts) >= 3:
+        return INTERMEDIATE, parts[-2]  # temp/<slug>/... from the launch scripts
+    return INTERMEDIATE, None  # temp/base.mp4 etc.
+
+
+@dataclass
+class SweepReport:
+    quota: int
+    dry_run: bool
+    before: dict[str, tuple[int, int]] = field(default_factory=dict)  # kind -> (files, bytes)
+    deleted: list[tuple[Artifact, str]] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return sum(b for _, b in self.before.values())
+
+    @property
+    def freed(self) -> int:
+        return sum(a.size for a, _ in self.deleted)
+
+    @property
+    def after(self) -> int:
+        return self.total - self.freed
+
+    def __str__(self) -> str:
+        lines = [
+            f"{kind:<13} {self.before.get(kind, (0, 0))[0]:>6} files  {_gb(self.before.get(kind, (0, 0))[1]):>10}"
+            for kind in KINDS
+        ]
+        verb = "would delete" if self.dry_run else "deleted"
+        for a, reason in self.deleted:
+            lines.append(f"  {verb} {a.path}  {a.size / 1e6:.1f} MB  ({a.kind}, {reason})")
+        lines.append(
+            f"Total {_gb(self.total)} of {_gb(self.quota)} quota; {verb} {len(self.deleted)} file(s), "
+            f"{_gb(self.freed)} -> {_gb(self.after)}"
+        )
+        if self.after > self.quota:
+            lines.append(f"Still over quota by {_gb(self.after - self.quota)}: the rest is finals or in use")
+        return "\n".join(lines)
+
+
+class Workspace:
+    def __init__(
+        self,
+        root: Path = Path("."),
+        *,
+        extra: list[Path] | tuple[Path, ...] = (),
+        db_path: Path | None = None,
+    ):
+        self.root = Path(root).resolve()
+        self.roots = [self.root / "temp", self.root / "out"]
+        self.extra = [Path(p).resolve() for p in extra]
+        self.db_path = Path(db_path) if db_path else self.root / GC_DB
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "Workspace":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # --- listing ---------------------------------------------------------
+
+    def _forget(self, d: str) -> None:
+        prefix = d + os.sep
+        n = len(prefix)
+        self.conn.execute("DELETE FROM files WHERE dir = ? OR substr(dir, 1, ?) = ?", (d, n, prefix))
+        self.conn.execute("DELETE FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?", (d, n, prefix))
+
+    def _scan_dir(self, d: Path, parent: str | None, full: bool) -> None:
+        key = str(d)
+        try:
+            st = d.stat()
+        except FileNotFoundError:
+            self._forget(key)
+            return
+        row = self.conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (key,)).fetchone()
+        if not full and row is not None and row["mtime_ns"] == st.st_mtime_ns:
+            subdirs = [r["path"] for r in self.conn.execute("SELECT path FROM dirs WHERE parent = ?", (key,))]
+        else:
+            subdirs, files = [], []
+            with os.scandir(d) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and Path(entry.name).suffix.lower() in MEDIA_SUFFIXES:
+                        s = entry.stat()
+                        files.append((entry.path, key, s.st_size, s.st_mtime, s.st_atime))
+            known = [r["path"] for r in self.conn.execute("SELECT path FROM dirs WHERE parent = ?", (key,))]
+            for gone in set(known) - set(subdirs):
+                self._forget(gone)
+            self.conn.execute("DELETE FROM files WHERE dir = ?", (key,))
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?,?,?,?,?)", files)
+            self.conn.execute("INSERT OR REPLACE INTO dirs VALUES (?,?,?)", (key, parent, st.st_mtime_ns))
+        for sub in subdirs:
+            self._scan_dir(Path(sub), key, full)
+
+    def scan(self, *, full: bool = False) -> list[Artifact]:
+        """Every media file under the roots, classified; only changed directories are re-listed."""
+        for d in self.roots + self.extra:
+            self._scan_dir(d, None, full)
+        self.conn.commit()
+
+        states = self._job_states()
+        cache_hits = self._cache_hits()
+        out = []
+        for d, is_extra in [(d, False) for d in self.roots] + [(d, True) for d in self.extra]:
+            prefix = str(d) + os.sep
+            rows = self.conn.execute(
+                "SELECT * FROM files WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+            ).fetchall()
+            for r in rows:
+                path = Path(r["path"])
+                rel = path.relative_to(d if is_extra else self.root)
+                kind, job = classify(rel, extra=is_extra)
+                used_at = cache_hits.get(path.name) if rel.parts[:3] == ("out", "cache", "scenes") else None
+                out.append(Artifact(path, r["size"], r["mtime"], r["atime"], kind, job, used_at=used_at))
+
+        finals = {a.job for a in out if a.kind == FINAL}
+        return [
+            replace(a, state=states.get(a.job) or (jobs.FINISHED if a.job in finals else None)) if a.job else a
+            for a in out
+        ]
+
+    def _job_states(self) -> dict[str, str]:
+        path = self.root / jobs.JOURNAL_PATH
+        if not path.exists():
+            return {}
+        with jobs.Journal(path) as journal:
+            return {e.key: e.state for e in journal.entries() if "/" not in e.key}
+
+    def _cache_hits(self) -> dict[str, float]:
+        from .scene_cache import SCENE_DB, SceneCache
+
+        path = self.root / SCENE_DB
+        if not path.exists():
+            return {}
+        with SceneCache(path) as cache:
+            return cache.used_at()
+
+    # --- policy ----------------------------------------------------------
+
+    def plan(self, artifacts: list[Artifact], policy: Policy, *, now: float | None = None) -> list[tuple[Artifact, str]]:
+        """What to delete, in order, with the reason."""
+        now = now or time.time()
+        settled = [a for a in artifacts if now - a.mtime >= policy.min_age]
+        doomed: dict[Path, tuple[Artifact, str]] = {}
+        for a in settled:
+            if a.kind in (SCENE, INTERMEDIATE) and a.state == jobs.UPLOADED:
+                doomed[a.path] = (a, "job uploaded")
+            elif a.kind == INTERMEDIATE and a.job is None and now - a.mtime >= policy.intermediate_ttl:
+                doomed[a.path] = (a, "expired")
+
+        total = sum(a.size for a in artifacts) - sum(a.size for a, _ in doomed.values())
+        if total > policy.quota_bytes:
+            finished = (jobs.FINISHED, jobs.UPLOADED)
+
+            def rank(a: Artifact) -> int | None:
+                if a.kind == INTERMEDIATE:
+                    return 0 if a.job is None or a.state in finished else 3
+                if a.kind == CACHE:
+                    return 1
+                if a.kind == SCENE:
+                    return 2 if a.state in finished else 3
+                if not policy.keep_finals and a.state == jobs.UPLOADED:
+                    return 4
+                return None
+
+            ranked = [(rank(a), a.last_used, a) for a in settled if a.path not in doomed]
+            for _, _, a in sorted((r for r in ranked if r[0] is not None), key=lambda r: r[:2]):
+                if total <= policy.quota_bytes:
+                    break
+                doomed[a.path] = (a, "over quota")
+                total -= a.size
+        return list(doomed.values())
+
+    def sweep(self, policy: Policy | None = None, *, dry_run: bool = False, full: bool = False) -> SweepReport:
+        policy = policy or Policy()
+        artifacts = self.scan(full=full)
+        report = SweepReport(policy.quota_bytes, dry_run)
+        for a in artifacts:
+            n, b = report.before.get(a.kind, (0, 0))
+            report.before[a.kind] = (n + 1, b + a.size)
+
+        for a, reason in self.plan(artifacts, policy):
+            if not dry_run:
+                try:
+                    st = a.path.stat()
+                    if st.st_mtime != a.mtime:  # rewritten since it was listed
+                        continue
+                    a.path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:  # e.g. still open on Windows
+                    print(f"[gc] could not delete {a.path}: {e}")
+                    continue
+                self.conn.execute("DELETE FROM files WHERE path = ?", (str(a.path),))
+                self._prune(a.path.parent)
+            report.deleted.append((a, reason))
+        self.conn.commit()
+        return report
+
+    def _prune(self, d: Path) -> None:
+        """Remove job dirs under temp/ left empty by a sweep."""
+        temp = self.root / "temp"
+        while d != temp and temp in d.parents:
+            try:
+                d.rmdir()
+            except OSError:  # not empty
+                return
+            self._forget(str(d))
+            d = d.parent
+
+
+def sweep(
+    root: Path = Path("."),
+    *,
+    policy: Policy | None = None,
+    extra: list[Path] | tuple[Path, ...] = (),
+    dry_run: bool = False,
+) -> SweepReport:
+    """`Workspace(root, extra=extra).sweep(policy)`, logging what it deleted."""
+    with Workspace(root, extra=extra) as ws:
+        report = ws.sweep(policy, dry_run=dry_run)
+    if report.deleted:
+        print(f"[gc] freed {_gb(report.freed)} ({len(report.deleted)} file(s)), workspace {_gb(report.after)}")
+    return report